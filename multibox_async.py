@@ -0,0 +1,333 @@
+"""
+WoW Multiboxing Async
+Fachada asyncio del engine para scripts de automatización: las esperas (tiempo de
+pulsación, fin de un comando de chat) no bloquean el bucle de eventos, de modo que un
+solo script puede llevar muchas secuencias de órdenes concurrentes y reaccionar a los
+eventos del engine sin crear hilos propios.
+
+Los mensajes siguen saliendo por los carriles de envío de cada ventana; la fachada solo
+decide cuándo se encolan. Un comando de chat entra en el carril como una sola secuencia,
+igual que desde el engine, para que ningún otro envío se intercale en el chat abierto. Los eventos tienen el mismo formato que la orden 'watch' del
+daemon: {"event": "status", "status": {...}} y {"event": "log", ...}.
+"""
+
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from multibox_engine import WoWMultiboxEngine
+from multibox_log import LEVEL_NAMES
+from multibox_routing import TARGET_OTHERS
+
+# Cada cuánto se revisa el log si no llega ningún aviso del engine (segundos)
+EVENT_POLL_INTERVAL = 0.1
+
+# Sondeo de los carriles mientras se espera a que se vacíen (segundos)
+IDLE_POLL_INTERVAL = 0.002
+
+_LEVEL_LABELS = {level: name for name, level in LEVEL_NAMES.items()}
+
+
+class AsyncMultibox:
+    """
+    Fachada asyncio sobre un WoWMultiboxEngine.
+    Debe crearse y usarse dentro de un bucle de eventos en marcha; close() devuelve
+    los callbacks del engine a su estado anterior.
+    """
+
+    def __init__(self, engine: WoWMultiboxEngine):
+        self.engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._subscribers: Set[asyncio.Event] = set()
+        self._status_version = 0
+        self._closed = False
+
+        # Encadenar con los callbacks existentes (GUI, daemon...) en vez de sustituirlos
+        self._prev_status = engine.on_status_change
+        self._prev_windows = engine.on_windows_updated
+        engine.on_status_change = self._on_status_change
+        engine.on_windows_updated = self._on_windows_updated
+
+    async def __aenter__(self) -> "AsyncMultibox":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Restaura los callbacks del engine y termina los iteradores de eventos"""
+        if self._closed:
+            return
+        self._closed = True
+        engine = self.engine
+        if engine.on_status_change == self._on_status_change:
+            engine.on_status_change = self._prev_status
+        if engine.on_windows_updated == self._on_windows_updated:
+            engine.on_windows_updated = self._prev_windows
+        self._wake()
+
+    # === Teclas ===
+
+    async def broadcast_key(self, key_name: str, target: str = TARGET_OTHERS,
+                            hold_ms: Optional[float] = None) -> int:
+        """
+        Pulsación completa en un destino con nombre: KEYDOWN, espera de hold_ms (por
+        defecto, el delay configurado) sin bloquear el bucle y KEYUP. Si la tarea se cancela durante la espera, el KEYUP
+        se envía igualmente. Devuelve el número de ventanas destino.
+        """
+        engine = self.engine
+        entry = engine.key_table.get(key_name.lower())
+        if entry is None:
+            engine.log("Error", f"Tecla no soportada: {key_name!r}")
+            return 0
+
+        targets = engine.resolve_targets(target.lower())
+        submit = engine.dispatcher.submit
+        for hwnd in targets:
+            submit(hwnd, engine.post_key_down, hwnd, entry)
+        try:
+            await asyncio.sleep(engine.config.key_hold if hold_ms is None else hold_ms / 1000.0)
+        finally:
+            for hwnd in targets:
+                submit(hwnd, engine.post_key_up, hwnd, entry, critical=True)
+        return len(targets)
+
+    # === Comandos de chat ===
+
+    def _command_targets(self, target: Optional[str]) -> Tuple[int, ...]:
+        if target is None:
+            return tuple(w.hwnd for w in self.engine.registry.slaves)
+        return self.engine.resolve_targets(target.lower())
+
+    async def send_command(self, command: str, target: Optional[str] = None,
+                           forward: bool = True) -> int:
+        """
+        Escribe un comando de chat en las ventanas destino (por defecto, las slave) y
+        termina cuando se ha enviado en todas. Los delays de etapa transcurren en los
+        carriles; esta tarea solo espera a que terminen, sin bloquear el bucle.
+        forward: reenviarlo también a otros equipos, como send_command_to_slaves
+        Devuelve el número de ventanas que recibieron el comando.
+        """
+        engine = self.engine
+        forward_command = engine.on_command_forward
+        if forward and forward_command is not None:
+            forward_command(command)
+
+        targets = self._command_targets(target)
+        if not targets:
+            engine.log("Warning", "No hay ventanas destino para el comando")
+            return 0
+
+        encoded = engine.chat.encode(command)
+        sent = await asyncio.gather(*(self._type_command(hwnd, encoded) for hwnd in targets))
+        return sum(sent)
+
+    async def _type_command(self, hwnd: int, encoded) -> bool:
+        """
+        Encola el comando en el carril de la ventana como una sola secuencia y espera a
+        que se ejecute. False si el carril lo rechazó (cortocircuito abierto, cola llena).
+        """
+        done = self._loop.create_future()
+        jobs = self.engine.chat.jobs(hwnd, encoded) + (
+            (self._loop.call_soon_threadsafe, (_resolve, done)),)
+        if not self.engine.dispatcher.submit_many(hwnd, jobs):
+            return False
+        # Si la tarea se cancela, el comando se termina de escribir igualmente en el carril
+        await done
+        return True
+
+    async def send_follow(self) -> int:
+        """Envía /follow al objetivo configurado"""
+        follow_target = self.engine.config.follow_target
+        if not follow_target:
+            self.engine.log("Error", "Nombre para Follow no configurado")
+            return 0
+        count = await self.send_command(f"/follow {follow_target}")
+        self.engine.log("Follow", f"Comando enviado a {count} ventana(s)")
+        return count
+
+    async def send_assist(self) -> int:
+        """Envía /assist al objetivo configurado"""
+        assist_target = self.engine.config.assist_target
+        if not assist_target:
+            self.engine.log("Error", "Nombre para Assist no configurado")
+            return 0
+        count = await self.send_command(f"/assist {assist_target}")
+        self.engine.log("Assist", f"Comando enviado a {count} ventana(s)")
+        return count
+
+    async def run_macro(self, name: str) -> int:
+        """Ejecuta una macro (la programa el planificador del engine; no espera a que termine)"""
+        return self.engine.run_macro(name)
+
+    # === Ventanas y carriles ===
+
+    async def refresh_windows(self) -> int:
+        """Rescanea las ventanas en el ejecutor por defecto y devuelve cuántas hay"""
+        return await self._loop.run_in_executor(None, self.engine.find_wow_windows)
+
+    async def wait_idle(self, hwnds: Optional[Tuple[int, ...]] = None,
+                        timeout: float = 5.0) -> bool:
+        """Espera sin bloquear a que los carriles (todos o los de hwnds) se vacíen"""
+        deadline = self._loop.time() + timeout
+        while True:
+            stats = self.engine.dispatcher.stats()
+            lanes = stats.values() if hwnds is None else (stats[h] for h in hwnds if h in stats)
+            if not any(lane["backlog"] for lane in lanes):
+                return True
+            if self._loop.time() >= deadline:
+                return False
+            await asyncio.sleep(IDLE_POLL_INTERVAL)
+
+    def get_status(self) -> Dict:
+        return self.engine.get_status()
+
+    # === Eventos ===
+
+    def _on_status_change(self):
+        if self._prev_status:
+            self._prev_status()
+        self._notify_status()
+
+    def _on_windows_updated(self, windows):
+        if self._prev_windows:
+            self._prev_windows(windows)
+        self._notify_status()
+
+    def _notify_status(self):
+        """Llamado desde cualquier hilo del engine"""
+        try:
+            self._loop.call_soon_threadsafe(self._bump_status)
+        except RuntimeError:
+            pass  # bucle cerrado
+
+    def _bump_status(self):
+        self._status_version += 1
+        self._wake()
+
+    def _wake(self):
+        for event in self._subscribers:
+            event.set()
+
+    async def events(self, poll_interval: float = EVENT_POLL_INTERVAL) -> AsyncIterator[Dict]:
+        """
+        Iterador de eventos de estado y de log desde este momento.
+        Cada iterador lleva su propio cursor del log; termina al llamar a close().
+        """
+        ring = self.engine.log_ring
+        cursor = ring.last_seq
+        version = self._status_version
+        wakeup = asyncio.Event()
+        self._subscribers.add(wakeup)
+        try:
+            while not self._closed:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+
+                if version != self._status_version:
+                    version = self._status_version
+                    yield {"event": "status", "status": self.engine.get_status()}
+
+                for record in ring.since(cursor):
+                    cursor = record.seq
+                    yield {"event": "log", "time": record.created,
+                           "level": _LEVEL_LABELS.get(record.level, str(record.level)),
+                           "source": record.source, "message": record.message}
+        finally:
+            self._subscribers.discard(wakeup)
+
+
+def _resolve(future: asyncio.Future):
+    """Marca como terminada la espera de un comando (en el bucle, llamado desde un carril)"""
+    if not future.done():
+        future.set_result(None)
+
+
+def _chat_lines(received) -> Tuple[str, ...]:
+    """Reconstruye las líneas de chat (texto entre dos ENTER) de los mensajes de una ventana"""
+    from multibox_backend import WM_CHAR, WM_KEYDOWN
+
+    lines = []
+    text = None
+    for msg, wparam, *_ in received:
+        if msg == WM_KEYDOWN and wparam == 0x0D:
+            if text is None:
+                text = []
+            else:
+                lines.append("".join(text))
+                text = None
+        elif msg == WM_CHAR and text is not None:
+            text.append(chr(wparam))
+    return tuple(lines)
+
+
+async def demo(windows: int = 3, rounds: int = 5) -> Dict:
+    """
+    Varias secuencias concurrentes sobre ventanas simuladas, más un lector de eventos.
+    Los comandos (de la fachada y del engine) se lanzan todos a la vez; 'chat_intact'
+    indica si cada ventana slave recibió cada línea completa y sin mezclar con las demás.
+    """
+    from multibox_backend import SimulatedBackend
+
+    backend = SimulatedBackend(windows + 1)
+    engine = WoWMultiboxEngine(backend)
+    seen = []
+    try:
+        engine.config_store.stop()
+        async with AsyncMultibox(engine) as mb:
+            async def watch():
+                async for event in mb.events():
+                    seen.append(event["event"])
+
+            watcher = asyncio.ensure_future(watch())
+            await mb.refresh_windows()
+            engine.set_main_window(engine.wow_windows[0].hwnd)
+            engine.toggle_active()
+
+            # Las teclas van a la principal mientras las slave escriben en el chat
+            async def rotation(keys: str):
+                for _ in range(rounds):
+                    for key in keys:
+                        await mb.broadcast_key(key, "main", hold_ms=10)
+
+            # Comandos asíncronos mezclados con los del engine (GUI, atajos...) en las mismas ventanas
+            async def engine_commands(commands):
+                for command in commands:
+                    engine.send_command_to_slaves(command, forward=False)
+                    await asyncio.sleep(0)
+
+            commands = [f"/say hola {idx}" for idx in range(rounds)]
+            sync_commands = [f"/say engine {idx}" for idx in range(rounds)]
+            started = asyncio.get_running_loop().time()
+            await asyncio.gather(rotation("123"), rotation("qe"), engine_commands(sync_commands),
+                                 *(mb.send_command(command) for command in commands))
+            await mb.wait_idle()
+            elapsed = asyncio.get_running_loop().time() - started
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+        await watcher
+        backend.wait_idle()
+        slaves = [backend.windows[w.hwnd] for w in engine.registry.slaves]
+        intact = all(sorted(_chat_lines(w.received)) == sorted(commands + sync_commands)
+                     for w in slaves)
+        return {"elapsed_s": round(elapsed, 3),
+                "messages": sum(len(w.received) for w in backend.windows.values()),
+                "chat_intact": intact,
+                "status_events": seen.count("status"), "log_events": seen.count("log")}
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Demostración de la API asyncio con ventanas simuladas")
+    parser.add_argument("--windows", type=int, default=3, help="ventanas slave simuladas")
+    parser.add_argument("--rounds", type=int, default=5, help="repeticiones de cada secuencia")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(demo(args.windows, args.rounds)), indent=2))
@@ -0,0 +1,552 @@
+"""
+WoW Multiboxing Backend
+Capa de plataforma: enumeración de ventanas, ventana activa, envío de mensajes y PIDs.
+Incluye el backend real (pywin32) y un backend simulado en memoria para pruebas de carga.
+"""
+
+import itertools
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Mensajes de ventana usados por el motor
+WM_KEYDOWN = 0x0100
+WM_KEYUP = 0x0101
+WM_CHAR = 0x0102
+
+# Scan codes (set 1) de una distribución US, para el backend simulado
+_SIMULATED_SCAN_CODES = {ord(c): 0x02 + i for i, c in enumerate("1234567890")}
+_SIMULATED_SCAN_CODES.update({ord(c): 0x10 + i for i, c in enumerate("QWERTYUIOP")})
+_SIMULATED_SCAN_CODES.update({ord(c): 0x1E + i for i, c in enumerate("ASDFGHJKL")})
+_SIMULATED_SCAN_CODES.update({ord(c): 0x2C + i for i, c in enumerate("ZXCVBNM")})
+_SIMULATED_SCAN_CODES.update({0x20: 0x39, 0x0D: 0x1C, 0x10: 0x2A, 0x09: 0x0F,
+                              0x1B: 0x01, 0x08: 0x0E})
+_SIMULATED_SCAN_CODES.update({0x6F + n: 0x3A + n for n in range(1, 11)})
+
+# Distribuciones de teclado del backend simulado (HKL de EE. UU. y de Francia)
+SIMULATED_LAYOUT_US = 0x04090409
+SIMULATED_LAYOUT_FR = 0x040C040C
+_AZERTY_SWAPS = {ord("A"): ord("Q"), ord("Q"): ord("A"), ord("Z"): ord("W"), ord("W"): ord("Z")}
+
+
+class WindowBackend:
+    """Interfaz de la capa de plataforma usada por el motor"""
+
+    # Intervalo del sondeo de respaldo para la ventana activa (segundos)
+    foreground_poll_interval = 0.05
+
+    _foreground_callback: Optional[Callable] = None
+    _foreground_stop: Optional[threading.Event] = None
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        """Devuelve (hwnd, título) de todas las ventanas visibles de nivel superior"""
+        raise NotImplementedError
+
+    def enum_window_handles(self) -> List[int]:
+        """HWND de las ventanas visibles de nivel superior, sin leer sus títulos"""
+        return [hwnd for hwnd, _ in self.enum_windows()]
+
+    def get_window_text(self, hwnd: int) -> str:
+        """Título de una ventana"""
+        for handle, title in self.enum_windows():
+            if handle == hwnd:
+                return title
+        return ""
+
+    def get_class_name(self, hwnd: int) -> Optional[str]:
+        """Clase de ventana (None si la plataforma no la expone)"""
+        return None
+
+    def get_process_exe(self, pid: int) -> Optional[str]:
+        """Nombre del ejecutable de un proceso, sin ruta (None si no se puede consultar)"""
+        return None
+
+    def get_foreground_window(self) -> int:
+        """Obtiene la ventana activa actual"""
+        raise NotImplementedError
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int):
+        """Encola un mensaje en la ventana sin esperar a que lo procese"""
+        raise NotImplementedError
+
+    def get_process_id(self, hwnd: int) -> Optional[int]:
+        """Obtiene el PID de una ventana"""
+        raise NotImplementedError
+
+    def vk_key_scan(self, char: str, layout: int = 0) -> int:
+        """
+        Traduce un carácter a código virtual (byte bajo) y estado de shift (byte alto)
+        en la distribución indicada (0: la del hilo que llama)
+        """
+        raise NotImplementedError
+
+    def map_virtual_key(self, vk: int, layout: int = 0) -> int:
+        """Traduce un código virtual a su scan code en la distribución indicada"""
+        raise NotImplementedError
+
+    def get_keyboard_layout(self, hwnd: int = 0) -> int:
+        """Distribución de teclado del hilo dueño de la ventana (0: la ventana activa)"""
+        return 0
+
+    def is_hung(self, hwnd: int) -> bool:
+        """Indica si la ventana no está procesando mensajes (sonda con tiempo límite)"""
+        return False
+
+    def watch_foreground(self, callback: Callable[[int], None]):
+        """
+        Llama a callback(hwnd) cada vez que cambia la ventana activa.
+        Implementación de respaldo: sondeo periódico en un hilo propio.
+        """
+        self.unwatch_foreground()
+        self._foreground_callback = callback
+        stop = self._foreground_stop = threading.Event()
+
+        def poll():
+            last = None
+            while not stop.is_set():
+                try:
+                    hwnd = self.get_foreground_window()
+                except Exception:
+                    hwnd = 0
+                if hwnd != last:
+                    last = hwnd
+                    callback(hwnd)
+                stop.wait(self.foreground_poll_interval)
+
+        threading.Thread(target=poll, name="foreground-poll", daemon=True).start()
+
+    def unwatch_foreground(self):
+        """Deja de notificar cambios de la ventana activa"""
+        self._foreground_callback = None
+        if self._foreground_stop is not None:
+            self._foreground_stop.set()
+            self._foreground_stop = None
+
+
+class Win32Backend(WindowBackend):
+    """Backend real basado en pywin32 (solo Windows)"""
+
+    def __init__(self):
+        # Importación diferida: el resto del proyecto se puede importar fuera de Windows
+        import win32api
+        import win32gui
+        import win32process
+
+        self._win32api = win32api
+        self._win32gui = win32gui
+        self._win32process = win32process
+
+        # Variantes *Ex con distribución explícita y sondas de cuelgue
+        # (instancia propia para fijar los tipos: punteros y LPARAM de 64 bits)
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.WinDLL("user32")
+        user32.GetKeyboardLayout.argtypes = (wintypes.DWORD,)
+        user32.GetKeyboardLayout.restype = wintypes.HKL
+        user32.VkKeyScanExW.argtypes = (wintypes.WCHAR, wintypes.HKL)
+        user32.VkKeyScanExW.restype = ctypes.c_short
+        user32.MapVirtualKeyExW.argtypes = (wintypes.UINT, wintypes.UINT, wintypes.HKL)
+        user32.MapVirtualKeyExW.restype = wintypes.UINT
+        user32.IsHungAppWindow.argtypes = (wintypes.HWND,)
+        user32.IsHungAppWindow.restype = wintypes.BOOL
+        user32.SendMessageTimeoutW.argtypes = (wintypes.HWND, wintypes.UINT, wintypes.WPARAM,
+                                               wintypes.LPARAM, wintypes.UINT, wintypes.UINT,
+                                               ctypes.POINTER(ctypes.c_size_t))
+        user32.SendMessageTimeoutW.restype = wintypes.LPARAM
+        self._user32 = user32
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        windows = []
+
+        def callback(hwnd, _):
+            if self._win32gui.IsWindowVisible(hwnd):
+                windows.append((hwnd, self._win32gui.GetWindowText(hwnd)))
+
+        self._win32gui.EnumWindows(callback, None)
+        return windows
+
+    def enum_window_handles(self) -> List[int]:
+        handles = []
+
+        def callback(hwnd, _):
+            if self._win32gui.IsWindowVisible(hwnd):
+                handles.append(hwnd)
+
+        self._win32gui.EnumWindows(callback, None)
+        return handles
+
+    def get_window_text(self, hwnd: int) -> str:
+        return self._win32gui.GetWindowText(hwnd)
+
+    def get_class_name(self, hwnd: int) -> Optional[str]:
+        try:
+            return self._win32gui.GetClassName(hwnd)
+        except Exception:
+            return None
+
+    def get_process_exe(self, pid: int) -> Optional[str]:
+        """QueryFullProcessImageNameW con acceso limitado (funciona sin privilegios de admin)"""
+        import ctypes
+        import os
+        from ctypes import wintypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            size = wintypes.DWORD(260)
+            buffer = ctypes.create_unicode_buffer(size.value)
+            if not kernel32.QueryFullProcessImageNameW(handle, 0, buffer, ctypes.byref(size)):
+                return None
+            return os.path.basename(buffer.value)
+        finally:
+            kernel32.CloseHandle(handle)
+
+    def get_foreground_window(self) -> int:
+        return self._win32gui.GetForegroundWindow()
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int):
+        self._win32api.PostMessage(hwnd, msg, wparam, lparam)
+
+    def get_process_id(self, hwnd: int) -> Optional[int]:
+        try:
+            _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+            return pid
+        except Exception:
+            return None
+
+    def vk_key_scan(self, char: str, layout: int = 0) -> int:
+        if layout:
+            return self._user32.VkKeyScanExW(char, layout)
+        return self._win32api.VkKeyScan(char)
+
+    def map_virtual_key(self, vk: int, layout: int = 0) -> int:
+        MAPVK_VK_TO_VSC = 0
+        if layout:
+            return self._user32.MapVirtualKeyExW(vk, MAPVK_VK_TO_VSC, layout)
+        return self._win32api.MapVirtualKey(vk, MAPVK_VK_TO_VSC)
+
+    def get_keyboard_layout(self, hwnd: int = 0) -> int:
+        """
+        Distribución del hilo de la ventana (la del juego), no la del hilo que llama:
+        el listener corre en su propio hilo y no ve los cambios hechos en el juego
+        """
+        try:
+            if not hwnd:
+                hwnd = self._win32gui.GetForegroundWindow()
+            thread_id = self._win32process.GetWindowThreadProcessId(hwnd)[0] if hwnd else 0
+        except Exception:
+            thread_id = 0
+        return self._user32.GetKeyboardLayout(thread_id) or 0
+
+    # Tiempo máximo de espera de la sonda WM_NULL (ms)
+    hung_probe_timeout_ms = 100
+
+    def is_hung(self, hwnd: int) -> bool:
+        """IsHungAppWindow y, si no lo marca, una sonda WM_NULL con SendMessageTimeout"""
+        import ctypes
+
+        user32 = self._user32
+        if user32.IsHungAppWindow(hwnd):
+            return True
+
+        WM_NULL = 0x0000
+        SMTO_ABORTIFHUNG = 0x0002
+        result = ctypes.c_size_t()   # DWORD_PTR: 8 bytes en 64 bits
+        ok = user32.SendMessageTimeoutW(hwnd, WM_NULL, 0, 0, SMTO_ABORTIFHUNG,
+                                        self.hung_probe_timeout_ms, ctypes.byref(result))
+        return not ok
+
+    def watch_foreground(self, callback: Callable[[int], None]):
+        """Suscripción a EVENT_SYSTEM_FOREGROUND; si falla, sondeo de respaldo"""
+        self.unwatch_foreground()
+        self._foreground_callback = callback
+        started = threading.Event()
+        self._hook_ok = False
+
+        thread = threading.Thread(target=self._win_event_loop,
+                                  args=(callback, started),
+                                  name="foreground-hook",
+                                  daemon=True)
+        thread.start()
+        started.wait(1.0)
+
+        if not self._hook_ok:
+            super().watch_foreground(callback)
+            return
+
+        # Valor inicial: el hook solo notifica cambios
+        callback(self.get_foreground_window())
+
+    def unwatch_foreground(self):
+        hook_thread_id = getattr(self, "_hook_thread_id", None)
+        if hook_thread_id:
+            import ctypes
+            WM_QUIT = 0x0012
+            ctypes.windll.user32.PostThreadMessageW(hook_thread_id, WM_QUIT, 0, 0)
+            self._hook_thread_id = None
+        super().unwatch_foreground()
+
+    def _win_event_loop(self, callback: Callable[[int], None], started: threading.Event):
+        """Hilo con bucle de mensajes propio para recibir los WinEvents"""
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            user32 = ctypes.windll.user32
+            kernel32 = ctypes.windll.kernel32
+
+            EVENT_SYSTEM_FOREGROUND = 0x0003
+            WINEVENT_OUTOFCONTEXT = 0x0000
+
+            WinEventProc = ctypes.WINFUNCTYPE(None, wintypes.HANDLE, wintypes.DWORD,
+                                              wintypes.HWND, wintypes.LONG, wintypes.LONG,
+                                              wintypes.DWORD, wintypes.DWORD)
+
+            def on_event(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+                callback(hwnd or 0)
+
+            # Mantener la referencia mientras dure el hook
+            proc = WinEventProc(on_event)
+            hook = user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND,
+                                          0, proc, 0, 0, WINEVENT_OUTOFCONTEXT)
+        except Exception:
+            hook = None
+
+        if not hook:
+            started.set()
+            return
+
+        self._hook_thread_id = kernel32.GetCurrentThreadId()
+        self._hook_ok = True
+        started.set()
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        user32.UnhookWinEvent(hook)
+
+
+class SimulatedWindow:
+    """Ventana de cliente simulada: cola de mensajes procesada con una latencia fija"""
+
+    # Límite de mensajes en cola (como la cuota de 10000 de Windows)
+    MESSAGE_QUOTA = 10000
+
+    def __init__(self, hwnd: int, pid: int, title: str, latency_ms: float = 0.0,
+                 class_name: str = "GxWindowClass", exe: str = "WoW.exe"):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.title = title
+        self.latency_ms = latency_ms
+        self.class_name = class_name
+        self.exe = exe
+
+        # Una ventana colgada acepta mensajes pero no los procesa
+        self.hung = False
+        self._responsive = threading.Event()
+        self._responsive.set()
+
+        # (msg, wparam, lparam, t_post_ns, t_procesado_ns)
+        self.received: List[Tuple[int, int, int, int, int]] = []
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run,
+                                        name=f"sim-window-{hwnd:x}",
+                                        daemon=True)
+        self._thread.start()
+
+    def post(self, msg: int, wparam: int, lparam: int):
+        if self._queue.qsize() >= self.MESSAGE_QUOTA:
+            raise OSError("cola de mensajes llena")
+        self._queue.put((msg, wparam, lparam, time.perf_counter_ns()))
+
+    def set_hung(self, hung: bool):
+        """Cuelga o recupera la ventana"""
+        self.hung = hung
+        if hung:
+            self._responsive.clear()
+        else:
+            self._responsive.set()
+
+    def close(self):
+        self._queue.put(None)
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """Espera hasta que la cola de mensajes esté vacía"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            self._responsive.wait()
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000.0)
+
+            msg, wparam, lparam, t_post = item
+            self.received.append((msg, wparam, lparam, t_post, time.perf_counter_ns()))
+            self._queue.task_done()
+
+
+class SimulatedBackend(WindowBackend):
+    """Backend en memoria que modela N ventanas de cliente (para perfilar en Linux)"""
+
+    def __init__(self, window_count: int = 0, latency_ms: float = 0.0,
+                 title: str = "World of Warcraft"):
+        self.windows: Dict[int, SimulatedWindow] = {}
+        self.foreground: int = 0
+        self.latency_ms = latency_ms
+        self.title = title
+        self.keyboard_layout = SIMULATED_LAYOUT_US
+
+        self._hwnds = itertools.count(0x10000, 0x10)
+        self._pids = itertools.count(1000)
+        self._lock = threading.Lock()
+
+        for _ in range(window_count):
+            self.add_window()
+
+        if self.windows:
+            self.foreground = next(iter(self.windows))
+
+    # === Control de la simulación ===
+
+    def add_window(self, title: Optional[str] = None,
+                   latency_ms: Optional[float] = None,
+                   hwnd: Optional[int] = None,
+                   class_name: str = "GxWindowClass",
+                   exe: str = "WoW.exe") -> int:
+        """Crea una ventana simulada (con el HWND indicado o uno nuevo) y devuelve su HWND"""
+        with self._lock:
+            if hwnd is None:
+                hwnd = next(self._hwnds)
+            pid = next(self._pids)
+            window = SimulatedWindow(hwnd, pid,
+                                     title if title is not None else f"{self.title} ({pid})",
+                                     self.latency_ms if latency_ms is None else latency_ms,
+                                     class_name, exe)
+            self.windows[hwnd] = window
+        return hwnd
+
+    def remove_window(self, hwnd: int):
+        """Destruye una ventana simulada"""
+        with self._lock:
+            window = self.windows.pop(hwnd, None)
+        if window:
+            window.close()
+
+    def set_foreground(self, hwnd: int):
+        """Cambia la ventana activa simulada y emite el evento de cambio"""
+        changed = hwnd != self.foreground
+        self.foreground = hwnd
+        callback = self._foreground_callback
+        if changed and callback:
+            callback(hwnd)
+
+    def set_keyboard_layout(self, layout: int):
+        """Cambia la distribución de teclado de todas las ventanas simuladas"""
+        self.keyboard_layout = layout
+
+    def set_hung(self, hwnd: int, hung: bool = True):
+        """Cuelga o recupera una ventana simulada"""
+        self.windows[hwnd].set_hung(hung)
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """Espera a que todas las ventanas hayan procesado sus mensajes"""
+        return all(w.wait_idle(timeout) for w in list(self.windows.values()))
+
+    def close(self):
+        """Detiene los hilos de todas las ventanas simuladas"""
+        for hwnd in list(self.windows):
+            self.remove_window(hwnd)
+
+    # === WindowBackend ===
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            return [(hwnd, w.title) for hwnd, w in self.windows.items()]
+
+    def enum_window_handles(self) -> List[int]:
+        with self._lock:
+            return list(self.windows)
+
+    def get_window_text(self, hwnd: int) -> str:
+        window = self.windows.get(hwnd)
+        return window.title if window else ""
+
+    def get_class_name(self, hwnd: int) -> Optional[str]:
+        window = self.windows.get(hwnd)
+        return window.class_name if window else None
+
+    def get_process_exe(self, pid: int) -> Optional[str]:
+        for window in list(self.windows.values()):
+            if window.pid == pid:
+                return window.exe
+        return None
+
+    def get_foreground_window(self) -> int:
+        return self.foreground
+
+    def watch_foreground(self, callback: Callable[[int], None]):
+        # Los eventos los dispara set_foreground(); no hace falta sondear
+        self._foreground_callback = callback
+        callback(self.foreground)
+
+    def unwatch_foreground(self):
+        self._foreground_callback = None
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int):
+        window = self.windows.get(hwnd)
+        if window is None:
+            raise OSError(f"Ventana inválida: {hwnd}")
+        window.post(msg, wparam, lparam)
+
+    def get_process_id(self, hwnd: int) -> Optional[int]:
+        window = self.windows.get(hwnd)
+        return window.pid if window else None
+
+    def is_hung(self, hwnd: int) -> bool:
+        window = self.windows.get(hwnd)
+        return window is not None and window.hung
+
+    def get_keyboard_layout(self, hwnd: int = 0) -> int:
+        return self.keyboard_layout
+
+    def vk_key_scan(self, char: str, layout: int = 0) -> int:
+        # Aproximación de una distribución US: letras y números coinciden con su VK.
+        # En la francesa se intercambian A/Q y Z/W, como en AZERTY
+        if char.isalpha() and char.isascii():
+            shift = 0x100 if char.isupper() else 0
+            vk = ord(char.upper())
+            if (layout or self.keyboard_layout) == SIMULATED_LAYOUT_FR:
+                vk = _AZERTY_SWAPS.get(vk, vk)
+            return shift | vk
+        if char.isdigit() or char == ' ':
+            return ord(char)
+        return -1
+
+    def map_virtual_key(self, vk: int, layout: int = 0) -> int:
+        return _SIMULATED_SCAN_CODES.get(vk, 0)
+
+
+def create_default_backend() -> WindowBackend:
+    """Crea el backend de la plataforma actual"""
+    if sys.platform == "win32":
+        return Win32Backend()
+    raise RuntimeError("No hay backend nativo para esta plataforma; usa SimulatedBackend")
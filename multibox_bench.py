@@ -0,0 +1,341 @@
+"""
+WoW Multiboxing Bench
+Benchmarks de los caminos calientes del engine contra el backend simulado (que guarda
+el instante de cada PostMessage): replicate_key, on_key_press, send_command_to_slaves,
+find_wow_windows y, si hay pantalla, los callbacks update_windows_list y
+add_log_messages de la GUI. Se ejecuta con 1, 5, 10 y 40 ventanas y mide el coste
+de cada llamada (percentiles) y el rendimiento (operaciones por segundo).
+
+Los resultados se pueden guardar como línea base (JSON) y comparar con ella: el
+proceso termina con código 1 si algún caso empeora más que el umbral configurado.
+
+  python multibox_bench.py --save-baseline bench_baseline.json
+  python multibox_bench.py --baseline bench_baseline.json [--threshold 0.3]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from multibox_backend import SimulatedBackend
+from multibox_config import ConfigSnapshot
+from multibox_engine import WoWMultiboxEngine
+from multibox_log import INFO, LogRecord
+
+DEFAULT_WINDOW_COUNTS = (1, 5, 10, 40)
+DEFAULT_THRESHOLD = 0.30
+
+# Diferencias de p50 por debajo de esto se consideran ruido del reloj (µs)
+MIN_DELTA_US = 2.0
+
+# Ventanas ajenas al juego en el escritorio simulado (para find_wow_windows)
+DESKTOP_NOISE_WINDOWS = 200
+
+# Llamadas sin medir antes de cada caso (cachés, carriles y ventanas ya creados)
+WARMUP_OPS = 50
+
+# Cada cuántas operaciones se espera a que los carriles se vacíen (sin descartes)
+DRAIN_EVERY = 16
+
+_KEYS = "1234567890"
+
+
+class BenchResult:
+    """
+    Coste de cada llamada (muestras exactas en ns: las cubetas x1.25 del histograma
+    del engine son demasiado gruesas para comparar con un umbral) y duración total
+    """
+
+    __slots__ = ("name", "windows", "samples", "elapsed_s", "extra")
+
+    def __init__(self, name: str, windows: int):
+        self.name = name
+        self.windows = windows
+        self.samples: List[int] = []
+        self.elapsed_s = 0.0
+        self.extra: Dict = {}
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}/{self.windows}"
+
+    def percentile(self, pct: float) -> float:
+        """Percentil en µs (vecino más cercano)"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+        return ordered[idx] / 1000.0
+
+    def to_dict(self) -> Dict:
+        count = len(self.samples)
+        data = {
+            "ops": count,
+            "ops_per_s": count / self.elapsed_s if self.elapsed_s else 0.0,
+            "p50_us": self.percentile(50),
+            "p95_us": self.percentile(95),
+            "p99_us": self.percentile(99),
+            "max_us": max(self.samples) / 1000.0 if count else 0.0,
+        }
+        data.update(self.extra)
+        return data
+
+
+def _make_engine(windows: int) -> Tuple[WoWMultiboxEngine, SimulatedBackend]:
+    """
+    Engine con N+1 ventanas simuladas (la activa más N destinos) y la configuración
+    por defecto, sin delays de chat, para que los resultados no dependan del fichero del usuario
+    """
+    backend = SimulatedBackend(windows + 1)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    engine.apply_config(ConfigSnapshot(chat_open_delay_ms=0, chat_char_delay_ms=0,
+                                       chat_send_delay_ms=0, follow_target="Main"))
+    engine.find_wow_windows()
+    engine.set_main_window(next(iter(backend.windows)))
+    engine.active = True
+    return engine, backend
+
+
+def _run(result: BenchResult, engine: WoWMultiboxEngine, ops: int,
+         call: Callable[[int], None], drain: bool = True) -> BenchResult:
+    """Ejecuta call(i) ops veces midiendo cada llamada; el total incluye vaciar los carriles"""
+    for idx in range(WARMUP_OPS):
+        call(idx)
+    if drain:
+        engine.dispatcher.wait_idle()
+
+    # Como timeit: sin recolector durante la medida
+    gc.collect()
+    gc.disable()
+    try:
+        record = result.samples.append
+        clock = time.perf_counter_ns
+        start = time.perf_counter()
+        for idx in range(ops):
+            t0 = clock()
+            call(idx)
+            record(clock() - t0)
+            if drain and idx % DRAIN_EVERY == DRAIN_EVERY - 1:
+                engine.dispatcher.wait_idle()
+        if drain:
+            engine.dispatcher.wait_idle()
+        result.elapsed_s = time.perf_counter() - start
+    finally:
+        gc.enable()
+    return result
+
+
+def _post_latency(engine: WoWMultiboxEngine) -> Dict:
+    """Latencia listener -> PostMessage medida por el engine"""
+    overall = engine.get_latency_stats()["overall"]
+    return {"post_p50_us": overall["p50_us"], "post_p99_us": overall["p99_us"]}
+
+
+def bench_replicate_key(engine: WoWMultiboxEngine, windows: int, ops: int) -> BenchResult:
+    engine.reset_latency_stats()
+
+    def call(idx):
+        key = _KEYS[idx % len(_KEYS)]
+        engine.replicate_key(key, time.perf_counter_ns())
+        engine.release_key(key)
+
+    result = _run(BenchResult("replicate_key", windows), engine, ops, call)
+    result.extra.update(_post_latency(engine))
+    return result
+
+
+def bench_on_key_press(engine: WoWMultiboxEngine, windows: int, ops: int) -> BenchResult:
+    engine.reset_latency_stats()
+
+    def call(idx):
+        key = _KEYS[idx % len(_KEYS)]
+        engine.on_key_press(key)
+        engine.on_key_release(key)
+
+    result = _run(BenchResult("on_key_press", windows), engine, ops, call)
+    result.extra.update(_post_latency(engine))
+    return result
+
+
+def bench_send_command(engine: WoWMultiboxEngine, windows: int, ops: int) -> BenchResult:
+    return _run(BenchResult("send_command_to_slaves", windows), engine, ops,
+                lambda idx: engine.send_command_to_slaves("/follow Main"))
+
+
+def bench_find_windows(engine: WoWMultiboxEngine, backend: SimulatedBackend,
+                       windows: int, ops: int) -> BenchResult:
+    """Rescaneo con un escritorio de cientos de ventanas; una de cada 10 cambia de título"""
+    noise = [backend.add_window(title=f"Documento {idx} - Editor", class_name="Notepad",
+                                exe="notepad.exe")
+             for idx in range(DESKTOP_NOISE_WINDOWS)]
+    engine.find_wow_windows()
+    targets = list(backend.windows.values())[:windows + 1]
+
+    def call(idx):
+        if idx % 10 == 0:
+            window = targets[idx % len(targets)]
+            window.title = f"World of Warcraft ({window.pid}) {idx}"
+        engine.find_wow_windows()
+
+    result = _run(BenchResult("find_wow_windows", windows), engine, ops, call, drain=False)
+    result.extra["queries_per_scan"] = engine.discovery.last_scan_queries
+    for hwnd in noise:
+        backend.remove_window(hwnd)
+    return result
+
+
+def bench_gui(engine: WoWMultiboxEngine, windows: int, ops: int) -> List[BenchResult]:
+    """Callbacks de la GUI con una ventana Tk oculta; [] si no hay pantalla o Tkinter"""
+    try:
+        import tkinter as tk
+        from multibox_gui import WoWMultiboxGUI
+        root = tk.Tk()
+    except Exception:
+        return []
+
+    try:
+        root.withdraw()
+        gui = WoWMultiboxGUI(root, engine, start_listener=False)
+        records = engine.wow_windows
+        hwnds = [w.hwnd for w in records]
+
+        def update_windows(idx):
+            # Alternar la MAIN obliga a repintar dos filas en cada llamada
+            engine.set_main_window(hwnds[idx % len(hwnds)])
+            gui.update_windows_list(engine.wow_windows)
+
+        batch = [LogRecord(seq, time.time(), INFO, "Tecla", f"'{_KEYS[seq % 10]}' -> {windows} ventana(s)")
+                 for seq in range(20)]
+
+        results = [
+            _run(BenchResult("gui.update_windows_list", windows), engine, ops, update_windows, drain=False),
+            _run(BenchResult("gui.add_log_messages", windows), engine, ops,
+                 lambda idx: gui.add_log_messages(batch), drain=False),
+        ]
+        return results
+    finally:
+        root.destroy()
+
+
+def run_suite(window_counts=DEFAULT_WINDOW_COUNTS, ops: int = 2000,
+              gui: bool = True, repeat: int = 3) -> Dict[str, Dict]:
+    """
+    Ejecuta todos los casos para cada número de ventanas; resultados por 'caso/ventanas'.
+    Cada caso se repite 'repeat' veces y se quedan el mejor p50 y el mejor rendimiento,
+    como timeit, para que la comparación con la línea base no dependa de interrupciones puntuales.
+    """
+    results: Dict[str, Dict] = {}
+    for windows in window_counts:
+        engine, backend = _make_engine(windows)
+        try:
+            for _ in range(max(1, repeat)):
+                cases = [
+                    bench_replicate_key(engine, windows, ops),
+                    bench_on_key_press(engine, windows, ops),
+                    bench_send_command(engine, windows, max(1, ops // 4)),
+                    bench_find_windows(engine, backend, windows, max(1, ops // 10)),
+                ]
+                if gui:
+                    cases.extend(bench_gui(engine, windows, max(1, ops // 10)))
+                for case in cases:
+                    data = case.to_dict()
+                    best = results.get(case.key)
+                    if best is not None:
+                        if data["p50_us"] >= best["p50_us"]:
+                            best["ops_per_s"] = max(best["ops_per_s"], data["ops_per_s"])
+                            continue
+                        data["ops_per_s"] = max(best["ops_per_s"], data["ops_per_s"])
+                    results[case.key] = data
+        finally:
+            engine.shutdown()
+            backend.close()
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict],
+            threshold: float) -> List[str]:
+    """
+    Casos que empeoran más que el umbral: p50 mayor (y por más de MIN_DELTA_US) o
+    rendimiento menor que el de la línea base
+    """
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        if (current["p50_us"] > base["p50_us"] * (1 + threshold)
+                and current["p50_us"] - base["p50_us"] > MIN_DELTA_US):
+            regressions.append(f"{key}: p50 {current['p50_us']:.1f} µs > base {base['p50_us']:.1f} µs")
+        if base["ops_per_s"] > 0 and current["ops_per_s"] < base["ops_per_s"] / (1 + threshold):
+            regressions.append(f"{key}: {current['ops_per_s']:.0f} op/s < base {base['ops_per_s']:.0f} op/s")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict]):
+    print(f"{'caso':<34} {'op/s':>10} {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9} {'máx µs':>10}")
+    for key, data in results.items():
+        print(f"{key:<34} {data['ops_per_s']:>10.0f} {data['p50_us']:>9.1f} {data['p95_us']:>9.1f} "
+              f"{data['p99_us']:>9.1f} {data['max_us']:>10.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos calientes del engine")
+    parser.add_argument("--windows", default=",".join(map(str, DEFAULT_WINDOW_COUNTS)),
+                        help="números de ventanas separados por comas")
+    parser.add_argument("--ops", type=int, default=2000, help="operaciones por caso")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones de cada caso (se queda el mejor resultado)")
+    parser.add_argument("--no-gui", action="store_true", help="omitir los callbacks de la GUI")
+    parser.add_argument("--json", metavar="RUTA", help="guardar los resultados en JSON")
+    parser.add_argument("--save-baseline", metavar="RUTA", help="guardar los resultados como línea base")
+    parser.add_argument("--baseline", metavar="RUTA", help="comparar con una línea base guardada")
+    parser.add_argument("--threshold", type=float,
+                        help=f"empeoramiento máximo tolerado (fracción; por defecto el de la "
+                             f"línea base o {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    window_counts = tuple(int(n) for n in args.windows.split(",") if n.strip())
+    results = run_suite(window_counts, args.ops, gui=not args.no_gui, repeat=args.repeat)
+    print_table(results)
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "ops": args.ops,
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "threshold": args.threshold if args.threshold is not None else DEFAULT_THRESHOLD,
+        "results": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=2)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No existe la línea base {args.baseline}", file=sys.stderr)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        threshold = args.threshold if args.threshold is not None else baseline.get("threshold",
+                                                                                   DEFAULT_THRESHOLD)
+        regressions = compare(results, baseline.get("results", {}), threshold)
+        if regressions:
+            print(f"\nRegresiones (umbral {threshold:.0%}):", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"\nSin regresiones respecto a {args.baseline} (umbral {threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+WoW Multiboxing Chat
+Inyección rápida de comandos de chat: cada comando se codifica una sola vez
+(ENTER + lote de WM_CHAR + ENTER) y se guarda en caché por texto
+"""
+
+import time
+from typing import Dict, Tuple
+
+from multibox_backend import WindowBackend, WM_CHAR, WM_KEYDOWN, WM_KEYUP
+from multibox_keymap import KeyTable
+
+# Mensaje ya codificado: (msg, wparam, lparam)
+Message = Tuple[int, int, int]
+
+# Duración máxima de cada trabajo de un comando en el carril de la ventana (segundos):
+# el vigilante de los carriles no debe confundir un comando largo con un carril atascado
+STAGE_MAX_SECONDS = 0.1
+
+
+class EncodedCommand:
+    """Mensajes precodificados de un comando, separados por etapa"""
+
+    __slots__ = ("command", "open_chat", "text", "send")
+
+    def __init__(self, command: str, open_chat: Tuple[Message, ...],
+                 text: Tuple[Message, ...], send: Tuple[Message, ...]):
+        self.command = command
+        self.open_chat = open_chat
+        self.text = text
+        self.send = send
+
+
+class ChatInjector:
+    """Codifica comandos de chat y los inyecta en una ventana con delays por etapa"""
+
+    MAX_CACHED = 256
+
+    def __init__(self, backend: WindowBackend, key_table: KeyTable):
+        self.backend = backend
+        self.key_table = key_table
+        self._cache: Dict[str, EncodedCommand] = {}
+
+        # Delays por etapa (segundos)
+        self.open_delay = 0.05
+        self.char_delay = 0.0
+        self.send_delay = 0.03
+
+    def configure(self, open_delay_ms: float, char_delay_ms: float, send_delay_ms: float):
+        """Ajusta los delays de cada etapa"""
+        self.open_delay = open_delay_ms / 1000.0
+        self.char_delay = char_delay_ms / 1000.0
+        self.send_delay = send_delay_ms / 1000.0
+
+    def clear_cache(self):
+        """Olvida los comandos codificados (p. ej. al cambiar la distribución del teclado)"""
+        self._cache = {}
+
+    def encode(self, command: str) -> EncodedCommand:
+        """Codifica un comando (resultado en caché por texto)"""
+        encoded = self._cache.get(command)
+        if encoded is not None:
+            return encoded
+
+        enter = self.key_table.get("enter")
+        enter_press = ((WM_KEYDOWN, enter.vk, enter.lparam_down),
+                       (WM_KEYUP, enter.vk, enter.lparam_up))
+
+        text = []
+        for char in command:
+            entry = self.key_table.get(char)
+            scan = entry.scan if entry is not None else 0
+            text.append((WM_CHAR, ord(char), 1 | (scan << 16)))
+
+        encoded = EncodedCommand(command, enter_press, tuple(text), enter_press)
+
+        if len(self._cache) >= self.MAX_CACHED:
+            self._cache.clear()
+        self._cache[command] = encoded
+        return encoded
+
+    def post_batch(self, hwnd: int, messages: Tuple[Message, ...], delay: float = 0.0):
+        """Envía un lote de mensajes, con pausa opcional entre cada uno"""
+        post = self.backend.post_message
+        for msg, wparam, lparam in messages:
+            post(hwnd, msg, wparam, lparam)
+            if delay:
+                time.sleep(delay)
+
+    def post_stage(self, hwnd: int, messages: Tuple[Message, ...], delay: float, pause: float):
+        """Una etapa de un comando: lote de mensajes y pausa posterior"""
+        self.post_batch(hwnd, messages, delay)
+        if pause:
+            time.sleep(pause)
+
+    def stages(self, encoded: EncodedCommand) -> Tuple[Tuple[Tuple[Message, ...], float, float], ...]:
+        """
+        Divide un comando en etapas (mensajes, pausa entre mensajes, pausa final) que no
+        duran más de STAGE_MAX_SECONDS cada una, con los delays configurados
+        """
+        stages = [(encoded.open_chat, 0.0, 0.0)]
+        self._add_pause(stages, self.open_delay)
+
+        # Texto como WM_CHAR (sin KEYDOWN: evita letras duplicadas)
+        text, char_delay = encoded.text, self.char_delay
+        if not char_delay:
+            stages.append((text, 0.0, 0.0))
+        elif char_delay <= STAGE_MAX_SECONDS:
+            per_stage = int(STAGE_MAX_SECONDS / char_delay)
+            stages.extend((text[idx:idx + per_stage], char_delay, 0.0)
+                          for idx in range(0, len(text), per_stage))
+        else:
+            for message in text:
+                stages.append(((message,), 0.0, 0.0))
+                self._add_pause(stages, char_delay)
+        self._add_pause(stages, self.send_delay)
+
+        stages.append((encoded.send, 0.0, 0.0))
+        return tuple(stages)
+
+    @staticmethod
+    def _add_pause(stages: list, seconds: float):
+        while seconds > 0:
+            pause = min(seconds, STAGE_MAX_SECONDS)
+            stages.append(((), 0.0, pause))
+            seconds -= pause
+
+    def jobs(self, hwnd: int, encoded: EncodedCommand) -> Tuple[tuple, ...]:
+        """
+        Trabajos (fn, args) que escriben el comando en el chat de una ventana. Deben
+        encolarse juntos en su carril (DispatchEngine.submit_many) para que nada se intercale.
+        """
+        post_stage = self.post_stage
+        return tuple((post_stage, (hwnd, messages, delay, pause))
+                     for messages, delay, pause in self.stages(encoded))
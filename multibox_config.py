@@ -0,0 +1,288 @@
+"""
+WoW Multiboxing Config
+Configuración inmutable: cada carga o cambio produce un ConfigSnapshot nuevo (conjuntos
+congelados, delays ya convertidos a segundos) que el engine sustituye por referencia,
+así el listener nunca ve una configuración a medio actualizar.
+ConfigStore escribe el fichero de forma atómica (temporal + renombrado), agrupa las
+escrituras seguidas y recarga el fichero cuando cambia en disco.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, Mapping, Optional
+
+from multibox_discovery import DEFAULT_WINDOW_MATCH
+
+# Atajos por defecto: tecla -> acción
+DEFAULT_HOTKEYS = {
+    "f12": "toggle_active",
+    "f11": "refresh_windows",
+    "f10": "toggle_pause",
+    "f9": "follow",
+    "f8": "assist",
+    "f7": "toggle_solo_main",
+}
+
+DEFAULT_KEYS_TO_REPLICATE = frozenset('abcdefghijklmnopqrstuvwxyz1234567890 ')
+DEFAULT_BLACKLIST = frozenset(['b', 'm'])
+
+# Pulsación de las teclas automáticas cuando el delay está desactivado
+DEFAULT_KEY_HOLD = 0.03
+
+
+def _freeze(value: Optional[Dict]) -> Mapping:
+    return MappingProxyType(dict(value or {}))
+
+
+class ConfigSnapshot:
+    """Configuración de solo lectura con los valores derivados ya calculados"""
+
+    __slots__ = ("follow_target", "assist_target", "delay_enabled", "delay_ms",
+                 "discovery_interval_ms", "chat_open_delay_ms", "chat_char_delay_ms",
+                 "chat_send_delay_ms", "log_level", "hotkeys", "window_groups", "key_routes",
+                 "macros", "queue_capacity", "queue_overflow", "hung_probe_ms",
+                 "shard_workers", "window_match", "keys_to_replicate", "blacklisted_keys",
+                 # Derivados
+                 "replicable_keys", "key_hold", "discovery_interval", "hung_probe_interval")
+
+    def __init__(self,
+                 follow_target: str = "",
+                 assist_target: str = "",
+                 delay_enabled: bool = False,
+                 delay_ms: int = 10,
+                 discovery_interval_ms: int = 2000,
+                 chat_open_delay_ms: int = 50,
+                 chat_char_delay_ms: int = 0,
+                 chat_send_delay_ms: int = 30,
+                 log_level: str = "INFO",
+                 hotkeys: Optional[Dict[str, str]] = None,
+                 window_groups: Optional[Dict] = None,
+                 key_routes: Optional[Dict] = None,
+                 macros: Optional[Dict] = None,
+                 queue_capacity: int = 64,
+                 queue_overflow: str = "drop_oldest",
+                 hung_probe_ms: int = 250,
+                 shard_workers: int = 0,
+                 window_match: Optional[Dict] = None,
+                 keys_to_replicate: FrozenSet[str] = DEFAULT_KEYS_TO_REPLICATE,
+                 blacklisted_keys: FrozenSet[str] = DEFAULT_BLACKLIST):
+        values = {
+            "follow_target": follow_target,
+            "assist_target": assist_target,
+            "delay_enabled": bool(delay_enabled),
+            "delay_ms": delay_ms,
+            "discovery_interval_ms": discovery_interval_ms,
+            "chat_open_delay_ms": chat_open_delay_ms,
+            "chat_char_delay_ms": chat_char_delay_ms,
+            "chat_send_delay_ms": chat_send_delay_ms,
+            "log_level": log_level,
+            "hotkeys": _freeze(DEFAULT_HOTKEYS if hotkeys is None else hotkeys),
+            "window_groups": _freeze(window_groups),
+            "key_routes": _freeze(key_routes),
+            "macros": _freeze(macros),
+            "queue_capacity": queue_capacity,
+            "queue_overflow": queue_overflow,
+            "hung_probe_ms": hung_probe_ms,
+            "shard_workers": shard_workers,
+            "window_match": _freeze(DEFAULT_WINDOW_MATCH if window_match is None else window_match),
+            "keys_to_replicate": frozenset(keys_to_replicate),
+            "blacklisted_keys": frozenset(blacklisted_keys),
+        }
+        values["replicable_keys"] = values["keys_to_replicate"] - values["blacklisted_keys"]
+        values["key_hold"] = delay_ms / 1000.0 if delay_enabled else DEFAULT_KEY_HOLD
+        values["discovery_interval"] = discovery_interval_ms / 1000.0
+        values["hung_probe_interval"] = hung_probe_ms / 1000.0
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot es inmutable; usa replace()")
+
+    def replace(self, **changes) -> "ConfigSnapshot":
+        """Copia con algunos valores cambiados"""
+        values = {name: getattr(self, name) for name in self._fields()}
+        unknown = set(changes) - set(values)
+        if unknown:
+            raise KeyError(f"claves de configuración desconocidas: {', '.join(sorted(unknown))}")
+        values.update(changes)
+        return ConfigSnapshot(**values)
+
+    @staticmethod
+    def _fields():
+        return ConfigSnapshot.__slots__[:ConfigSnapshot.__slots__.index("replicable_keys")]
+
+    @classmethod
+    def from_dict(cls, saved: Dict) -> "ConfigSnapshot":
+        """Construye una configuración a partir del JSON guardado (con valores por defecto)"""
+        blacklist = saved.get("blacklisted_keys", "b,m")
+        if isinstance(blacklist, str):
+            blacklist = blacklist.split(',') if blacklist else DEFAULT_BLACKLIST
+        return cls(
+            follow_target=saved.get("follow_target", ""),
+            assist_target=saved.get("assist_target", ""),
+            delay_enabled=saved.get("delay_enabled", False),
+            delay_ms=saved.get("delay_ms", 10),
+            discovery_interval_ms=saved.get("discovery_interval_ms", 2000),
+            chat_open_delay_ms=saved.get("chat_open_delay_ms", 50),
+            chat_char_delay_ms=saved.get("chat_char_delay_ms", 0),
+            chat_send_delay_ms=saved.get("chat_send_delay_ms", 30),
+            log_level=saved.get("log_level", "INFO"),
+            hotkeys=saved.get("hotkeys", DEFAULT_HOTKEYS),
+            window_groups=saved.get("window_groups", {}),
+            key_routes=saved.get("key_routes", {}),
+            macros=saved.get("macros", {}),
+            queue_capacity=saved.get("queue_capacity", 64),
+            queue_overflow=saved.get("queue_overflow", "drop_oldest"),
+            hung_probe_ms=saved.get("hung_probe_ms", 250),
+            shard_workers=saved.get("shard_workers", 0),
+            window_match=saved.get("window_match", DEFAULT_WINDOW_MATCH),
+            blacklisted_keys=frozenset(blacklist),
+        )
+
+    def to_dict(self) -> Dict:
+        """Datos que se guardan en el fichero JSON"""
+        return {
+            "follow_target": self.follow_target,
+            "assist_target": self.assist_target,
+            "delay_enabled": self.delay_enabled,
+            "delay_ms": self.delay_ms,
+            "discovery_interval_ms": self.discovery_interval_ms,
+            "chat_open_delay_ms": self.chat_open_delay_ms,
+            "chat_char_delay_ms": self.chat_char_delay_ms,
+            "chat_send_delay_ms": self.chat_send_delay_ms,
+            "log_level": self.log_level,
+            "hotkeys": dict(self.hotkeys),
+            "window_groups": dict(self.window_groups),
+            "key_routes": dict(self.key_routes),
+            "macros": dict(self.macros),
+            "queue_capacity": self.queue_capacity,
+            "queue_overflow": self.queue_overflow,
+            "hung_probe_ms": self.hung_probe_ms,
+            "shard_workers": self.shard_workers,
+            "window_match": dict(self.window_match),
+            "blacklisted_keys": ','.join(sorted(self.blacklisted_keys)),
+        }
+
+
+class ConfigStore:
+    """
+    Fichero de configuración. Un hilo propio hace todas las operaciones de disco:
+    escrituras diferidas (varias peticiones seguidas producen una sola escritura)
+    y comprobación periódica de la fecha de modificación para recargar en caliente.
+    """
+
+    def __init__(self, path: str,
+                 on_reload: Optional[Callable[[], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 poll_interval: float = 1.0,
+                 debounce: float = 0.5):
+        self.path = path
+        self.on_reload = on_reload
+        self.on_error = on_error
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        # Fecha de modificación conocida (la de la última carga o escritura propia)
+        self._mtime_ns: Optional[int] = None
+
+        self._pending: Optional[ConfigSnapshot] = None
+        self._save_deadline = 0.0
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self) -> Optional[ConfigSnapshot]:
+        """Lee el fichero (None si no existe); lanza una excepción si no es válido"""
+        mtime = self._stat()
+        if mtime is None:
+            return None
+        with open(self.path, 'r') as f:
+            saved = json.load(f)
+        self._mtime_ns = mtime
+        return ConfigSnapshot.from_dict(saved)
+
+    def write(self, snapshot: ConfigSnapshot):
+        """Escribe el fichero de forma atómica: temporal en el mismo directorio + os.replace"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".multibox_config.", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot.to_dict(), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._mtime_ns = self._stat()
+
+    def request_save(self, snapshot: ConfigSnapshot):
+        """Programa una escritura diferida; solo se escribe la última configuración pedida"""
+        with self._cond:
+            self._pending = snapshot
+            self._save_deadline = time.monotonic() + self.debounce
+            self._cond.notify()
+
+    def flush(self):
+        """Escribe ya la configuración pendiente, si la hay"""
+        with self._cond:
+            snapshot = self._pending
+            self._pending = None
+        if snapshot is not None:
+            self.write(snapshot)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="config-store", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def _run(self):
+        next_poll = time.monotonic() + self.poll_interval
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                wake = next_poll
+                if self._pending is not None:
+                    wake = min(wake, self._save_deadline)
+                if wake > now:
+                    self._cond.wait(wake - now)
+                    continue
+                save_due = self._pending is not None and self._save_deadline <= now
+
+            try:
+                if save_due:
+                    self.flush()
+                if time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + self.poll_interval
+                    mtime = self._stat()
+                    if mtime is not None and mtime != self._mtime_ns and self._pending is None:
+                        self._mtime_ns = mtime
+                        if self.on_reload:
+                            self.on_reload()
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(e)
@@ -0,0 +1,342 @@
+"""
+WoW Multiboxing Daemon
+Modo sin interfaz: ejecuta el engine sin importar Tkinter y lo controla por un
+socket local (Unix si el sistema lo soporta, TCP en 127.0.0.1 si no).
+
+Protocolo de texto, una orden por línea y una respuesta JSON por línea:
+  toggle | pause | solo | follow | assist | refresh | status
+  macro <nombre> | key <tecla> [destino] | net | watch | stop
+'watch' deja la conexión abierta y envía un evento JSON por cada cambio de estado
+y por cada mensaje del log.
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from multibox_engine import WoWMultiboxEngine
+from multibox_log import LEVEL_NAMES
+from multibox_net import DEFAULT_NET_HOST, DEFAULT_NET_PORT, NetClient, NetServer
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "multibox.sock")
+DEFAULT_PORT = 47600
+
+# Periodo de vaciado del log y de envío en las conexiones 'watch' (segundos)
+LOG_POLL_INTERVAL = 0.1
+WATCH_INTERVAL = 0.25
+
+_LEVEL_LABELS = {level: name for name, level in LEVEL_NAMES.items()}
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """Conexión de control: una orden por línea"""
+
+    def handle(self):
+        daemon: "MultiboxDaemon" = self.server.multibox_daemon
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").strip()
+            if not line:
+                continue
+            if line == "watch":
+                daemon.stream(self.wfile)
+                return
+            try:
+                self.wfile.write((json.dumps(daemon.handle_command(line)) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                return
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socket, "AF_UNIX"):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+class MultiboxDaemon:
+    """Engine sin GUI con un servidor de control local"""
+
+    def __init__(self, engine: WoWMultiboxEngine, socket_path: Optional[str] = DEFAULT_SOCKET,
+                 port: int = DEFAULT_PORT):
+        self.engine = engine
+        self.socket_path = socket_path
+        self.port = port
+        self.address = ""
+        
+        # Difusión a otros equipos (opcional): NetServer o NetClient
+        self.net = None
+
+        # Órdenes sin argumentos: nombre -> método del engine
+        self.commands: Dict[str, Callable] = {
+            "toggle": engine.toggle_active,
+            "pause": engine.toggle_pause,
+            "solo": engine.toggle_solo_main,
+            "follow": engine.send_follow_command,
+            "assist": engine.send_assist_command,
+            "refresh": engine.refresh_windows,
+        }
+
+        # Versión del estado: las conexiones 'watch' esperan a que cambie
+        self._status_version = 0
+        self._status_cond = threading.Condition()
+        engine.on_status_change = self._on_status_change
+        engine.on_windows_updated = self._on_windows_updated
+
+        self._server: Optional[socketserver.BaseServer] = None
+        self._stop = threading.Event()
+
+    # === Estado ===
+
+    def _on_status_change(self):
+        with self._status_cond:
+            self._status_version += 1
+            self._status_cond.notify_all()
+
+    def _on_windows_updated(self, windows=None):
+        self._on_status_change()
+
+    # === Órdenes ===
+
+    def handle_command(self, line: str) -> Dict:
+        """Ejecuta una orden de control y devuelve la respuesta"""
+        parts = line.split(maxsplit=1)
+        name = parts[0].lower()
+        arg = parts[1].strip() if len(parts) > 1 else ""
+        engine = self.engine
+
+        try:
+            if name == "status":
+                return {"ok": True, "status": engine.get_status()}
+
+            if name == "macro":
+                count = engine.run_macro(arg)
+                return {"ok": count > 0, "count": count}
+
+            if name == "key":
+                key_args = arg.split()
+                if not key_args:
+                    return {"ok": False, "error": "uso: key <tecla> [destino]"}
+                count = engine.broadcast_key(*key_args[:2])
+                return {"ok": count > 0, "count": count}
+
+            if name == "net":
+                if self.net is None:
+                    return {"ok": False, "error": "la difusión a otros equipos no está activa"}
+                return {"ok": True, "net": self.net.stats()}
+
+            if name == "stop":
+                self._stop.set()
+                return {"ok": True}
+
+            action = self.commands.get(name)
+            if action is None:
+                return {"ok": False, "error": f"orden desconocida: {name}"}
+            result = action()
+            return {"ok": result is not False, "status": engine.get_status()}
+
+        except Exception as e:
+            engine.log("Error", f"Error en la orden '{line}': {e}")
+            return {"ok": False, "error": str(e)}
+
+    def stream(self, wfile):
+        """Envía estado y log a una conexión 'watch' hasta que se cierre"""
+        cursor = self.engine.log_ring.last_seq
+        version = -1
+        try:
+            while not self._stop.is_set():
+                with self._status_cond:
+                    if version == self._status_version:
+                        self._status_cond.wait(WATCH_INTERVAL)
+                    current = self._status_version
+
+                lines = []
+                if current != version:
+                    version = current
+                    lines.append({"event": "status", "status": self.engine.get_status()})
+
+                for record in self.engine.log_ring.since(cursor):
+                    cursor = record.seq
+                    lines.append({"event": "log", "time": record.created,
+                                  "level": _LEVEL_LABELS.get(record.level, str(record.level)),
+                                  "source": record.source, "message": record.message})
+
+                if lines:
+                    wfile.write("".join(json.dumps(l) + "\n" for l in lines).encode("utf-8"))
+                    wfile.flush()
+        except OSError:
+            pass
+
+    # === Servidor ===
+
+    def start_server(self) -> str:
+        """Abre el socket de control (Unix o, si no hay soporte, TCP local)"""
+        if _UnixServer is not None and self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            server = _UnixServer(self.socket_path, _ControlHandler)
+            os.chmod(self.socket_path, 0o600)
+            self.address = self.socket_path
+        else:
+            server = _TCPServer(("127.0.0.1", self.port), _ControlHandler)
+            self.address = f"127.0.0.1:{server.server_address[1]}"
+
+        server.multibox_daemon = self
+        self._server = server
+        threading.Thread(target=server.serve_forever, name="control-server", daemon=True).start()
+        return self.address
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, start_listener: bool = True, started: Optional[float] = None):
+        """
+        Arranca el engine y el servidor y vuelca el log a la consola hasta 'stop' o Ctrl+C.
+        started: instante (perf_counter) de inicio del proceso, para medir el arranque.
+        """
+        engine = self.engine
+        started = started if started is not None else time.perf_counter()
+        engine.find_wow_windows()
+        engine.start_window_discovery()
+        if start_listener:
+            try:
+                engine.start_keyboard_listener()
+            except ImportError as e:
+                engine.log("Error", f"No se pudo iniciar el listener de teclado: {e}")
+
+        if self.net is not None:
+            try:
+                self.net.start()
+            except (OSError, ValueError) as e:
+                engine.log("Error", f"No se pudo iniciar la difusión a otros equipos: {e}")
+                self.net = None
+
+        address = self.start_server()
+        engine.log("Sistema", f"Daemon escuchando en {address} "
+                              f"(listo en {(time.perf_counter() - started) * 1000:.0f} ms)")
+
+        cursor = 0
+        try:
+            while not self._stop.is_set():
+                for record in engine.log_ring.since(cursor):
+                    cursor = record.seq
+                    print(record.format(), flush=True)
+                self._stop.wait(LOG_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            for record in engine.log_ring.since(cursor):
+                print(record.format(), flush=True)
+
+    def shutdown(self):
+        """Cierra el servidor de control y detiene el engine"""
+        self._stop.set()
+        if self.net is not None:
+            self.net.stop()
+            self.net = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if _UnixServer is not None and self.address == self.socket_path:
+                try:
+                    os.unlink(self.socket_path)
+                except OSError:
+                    pass
+        with self._status_cond:
+            self._status_cond.notify_all()
+        self.engine.shutdown()
+
+
+def connect(socket_path: Optional[str] = DEFAULT_SOCKET, port: int = DEFAULT_PORT) -> socket.socket:
+    """Abre una conexión con el daemon (socket Unix si existe, si no TCP local)"""
+    if hasattr(socket, "AF_UNIX") and socket_path and os.path.exists(socket_path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(socket_path)
+        return sock
+    return socket.create_connection(("127.0.0.1", port))
+
+
+def send_command(command: str, socket_path: Optional[str] = DEFAULT_SOCKET,
+                 port: int = DEFAULT_PORT) -> Dict:
+    """Envía una orden al daemon y devuelve su respuesta"""
+    with connect(socket_path, port) as sock:
+        sock.sendall((command + "\n").encode("utf-8"))
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline().decode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WoW Multiboxing sin interfaz gráfica")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="ruta del socket Unix de control")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="puerto TCP local (alternativa)")
+    parser.add_argument("--tcp", action="store_true", help="usar TCP local aunque haya sockets Unix")
+    parser.add_argument("--no-listener", action="store_true", help="no capturar el teclado")
+    parser.add_argument("--simulated", type=int, metavar="N",
+                        help="usar N ventanas simuladas en lugar de las reales (pruebas)")
+    parser.add_argument("--net-serve", type=int, nargs="?", const=DEFAULT_NET_PORT, metavar="PUERTO",
+                        help="difundir teclas y comandos a otros equipos")
+    parser.add_argument("--net-connect", metavar="HOST[:PUERTO]",
+                        help="recibir teclas y comandos de otro equipo")
+    parser.add_argument("--net-tcp", action="store_true",
+                        help="usar el canal fiable TCP para la difusión")
+    parser.add_argument("--net-bind", default=DEFAULT_NET_HOST, metavar="DIRECCIÓN",
+                        help="interfaz en la que escucha --net-serve (por defecto solo este equipo)")
+    parser.add_argument("--net-secret", default=os.environ.get("MULTIBOX_NET_SECRET", ""),
+                        metavar="SECRETO",
+                        help="secreto compartido para firmar las tramas (o MULTIBOX_NET_SECRET)")
+    parser.add_argument("--net-allow", default="", metavar="IP[,IP...]",
+                        help="direcciones de los equipos remotos permitidos")
+    parser.add_argument("--send", metavar="ORDEN",
+                        help="enviar una orden a un daemon en marcha y salir ('watch' sigue los eventos)")
+    args = parser.parse_args()
+    socket_path = None if args.tcp else args.socket
+
+    if args.send:
+        if args.send == "watch":
+            with connect(socket_path, args.port) as sock:
+                sock.sendall(b"watch\n")
+                try:
+                    for line in sock.makefile("rb"):
+                        print(line.decode("utf-8").rstrip(), flush=True)
+                except KeyboardInterrupt:
+                    pass
+            return
+        response = send_command(args.send, socket_path, args.port)
+        print(json.dumps(response))
+        sys.exit(0 if response.get("ok") else 1)
+
+    started = time.perf_counter()
+    backend = None
+    if args.simulated is not None:
+        from multibox_backend import SimulatedBackend
+        backend = SimulatedBackend(args.simulated)
+
+    engine = WoWMultiboxEngine(backend)
+    daemon = MultiboxDaemon(engine, socket_path, args.port)
+    if args.net_serve is not None:
+        allow = [host.strip() for host in args.net_allow.split(",") if host.strip()]
+        daemon.net = NetServer(engine, args.net_bind, args.net_serve, args.net_tcp,
+                               secret=args.net_secret, allow=allow)
+    elif args.net_connect:
+        host, _, port = args.net_connect.partition(":")
+        daemon.net = NetClient(engine, host, int(port) if port else DEFAULT_NET_PORT, args.net_tcp,
+                               secret=args.net_secret)
+    daemon.run(start_listener=not args.no_listener, started=started)
+
+
+if __name__ == "__main__":
+    main()
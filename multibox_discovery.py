@@ -0,0 +1,272 @@
+"""
+WoW Multiboxing Discovery
+Descubrimiento incremental de ventanas: compara cada enumeración con la anterior
+y emite solo los cambios (añadidas, eliminadas, con título cambiado).
+La clasificación (clase de ventana, regex del título, ejecutable del proceso) es
+configurable y se guarda en caché: la clase por HWND, el ejecutable por PID y el
+resultado hasta que cambia el título o el proceso de la ventana.
+"""
+
+import re
+import threading
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+from multibox_backend import WindowBackend
+from multibox_registry import WindowRecord
+from multibox_trace import traced
+
+
+# Criterios por defecto: clientes de WoW (clase Gx*) con el título del juego al principio
+DEFAULT_WINDOW_MATCH = {
+    "classes": ["GxWindowClass", "GxWindowClassD3d", "GxWindowClassOpenGl"],
+    "titles": [r"^world of warcraft", r"^wow\b"],
+    "exes": [],
+}
+
+
+class WindowMatcher:
+    """
+    Criterios de clasificación de ventanas. Una ventana es de WoW si cumple todos los
+    criterios configurados; una lista vacía no filtra, y un valor que la plataforma no
+    puede dar (None) tampoco descarta la ventana.
+    """
+
+    __slots__ = ("classes", "titles", "exes", "_title_re")
+
+    def __init__(self, classes: Iterable[str] = (), titles: Iterable[str] = (),
+                 exes: Iterable[str] = ()):
+        self.classes = frozenset(name.lower() for name in classes)
+        self.exes = frozenset(name.lower() for name in exes)
+        self.titles = tuple(titles)
+        # Una sola regex compilada con las alternativas (re.error si alguna no es válida)
+        self._title_re = (re.compile("|".join(f"(?:{p})" for p in self.titles), re.IGNORECASE)
+                          if self.titles else None)
+
+    @classmethod
+    def from_config(cls, spec: Optional[Mapping]) -> "WindowMatcher":
+        """Construye los criterios desde la configuración ('classes', 'titles', 'exes')"""
+        spec = spec or DEFAULT_WINDOW_MATCH
+        return cls(spec.get("classes", ()), spec.get("titles", ()), spec.get("exes", ()))
+
+    def match_class(self, class_name: Optional[str]) -> bool:
+        return not self.classes or class_name is None or class_name.lower() in self.classes
+
+    def match_title(self, title: str) -> bool:
+        return self._title_re is None or self._title_re.search(title) is not None
+
+    def match_exe(self, exe: Optional[str]) -> bool:
+        return not self.exes or exe is None or exe.lower() in self.exes
+
+
+class WindowDelta:
+    """Cambios entre dos enumeraciones de ventanas"""
+
+    __slots__ = ("added", "removed", "changed")
+
+    def __init__(self, added: Tuple[WindowRecord, ...] = (),
+                 removed: Tuple[int, ...] = (),
+                 changed: Tuple[WindowRecord, ...] = ()):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"WindowDelta(+{len(self.added)}, -{len(self.removed)}, ~{len(self.changed)})"
+
+
+class WindowDiscovery:
+    """
+    Servicio de descubrimiento de ventanas de WoW.
+    Solo se lee el título de las ventanas cuya clase encaja, y solo las nuevas o con
+    título cambiado se clasifican y consultan su PID; los rescaneos se hacen en un
+    hilo propio para no bloquear el listener de teclado.
+    """
+
+    def __init__(self, backend: WindowBackend,
+                 on_delta: Optional[Callable[[WindowDelta], None]] = None,
+                 interval: float = 2.0,
+                 on_error: Optional[Callable[[Exception], None]] = None,
+                 matcher: Optional[WindowMatcher] = None):
+        self.backend = backend
+        self.on_delta = on_delta
+        self.on_error = on_error
+        self.interval = interval
+        self.matcher = matcher if matcher is not None else WindowMatcher.from_config(None)
+
+        # Títulos de las ventanas candidatas (clase válida) vistas en la última enumeración
+        self._titles: Dict[int, str] = {}
+        # Ventanas de WoW conocidas
+        self._records: Dict[int, WindowRecord] = {}
+
+        # Cachés de clasificación: clase válida por HWND y ejecutable válido por PID
+        self._class_ok: Dict[int, bool] = {}
+        self._exe_ok: Dict[int, bool] = {}
+
+        # Consultas a la plataforma en el último rescaneo (títulos, clases, PIDs, ejecutables)
+        self.last_scan_queries = 0
+
+        self._scan_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_wow_title(self, title: str) -> bool:
+        """Indica si el título corresponde a una ventana de WoW"""
+        return self.matcher.match_title(title)
+
+    def set_matcher(self, matcher: WindowMatcher):
+        """Cambia los criterios; el siguiente rescaneo vuelve a clasificar todas las ventanas"""
+        with self._scan_lock:
+            self.matcher = matcher
+            self._titles = {}
+            self._class_ok = {}
+            self._exe_ok = {}
+
+    @traced("discovery.scan")
+    def scan(self) -> WindowDelta:
+        """Enumera las ventanas, aplica los cambios al estado interno y los notifica"""
+        # El bloqueo cubre también la notificación para aplicar los cambios en orden
+        with self._scan_lock:
+            delta = self._diff()
+            if delta and self.on_delta:
+                self.on_delta(delta)
+        return delta
+
+    def _diff(self) -> WindowDelta:
+        backend = self.backend
+        matcher = self.matcher
+        class_ok = self._class_ok
+        added = []
+        changed = []
+        removed = []
+        queries = 0
+
+        handles = backend.enum_window_handles()
+        current: Dict[int, str] = {}
+        pids: Dict[int, int] = {}
+        for hwnd in handles:
+            pid = 0
+            # Clase: no cambia en la vida de la ventana, se consulta una vez por HWND
+            ok = class_ok.get(hwnd)
+            if ok is None:
+                ok = class_ok[hwnd] = matcher.match_class(backend.get_class_name(hwnd))
+                queries += 1
+            if not ok:
+                continue
+
+            title = backend.get_window_text(hwnd)
+            queries += 1
+            current[hwnd] = title
+            record = self._records.get(hwnd)
+
+            # Sin cambios desde la última enumeración: solo se comprueba que el proceso
+            # de las ventanas de WoW sigue siendo el mismo (HWND reutilizado)
+            if self._titles.get(hwnd) == title:
+                if record is None:
+                    continue
+                pid = backend.get_process_id(hwnd)
+                queries += 1
+                if pid == record.pid:
+                    pids[hwnd] = pid
+                    continue
+                del self._records[hwnd]
+                removed.append(hwnd)
+                record = None
+
+            if not matcher.match_title(title):
+                if record is not None:
+                    del self._records[hwnd]
+                    removed.append(hwnd)
+                continue
+
+            if record is not None and not pid:
+                # Título cambiado: el HWND también puede ser ahora de otro proceso
+                pid = backend.get_process_id(hwnd)
+                queries += 1
+                if pid != record.pid:
+                    del self._records[hwnd]
+                    removed.append(hwnd)
+                    record = None
+            elif not pid:
+                pid = backend.get_process_id(hwnd)
+                queries += 1
+            if not pid:
+                # Reintentar en el siguiente rescaneo
+                del current[hwnd]
+                continue
+            pids[hwnd] = pid
+
+            exe_ok = self._exe_ok.get(pid)
+            if exe_ok is None:
+                exe_ok = self._exe_ok[pid] = matcher.match_exe(backend.get_process_exe(pid))
+                queries += 1
+            if not exe_ok:
+                if record is not None:
+                    del self._records[hwnd]
+                    removed.append(hwnd)
+                continue
+
+            if record is not None:
+                record.title = title
+                changed.append(record)
+                continue
+
+            record = WindowRecord(hwnd, pid, title)
+            self._records[hwnd] = record
+            added.append(record)
+
+        # Ventanas de WoW que ya no existen
+        for hwnd in list(self._records):
+            if hwnd not in current:
+                del self._records[hwnd]
+                removed.append(hwnd)
+
+        # Cachés: solo las ventanas y procesos que siguen existiendo
+        if len(class_ok) > len(handles):
+            alive = set(handles)
+            self._class_ok = {hwnd: ok for hwnd, ok in class_ok.items() if hwnd in alive}
+        live_pids = set(pids.values())
+        if len(self._exe_ok) > len(live_pids):
+            self._exe_ok = {pid: ok for pid, ok in self._exe_ok.items() if pid in live_pids}
+
+        self._titles = current
+        self.last_scan_queries = queries
+        return WindowDelta(tuple(added), tuple(removed), tuple(changed))
+
+    # === Hilo de descubrimiento ===
+
+    def start(self):
+        """Inicia el rescaneo periódico en segundo plano"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="window-discovery", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el rescaneo periódico"""
+        self._stop.set()
+        self._wake.set()
+
+    def request_refresh(self):
+        """Pide un rescaneo inmediato sin bloquear al llamador"""
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+        else:
+            threading.Thread(target=self.scan, name="window-discovery-once", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.scan()
+            except Exception as e:
+                # El siguiente ciclo lo vuelve a intentar
+                if self.on_error:
+                    self.on_error(e)
@@ -0,0 +1,325 @@
+"""
+WoW Multiboxing Dispatch
+Carriles de envío por ventana: cada HWND tiene un hilo persistente con su propia cola
+acotada. Si una cola se llena se aplica la política de desbordamiento, y un cortocircuito
+deja de enviar a un cliente colgado hasta que se recupera, para que no afecte al resto.
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+# Políticas de desbordamiento de la cola de una ventana
+OVERFLOW_DROP_OLDEST = "drop_oldest"   # descartar el trabajo más antiguo
+OVERFLOW_COALESCE = "coalesce"         # descartar el nuevo si ya hay uno equivalente en cola
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+
+class WindowSender:
+    """
+    Carril de envío de una ventana: ejecuta sus trabajos en orden en un hilo propio.
+    Los trabajos críticos (KEYUP) nunca se descartan, para no dejar teclas atascadas.
+    """
+
+    def __init__(self, hwnd: int, on_error: Optional[Callable] = None,
+                 capacity: int = 64, overflow: str = OVERFLOW_DROP_OLDEST):
+        self.hwnd = hwnd
+        self.on_error = on_error
+        self.capacity = capacity
+        self.overflow = overflow
+
+        # Estadísticas y estado del cortocircuito
+        self.completed = 0
+        self.dropped = 0
+        self.failures = 0          # fallos consecutivos
+        self.tripped = False
+
+        self._jobs: "collections.deque" = collections.deque()
+        self._pending = 0          # en cola + en ejecución
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run,
+                                        name=f"sender-{hwnd:x}",
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def backlog(self) -> int:
+        """Trabajos en cola o en ejecución"""
+        return self._pending
+
+    def submit(self, fn: Callable, *args, critical: bool = False,
+               coalesce_key: Optional[tuple] = None) -> bool:
+        """
+        Encola un trabajo; nunca bloquea al llamador. False si se descartó.
+        coalesce_key: identifica trabajos equivalentes al fusionar (p. ej. la misma tecla
+        repetida con distinto instante); por defecto, la función y sus argumentos
+        """
+        job = (fn, args, critical, (fn, args if coalesce_key is None else coalesce_key))
+        with self._cond:
+            if self._stopped:
+                return False
+
+            if self.tripped and not critical:
+                self.dropped += 1
+                return False
+
+            if len(self._jobs) >= self.capacity and not self._make_room(job):
+                self.dropped += 1
+                return False
+
+            self._jobs.append(job)
+            self._pending += 1
+            self._cond.notify()
+        return True
+
+    def submit_many(self, calls: Iterable[tuple], critical: bool = False) -> bool:
+        """
+        Encola una secuencia de trabajos (fn, args) seguidos, sin que otro se intercale;
+        se admiten todos o ninguno. La secuencia cuenta como un solo trabajo al aplicar
+        la capacidad y, una vez admitida, ninguno de sus trabajos se descarta.
+        """
+        jobs = [(fn, args, True, None) for fn, args in calls]
+        if not jobs:
+            return True
+        with self._cond:
+            if self._stopped:
+                return False
+
+            if self.tripped and not critical:
+                self.dropped += 1
+                return False
+
+            first = (jobs[0][0], jobs[0][1], critical, None)
+            if len(self._jobs) >= self.capacity and not self._make_room(first):
+                self.dropped += 1
+                return False
+
+            self._jobs.extend(jobs)
+            self._pending += len(jobs)
+            self._cond.notify()
+        return True
+
+    def _make_room(self, job: tuple) -> bool:
+        """
+        Aplica la política de desbordamiento (con el lock tomado); False si se descarta el nuevo.
+        Un trabajo crítico no se fusiona nunca: entre dos KEYUP iguales puede haber un KEYDOWN.
+        """
+        if not job[2] and (self.overflow == OVERFLOW_COALESCE or self.tripped):
+            key = job[3]
+            if any(queued[3] == key for queued in self._jobs):
+                return False
+
+        for idx, queued in enumerate(self._jobs):
+            if not queued[2]:
+                del self._jobs[idx]
+                self._pending -= 1
+                self.dropped += 1
+                return True
+
+        # Solo quedan trabajos críticos: se admite el nuevo solo si también lo es
+        return job[2]
+
+    def trip(self):
+        """Abre el cortocircuito: descarta lo pendiente salvo los trabajos críticos"""
+        with self._cond:
+            self.tripped = True
+            kept = collections.deque(job for job in self._jobs if job[2])
+            removed = len(self._jobs) - len(kept)
+            self._jobs = kept
+            self._pending -= removed
+            self.dropped += removed
+
+    def reset(self):
+        """Cierra el cortocircuito"""
+        with self._cond:
+            self.tripped = False
+            self.failures = 0
+
+    def stop(self):
+        """Detiene el carril después de vaciar los trabajos pendientes"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """Espera a que el carril haya ejecutado todos sus trabajos"""
+        deadline = time.monotonic() + timeout
+        while self._pending:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._stopped:
+                    self._cond.wait()
+                if not self._jobs:
+                    return
+                fn, args = self._jobs.popleft()[:2]
+
+            try:
+                fn(*args)
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                if self.on_error:
+                    self.on_error(self.hwnd, e)
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self.completed += 1
+
+
+class DispatchEngine:
+    """
+    Reparte trabajos entre los carriles de cada ventana. Un hilo vigilante sondea cada
+    carril y abre su cortocircuito si la ventana está colgada, si el carril no avanza o
+    si acumula fallos seguidos; lo cierra cuando la ventana vuelve a responder.
+    """
+
+    def __init__(self, on_error: Optional[Callable] = None,
+                 on_breaker: Optional[Callable[[int, bool, str], None]] = None):
+        self.on_error = on_error
+        self.on_breaker = on_breaker
+        self._senders: Dict[int, WindowSender] = {}
+        self._lock = threading.Lock()
+
+        # Parámetros (ver configure)
+        self.capacity = 64
+        self.overflow = OVERFLOW_DROP_OLDEST
+        self.probe_interval = 0.25
+        self.stall_timeout = 1.0
+        self.failure_threshold = 5
+
+        self._is_hung: Optional[Callable[[int], bool]] = None
+        self._progress: Dict[int, tuple] = {}
+        self._tripped_at: Dict[int, float] = {}
+        self._monitor_stop: Optional[threading.Event] = None
+
+    def configure(self, capacity: int, overflow: str, probe_interval: float):
+        """Ajusta la capacidad y la política de las colas y el periodo del sondeo"""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"política de desbordamiento desconocida: {overflow}")
+        self.capacity = max(1, capacity)
+        self.overflow = overflow
+        self.probe_interval = probe_interval
+        with self._lock:
+            for sender in self._senders.values():
+                sender.capacity = self.capacity
+                sender.overflow = overflow
+
+    def _get_sender(self, hwnd: int) -> WindowSender:
+        sender = self._senders.get(hwnd)
+        if sender is None:
+            with self._lock:
+                sender = self._senders.get(hwnd)
+                if sender is None:
+                    sender = WindowSender(hwnd, self.on_error, self.capacity, self.overflow)
+                    self._senders[hwnd] = sender
+        return sender
+
+    def submit(self, hwnd: int, fn: Callable, *args, critical: bool = False,
+               coalesce_key: Optional[tuple] = None) -> bool:
+        """Encola un trabajo en el carril de la ventana (el orden por ventana se mantiene)"""
+        return self._get_sender(hwnd).submit(fn, *args, critical=critical, coalesce_key=coalesce_key)
+
+    def submit_many(self, hwnd: int, calls: Iterable[tuple], critical: bool = False) -> bool:
+        """Encola una secuencia de trabajos (fn, args) que se ejecuta seguida en el carril"""
+        return self._get_sender(hwnd).submit_many(calls, critical=critical)
+
+    def is_tripped(self, hwnd: int) -> bool:
+        """Indica si el cortocircuito de la ventana está abierto"""
+        sender = self._senders.get(hwnd)
+        return sender is not None and sender.tripped
+
+    def stats(self) -> Dict[int, Dict]:
+        """Estado de cada carril: pendientes, completados, descartados y cortocircuito"""
+        return {
+            hwnd: {"backlog": s.backlog, "completed": s.completed,
+                   "dropped": s.dropped, "tripped": s.tripped}
+            for hwnd, s in list(self._senders.items())
+        }
+
+    def sync(self, hwnds: Iterable[int]):
+        """Crea carriles para las ventanas nuevas y detiene los de ventanas desaparecidas"""
+        wanted = set(hwnds)
+        with self._lock:
+            for hwnd in list(self._senders):
+                if hwnd not in wanted:
+                    self._senders.pop(hwnd).stop()
+                    self._progress.pop(hwnd, None)
+                    self._tripped_at.pop(hwnd, None)
+        for hwnd in wanted:
+            self._get_sender(hwnd)
+
+    def wait_idle(self, timeout: float = 5.0) -> bool:
+        """Espera a que todos los carriles hayan ejecutado sus trabajos"""
+        return all(sender.wait_idle(timeout) for sender in list(self._senders.values()))
+
+    # === Cortocircuito ===
+
+    def start_monitor(self, is_hung: Callable[[int], bool]):
+        """Inicia el sondeo periódico de los carriles (is_hung: sonda del backend)"""
+        self.stop_monitor()
+        self._is_hung = is_hung
+        stop = self._monitor_stop = threading.Event()
+
+        def run():
+            while not stop.wait(self.probe_interval):
+                self.check_senders()
+
+        threading.Thread(target=run, name="dispatch-monitor", daemon=True).start()
+
+    def stop_monitor(self):
+        if self._monitor_stop is not None:
+            self._monitor_stop.set()
+            self._monitor_stop = None
+
+    def check_senders(self):
+        """Una pasada del vigilante: abre o cierra el cortocircuito de cada carril"""
+        now = time.monotonic()
+        for hwnd, sender in list(self._senders.items()):
+            try:
+                hung = bool(self._is_hung and self._is_hung(hwnd))
+            except Exception:
+                hung = False
+
+            # Sin avance: hay trabajos pendientes y no se completa ninguno
+            completed, since = self._progress.get(hwnd, (-1, now))
+            if sender.completed != completed or not sender.backlog:
+                completed, since = sender.completed, now
+            self._progress[hwnd] = (completed, since)
+            stalled = now - since >= self.stall_timeout
+
+            if not sender.tripped:
+                if hung:
+                    reason = "no responde"
+                elif stalled:
+                    reason = "su carril no avanza"
+                elif sender.failures >= self.failure_threshold:
+                    reason = f"{sender.failures} envíos fallidos seguidos"
+                else:
+                    continue
+                sender.trip()
+                self._tripped_at[hwnd] = now
+                if self.on_breaker:
+                    self.on_breaker(hwnd, True, reason)
+
+            elif not hung and not stalled and now - self._tripped_at.get(hwnd, 0.0) >= self.stall_timeout:
+                # Semiabierto: se vuelve a enviar; si sigue fallando se abrirá de nuevo
+                sender.reset()
+                if self.on_breaker:
+                    self.on_breaker(hwnd, False, "vuelve a responder")
+
+    def stop(self):
+        """Detiene el vigilante y todos los carriles"""
+        self.stop_monitor()
+        with self._lock:
+            senders = list(self._senders.values())
+            self._senders.clear()
+        for sender in senders:
+            sender.stop()
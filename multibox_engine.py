@@ -3,268 +3,757 @@ WoW Multiboxing Engine
 Módulo que contiene toda la lógica para el multiboxing
 """
 
-import win32gui
-import win32con
-import win32api
-import win32process
+import re
 import time
-import json
-import os
-from pynput import keyboard
-from datetime import datetime
-from typing import List, Dict, Callable, Optional
+import threading
+from functools import partial
+from typing import Dict, Callable, Optional, Tuple
+from multibox_chat import ChatInjector
+from multibox_config import ConfigSnapshot, ConfigStore
+from multibox_backend import WindowBackend, create_default_backend, WM_KEYDOWN, WM_KEYUP
+from multibox_dispatch import DispatchEngine
+from multibox_discovery import WindowDelta, WindowDiscovery, WindowMatcher
+from multibox_keymap import KeyEntry, KeyTable
+from multibox_macro import Macro, compile_macro
+from multibox_metrics import LatencyMetrics
+from multibox_log import DEBUG, INFO, LEVEL_NAMES, SOURCE_LEVELS, LogRing
+from multibox_registry import WindowRecord, WindowRegistry
+from multibox_routing import TARGET_ALL, TARGET_OTHERS, RoutingTable
+from multibox_scheduler import TimerWheel
+from multibox_shard import ShardPool, backend_factory_for
+from multibox_session import (KEY_PRESS, KEY_RELEASE, STATE_ACTIVE, STATE_PAUSED,
+                              STATE_SOLO_MAIN, SessionRecorder)
+from multibox_trace import TRACER, traced
+
+# Periodo de la comprobación de la distribución de teclado del juego (segundos)
+LAYOUT_POLL_INTERVAL = 0.5
+
+# Acciones disponibles para los atajos: nombre -> método del engine
+HOTKEY_ACTIONS = {
+    "toggle_active": "toggle_active",
+    "toggle_pause": "toggle_pause",
+    "toggle_solo_main": "toggle_solo_main",
+    "refresh_windows": "refresh_windows",
+    "follow": "send_follow_command",
+    "assist": "send_assist_command",
+    "toggle_trace": "toggle_trace",
+    "toggle_recording": "toggle_recording",
+}
 
 class WoWMultiboxEngine:
     """Motor principal del multiboxing"""
     
-    def __init__(self):
-        self.wow_windows: List[Dict] = []
+    def __init__(self, backend: Optional[WindowBackend] = None):
+        # Capa de plataforma (pywin32 en Windows, simulada en pruebas)
+        self.backend: WindowBackend = backend if backend is not None else create_default_backend()
+        
+        # Ventanas de WoW indexadas por HWND, con destinos precalculados
+        self.registry = WindowRegistry()
         self.active: bool = False
         self.paused: bool = False
         self.solo_main_mode: bool = False
-        self.main_window: Optional[int] = None
         self.config_file: str = "wow_multibox_config.json"
         
         # Callbacks para eventos (usado por la GUI)
         self.on_status_change: Optional[Callable] = None
         self.on_windows_updated: Optional[Callable] = None
-        self.on_log_message: Optional[Callable] = None
-        
-        # Configuración por defecto
-        self.config = {
-            "follow_target": "",
-            "assist_target": "",
-            "delay_enabled": False,
-            "delay_ms": 10,
-            "keys_to_replicate": set('abcdefghijklmnopqrstuvwxyz1234567890 '),
-            "blacklisted_keys": set(['b', 'm']),
-        }
+        self.on_foreground_change: Optional[Callable] = None
+        self.on_windows_delta: Optional[Callable] = None
+        
+        # Reenvío a otros equipos (multibox_net): tecla replicada y comando a los slaves
+        self.on_key_forward: Optional[Callable[[str, bool, bool], None]] = None
+        self.on_command_forward: Optional[Callable[[str], None]] = None
+        
+        # Log no bloqueante: buffer circular que la GUI vacía por lotes
+        self.log_ring = LogRing()
+        self.log_level: int = INFO
+        self.log_debug: bool = False
+        
+        # Configuración inmutable: se sustituye entera por referencia (ver apply_config)
+        self.config = ConfigSnapshot()
+        self.config_store = ConfigStore(self.config_file,
+                                        on_reload=self.reload_config,
+                                        on_error=self._on_config_error)
         
         # Listener de teclado
         self.keyboard_listener = None
         
+        # Tablas compiladas desde la configuración (ver apply_config)
+        self.hotkey_map: Dict[str, Callable] = {}
+        
+        # Enrutado por tecla (grupos de ventanas -> máscaras -> tuplas de destino);
+        # el lock serializa las reconstrucciones por config y por cambios de ventanas
+        self.routing = RoutingTable()
+        self._routing_lock = threading.Lock()
+        
+        # Macros compiladas y planificador central que las ejecuta
+        self.macros: Dict[str, Macro] = {}
+        self.scheduler = TimerWheel(on_error=self._on_scheduler_error)
+        self.scheduler.start()
+        
+        # Coste del callback del listener por evento
+        self.listener_events: int = 0
+        self.listener_total_ns: int = 0
+        self.listener_max_ns: int = 0
+        
+        # Latencia por pulsación (listener -> reparto -> PostMessage por ventana)
+        self.metrics = LatencyMetrics()
+        
+        # Grabación de la sesión de teclas (None si no se está grabando)
+        self.recorder: Optional[SessionRecorder] = None
+        
+        # Teclas físicamente presionadas: tecla -> (entrada de la tabla, ventanas que recibieron
+        # el KEYDOWN, si el KEYDOWN se reenvió a otros equipos)
+        self.held_keys: Dict[str, Tuple[KeyEntry, tuple, bool]] = {}
+        
+        # Teclas presionadas recibidas de otro equipo: tecla -> (entrada, ventanas destino)
+        self.remote_held: Dict[str, Tuple[KeyEntry, tuple]] = {}
+        
+        # Carriles de envío por ventana (un hilo con su cola por HWND)
+        self.dispatcher = DispatchEngine(on_error=self._on_dispatch_error,
+                                         on_breaker=self._on_breaker_change)
+        self.dispatcher.start_monitor(self.backend.is_hung)
+        
+        # Reparto opcional en procesos trabajadores (None: todo en los carriles)
+        self.shards: Optional[ShardPool] = None
+        
+        # Criterios compilados de clasificación de ventanas (ver apply_config)
+        self.window_matcher: Optional[WindowMatcher] = None
+        
         self.load_config()
+        
+        # Tabla precalculada de VK, scan codes y lParam
+        self.key_table = KeyTable(self.backend)
+        self.key_table.build(self.config.keys_to_replicate)
+        
+        # Inyección de comandos de chat (codificación en caché, delays por etapa)
+        self.chat = ChatInjector(self.backend, self.key_table)
+        
+        self.apply_config()
+        
+        # Descubrimiento incremental de ventanas (rescaneos fuera del listener)
+        self.discovery = WindowDiscovery(self.backend,
+                                         on_delta=self._apply_window_delta,
+                                         interval=self.config.discovery_interval,
+                                         on_error=self._on_discovery_error,
+                                         matcher=self.window_matcher)
+        
+        # Ventana activa en caché, actualizada por eventos del backend
+        self.foreground_window: int = 0
+        self.backend.watch_foreground(self._on_foreground_change)
+        self._layout_watch_stop: Optional[threading.Event] = None
+        self.start_layout_watch()
+        
+        # Recarga en caliente del fichero de configuración
+        self.config_store.start()
+    
+    @property
+    def wow_windows(self) -> Tuple[WindowRecord, ...]:
+        """Ventanas de WoW detectadas, en orden de enumeración"""
+        return self.registry.windows
     
-    def log(self, source: str, message: str):
-        """Registra un mensaje en el log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] [{source}] {message}"
-        print(log_entry)
+    @property
+    def main_window(self) -> Optional[int]:
+        """HWND de la ventana main"""
+        return self.registry.main_window
+    
+    def log(self, source: str, message: str, level: Optional[int] = None):
+        """Registra un mensaje en el log (nunca bloquea)"""
+        if level is None:
+            level = SOURCE_LEVELS.get(source, INFO)
+        if level < self.log_level:
+            return
         
-        if self.on_log_message:
-            self.on_log_message(source, message, timestamp)
+        self.log_ring.append(level, source, message)
+    
+    def set_log_level(self, level_name: str):
+        """Cambia el nivel mínimo de log ('DEBUG', 'INFO', 'WARNING', 'ERROR')"""
+        self.log_level = LEVEL_NAMES.get(level_name.upper(), INFO)
+        # Bandera para que el camino caliente no construya mensajes que se descartarían
+        self.log_debug = self.log_level <= DEBUG
     
     def load_config(self):
         """Carga la configuración desde archivo JSON"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    saved = json.load(f)
-                    self.config["follow_target"] = saved.get("follow_target", "")
-                    self.config["assist_target"] = saved.get("assist_target", "")
-                    self.config["delay_enabled"] = saved.get("delay_enabled", False)
-                    self.config["delay_ms"] = saved.get("delay_ms", 10)
-                    
-                    # Cargar blacklist
-                    blacklist = saved.get("blacklisted_keys", "b,m")
-                    if blacklist:
-                        self.config["blacklisted_keys"] = set(blacklist.split(','))
-                
-                self.log("Config", "Configuración cargada desde archivo")
-            except Exception as e:
-                self.log("Error", f"Error cargando configuración: {e}")
+        try:
+            snapshot = self.config_store.load()
+        except Exception as e:
+            self.log("Error", f"Error cargando configuración: {e}")
+            return
+        
+        if snapshot is not None:
+            self.config = snapshot
+            self.log("Config", "Configuración cargada desde archivo")
+    
+    def reload_config(self):
+        """Vuelve a leer el fichero tras un cambio en disco y aplica la nueva configuración"""
+        try:
+            snapshot = self.config_store.load()
+        except Exception as e:
+            self.log("Error", f"Error recargando configuración (se mantiene la anterior): {e}")
+            return
+        
+        if snapshot is not None:
+            self.apply_config(snapshot)
+            self.log("Config", "Configuración recargada desde archivo")
     
     def save_config(self):
-        """Guarda la configuración en archivo JSON"""
+        """Guarda la configuración en archivo JSON (escritura atómica)"""
         try:
-            save_data = {
-                "follow_target": self.config["follow_target"],
-                "assist_target": self.config["assist_target"],
-                "delay_enabled": self.config["delay_enabled"],
-                "delay_ms": self.config["delay_ms"],
-                "blacklisted_keys": ','.join(self.config["blacklisted_keys"])
-            }
-            with open(self.config_file, 'w') as f:
-                json.dump(save_data, f, indent=2)
+            self.config_store.write(self.config)
             self.log("Config", "Configuración guardada exitosamente")
             return True
         except Exception as e:
             self.log("Error", f"Error guardando configuración: {e}")
             return False
     
+    def update_config(self, persist: bool = True, **changes) -> ConfigSnapshot:
+        """
+        Crea una configuración nueva con los cambios indicados y la aplica.
+        Con persist, la escritura en disco se agrupa con las siguientes (no bloquea).
+        """
+        snapshot = self.config.replace(**changes)
+        self.apply_config(snapshot)
+        if persist:
+            self.config_store.request_save(snapshot)
+        return snapshot
+    
+    def _on_config_error(self, error: Exception):
+        """Error en el hilo del fichero de configuración"""
+        self.log("Error", f"Error en el fichero de configuración: {error}")
+    
+    def apply_config(self, snapshot: Optional[ConfigSnapshot] = None):
+        """
+        Compila una configuración en las tablas que usa el camino caliente y la publica.
+        Cada tabla se construye aparte y se sustituye por referencia.
+        """
+        config = snapshot if snapshot is not None else self.config
+        
+        self.set_log_level(config.log_level)
+        try:
+            self.dispatcher.configure(config.queue_capacity, config.queue_overflow,
+                                      config.hung_probe_interval)
+            if self.shards is not None:
+                self.shards.configure(config.queue_capacity, config.queue_overflow)
+        except ValueError as e:
+            self.log("Warning", f"Colas de envío: {e}")
+        self.chat.configure(config.chat_open_delay_ms,
+                            config.chat_char_delay_ms,
+                            config.chat_send_delay_ms)
+        
+        # Macros (dependen de la tabla de teclas y de los delays del chat)
+        macros = self._compile_macros(config)
+        
+        # Atajos: tecla -> método ya resuelto ('macro:<nombre>' ejecuta una macro)
+        hotkey_map = {}
+        for key_name, action in config.hotkeys.items():
+            if action.startswith("macro:"):
+                hotkey_map[key_name.lower()] = partial(self.run_macro, action[len("macro:"):])
+                continue
+            method_name = HOTKEY_ACTIONS.get(action)
+            if method_name is None:
+                self.log("Warning", f"Acción desconocida para el atajo {key_name}: {action}")
+                continue
+            hotkey_map[key_name.lower()] = getattr(self, method_name)
+        
+        # Criterios de clasificación de ventanas (se conservan los anteriores si no son válidos)
+        matcher = None
+        if self.window_matcher is None or config.window_match != self.config.window_match:
+            try:
+                matcher = WindowMatcher.from_config(config.window_match)
+            except (re.error, AttributeError, TypeError) as e:
+                self.log("Warning", f"Criterios de ventanas inválidos: {e}")
+        
+        # Reglas de enrutado por tecla: tabla nueva, completa antes de publicarla
+        routing = RoutingTable()
+        for error in routing.configure(dict(config.window_groups), dict(config.key_routes)):
+            self.log("Warning", error)
+        with self._routing_lock:
+            routing.rebuild(self.wow_windows)
+            self.routing = routing
+        
+        self.macros = macros
+        self.hotkey_map = hotkey_map
+        self.config = config
+        
+        # Procesos trabajadores: solo se reinician si cambia su número
+        workers = self.shards.workers if self.shards is not None else 0
+        if config.shard_workers != workers:
+            self.stop_sharding()
+            if config.shard_workers > 0:
+                self.start_sharding(config.shard_workers)
+        
+        discovery = getattr(self, "discovery", None)
+        if matcher is not None:
+            self.window_matcher = matcher
+            if discovery is not None:
+                discovery.set_matcher(matcher)
+                discovery.request_refresh()
+        if discovery is not None:
+            discovery.interval = config.discovery_interval
+    
+    def _compile_macros(self, config: ConfigSnapshot) -> Dict[str, Macro]:
+        """Compila las macros de una configuración con la tabla de teclas actual"""
+        macros = {}
+        for name, spec in config.macros.items():
+            try:
+                macros[name] = compile_macro(name, spec, self.key_table, self.chat, config.key_hold)
+            except (ValueError, KeyError, TypeError) as e:
+                self.log("Warning", f"Macro '{name}' inválida: {e}")
+        return macros
+    
     def get_process_id(self, hwnd: int) -> Optional[int]:
         """Obtiene el PID de una ventana"""
-        try:
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            return pid
-        except:
-            return None
+        return self.backend.get_process_id(hwnd)
     
+    @traced("engine.find_wow_windows")
     def find_wow_windows(self) -> int:
-        """Encuentra todas las ventanas de WoW con PID y HWND"""
-        self.wow_windows = []
-        
-        def callback(hwnd, _):
-            if win32gui.IsWindowVisible(hwnd):
-                window_text = win32gui.GetWindowText(hwnd)
-                print(window_text)
-                # Buscar ventanas de WoW
-                if any(keyword in window_text.lower() for keyword in ["world of warcraft", "wow"]):
-                    pid = self.get_process_id(hwnd)
-                    if pid:
-                        window_info = {
-                            "hwnd": hwnd,
-                            "pid": pid,
-                            "title": window_text,
-                            "is_main": hwnd == self.main_window
-                        }
-                        self.wow_windows.append(window_info)
-        
-        win32gui.EnumWindows(callback, None)
-        
+        """Busca ventanas de WoW de forma síncrona (solo procesa las nuevas o cambiadas)"""
+        self.discovery.scan()
         self.log("Sistema", f"{len(self.wow_windows)} ventanas de WoW encontradas")
+        return len(self.wow_windows)
+    
+    def refresh_windows(self):
+        """Pide un rescaneo de ventanas en segundo plano (no bloquea al llamador)"""
+        self.discovery.request_refresh()
+    
+    def start_window_discovery(self):
+        """Inicia el rescaneo periódico de ventanas"""
+        self.discovery.start()
+    
+    def _apply_window_delta(self, delta: WindowDelta):
+        """Aplica los cambios detectados por el descubrimiento"""
+        self.registry.apply_delta(delta.added, delta.removed, delta.changed)
+        with self._routing_lock:
+            self.routing.rebuild(self.wow_windows)
+        self.dispatcher.sync(w.hwnd for w in self.wow_windows)
+        shards = self.shards
+        if shards is not None:
+            shards.sync(w.hwnd for w in self.wow_windows)
+        
+        if delta.added or delta.removed:
+            self.log("Sistema", f"Ventanas: +{len(delta.added)} -{len(delta.removed)} "
+                                f"({len(self.wow_windows)} en total)")
+        
+        if self.on_windows_delta:
+            self.on_windows_delta(delta)
         
         if self.on_windows_updated:
             self.on_windows_updated(self.wow_windows)
-        
-        return len(self.wow_windows)
+    
+    def _on_discovery_error(self, error: Exception):
+        """Error durante un rescaneo en segundo plano"""
+        self.log("Error", f"Error buscando ventanas: {error}")
     
     def set_main_window(self, hwnd: int):
         """Establece una ventana como la principal"""
-        self.main_window = hwnd
-        for w in self.wow_windows:
-            w["is_main"] = (w["hwnd"] == hwnd)
-        
-        main_title = next((w["title"] for w in self.wow_windows if w["hwnd"] == hwnd), "Unknown")
+        record = self.registry.set_main(hwnd)
+        with self._routing_lock:
+            self.routing.rebuild(self.wow_windows)
+        main_title = record.title if record else "Unknown"
         self.log("Config", f"Ventana '{main_title}' establecida como MAIN")
         
         if self.on_windows_updated:
             self.on_windows_updated(self.wow_windows)
     
     def get_foreground_window(self) -> int:
-        """Obtiene la ventana activa actual"""
-        return win32gui.GetForegroundWindow()
+        """Obtiene la ventana activa actual (valor en caché, sin llamada al sistema)"""
+        return self.foreground_window
+    
+    def _on_foreground_change(self, hwnd: int):
+        """Evento del backend: cambió la ventana activa"""
+        self.foreground_window = hwnd
+        
+        # Al cambiar de ventana puede haber cambiado la distribución del teclado
+        if hwnd in self.registry:
+            self.refresh_keyboard_layout(hwnd)
+        
+        if self.on_foreground_change:
+            self.on_foreground_change(hwnd)
+    
+    def refresh_keyboard_layout(self, hwnd: int) -> bool:
+        """
+        Reconstruye la tabla de teclas si cambió la distribución de la ventana del juego,
+        junto con lo que guarda VK y scan codes: comandos de chat codificados y macros
+        """
+        if not self.key_table.refresh_if_layout_changed(hwnd):
+            return False
+        self.chat.clear_cache()
+        self.macros = self._compile_macros(self.config)
+        self.log("Sistema", f"Distribución de teclado cambiada (0x{self.key_table.layout:08X}): "
+                            f"tabla de teclas reconstruida")
+        return True
+    
+    def start_layout_watch(self):
+        """
+        Comprueba periódicamente la distribución de la ventana activa del juego: un cambio
+        hecho dentro del juego no cambia la ventana activa, así que no llega por
+        _on_foreground_change
+        """
+        self.stop_layout_watch()
+        stop = self._layout_watch_stop = threading.Event()
+        
+        def run():
+            while not stop.wait(LAYOUT_POLL_INTERVAL):
+                hwnd = self.foreground_window
+                if hwnd in self.registry:
+                    try:
+                        self.refresh_keyboard_layout(hwnd)
+                    except Exception as e:
+                        self.log("Error", f"Error comprobando la distribución de teclado: {e}")
+        
+        threading.Thread(target=run, name="layout-watch", daemon=True).start()
+    
+    def stop_layout_watch(self):
+        if self._layout_watch_stop is not None:
+            self._layout_watch_stop.set()
+            self._layout_watch_stop = None
     
     def is_wow_window(self, hwnd: int) -> bool:
         """Verifica si una ventana es de WoW"""
-        return any(w["hwnd"] == hwnd for w in self.wow_windows)
+        return hwnd in self.registry
     
-    def send_key_to_window(self, hwnd: int, key, is_special: bool = False):
-        """Envía una tecla a una ventana específica sin activarla"""
-        try:
-            if is_special:
-                vk_code = key
-            else:
-                vk_code = win32api.VkKeyScan(key)
-            
-            # WM_KEYDOWN
-            win32api.PostMessage(hwnd, win32con.WM_KEYDOWN, vk_code, 0)
-            
-            if self.config["delay_enabled"]:
-                time.sleep(self.config["delay_ms"] / 1000.0)
-            else:
-                time.sleep(0.03)
-            
-            # WM_KEYUP
-            win32api.PostMessage(hwnd, win32con.WM_KEYUP, vk_code, 0)
-            
-        except Exception as e:
-            self.log("Error", f"Error enviando tecla: {e}")
+    @traced("engine.post_key_down")
+    def post_key_down(self, hwnd: int, entry: KeyEntry, repeat: bool = False, t_event: int = 0):
+        """
+        Envía solo WM_KEYDOWN a una ventana (no bloquea).
+        t_event: instante (perf_counter_ns) en que el listener recibió la tecla, para métricas.
+        Los errores llegan al carril, que los cuenta para el cortocircuito.
+        """
+        if entry.shift:
+            shift = self.key_table.shift_entry
+            self.backend.post_message(hwnd, WM_KEYDOWN, shift.vk, shift.lparam_down)
+        self.backend.post_message(hwnd, WM_KEYDOWN, entry.vk,
+                                  entry.lparam_repeat if repeat else entry.lparam_down)
+        
+        if t_event:
+            self.metrics.record_post(hwnd, time.perf_counter_ns() - t_event)
+    
+    def post_key_up(self, hwnd: int, entry: KeyEntry):
+        """Envía solo WM_KEYUP a una ventana (no bloquea)"""
+        self.backend.post_message(hwnd, WM_KEYUP, entry.vk, entry.lparam_up)
+        if entry.shift:
+            shift = self.key_table.shift_entry
+            self.backend.post_message(hwnd, WM_KEYUP, shift.vk, shift.lparam_up)
+    
+    def _submit_key_up(self, hwnd: int, entry: KeyEntry):
+        """Encola un KEYUP; es crítico: la cola nunca lo descarta"""
+        self.dispatcher.submit(hwnd, self.post_key_up, hwnd, entry, critical=True)
     
     def send_text_to_window(self, hwnd: int, text: str):
-        """Envía texto completo a una ventana"""
-        for char in text:
-            self.send_key_to_window(hwnd, char)
-            time.sleep(0.04)
+        """Envía texto completo a una ventana como WM_CHAR"""
+        self.chat.post_batch(hwnd, self.chat.encode(text).text, self.chat.char_delay)
     
-    def send_command_to_slaves(self, command: str) -> int:
+    @traced("engine.send_command_to_slaves")
+    def send_command_to_slaves(self, command: str, forward: bool = True) -> int:
         """
-        Versión mejorada con mejores delays y manejo de errores
+        Envía un comando de chat a todas las ventanas slave en paralelo.
+        No bloquea: cada ventana lo escribe en su propio carril de envío.
+        forward: reenviarlo también a otros equipos (False si viene de uno)
         """
-        slaves = [w for w in self.wow_windows if not w["is_main"]]
+        forward_command = self.on_command_forward
+        if forward and forward_command is not None:
+            forward_command(command)
+        
+        slaves = self.registry.slaves
         
         if not slaves:
             self.log("Warning", "No hay ventanas slave detectadas")
             return 0
         
-        VK_RETURN = 0x0D
-        success_count = 0
+        # Codificar una sola vez antes de repartir
+        encoded = self.chat.encode(command)
         
+        # Cada ventana recibe el comando como una secuencia de etapas cortas en su carril
         for w in slaves:
-            try:
-                # Presionar ENTER para abrir chat
-                self.send_key_to_window(w["hwnd"], VK_RETURN, is_special=True)
-                time.sleep(0.1)  # Aumentado de 0.05 a 0.1 segundos
-                
-                # Escribir el comando
-                self.send_text_to_window(w["hwnd"], command)
-                time.sleep(0.1)  # Aumentado de 0.05 a 0.1 segundos
-                
-                # Presionar ENTER para enviar
-                self.send_key_to_window(w["hwnd"], VK_RETURN, is_special=True)
-                time.sleep(0.05)  # Pequeño delay entre ventanas
-                
-                success_count += 1
-                
-            except Exception as e:
-                self.log("Error", f"Error enviando comando a ventana {w['title']}: {e}")
+            self.dispatcher.submit_many(w.hwnd, self.chat.jobs(w.hwnd, encoded))
+        
+        return len(slaves)
+    
+    def run_macro(self, name: str) -> int:
+        """
+        Ejecuta una macro en sus ventanas destino. No bloquea: cada acción se programa
+        en el planificador con el desfase de su paso más el escalonado de la ventana.
+        """
+        macro = self.macros.get(name)
+        if macro is None:
+            self.log("Error", f"Macro desconocida: {name}")
+            return 0
+        
+        targets = self.resolve_targets(macro.targets)
+        for idx, hwnd in enumerate(targets):
+            base = idx * macro.stagger
+            for action in macro.actions:
+                self.scheduler.schedule(base + action.offset, self._post_macro_action, hwnd, action)
+        
+        self.log("Macro", f"'{name}' enviada a {len(targets)} ventana(s)")
+        return len(targets)
+    
+    def _post_macro_action(self, hwnd: int, action):
+        """Vencimiento de una acción de macro: encolarla en el carril de la ventana"""
+        if action.command is not None:
+            self.dispatcher.submit_many(hwnd, self.chat.jobs(hwnd, action.command))
+            return
+        self.dispatcher.submit(hwnd, self.chat.post_batch, hwnd, action.messages, action.message_delay,
+                               critical=action.critical)
+    
+    def resolve_targets(self, name: str) -> Tuple[int, ...]:
+        """Ventanas de un destino con nombre ('others', 'all', 'main' o un grupo, según su modo)"""
+        targets = self.routing.resolve(name, self.foreground_window)
+        return targets if targets is not None else ()
+    
+    def broadcast_key(self, key_name: str, target: str = TARGET_OTHERS) -> int:
+        """
+        Envía una pulsación completa a un destino con nombre, mantenida el tiempo del delay
+        configurado. No bloquea: el KEYUP se programa en el planificador.
+        Devuelve el número de ventanas destino.
+        """
+        entry = self.key_table.get(key_name.lower())
+        if entry is None:
+            self.log("Error", f"Tecla no soportada: {key_name!r}")
+            return 0
         
-        return success_count
+        hold = self.config.key_hold
+        targets = self.resolve_targets(target.lower())
+        for hwnd in targets:
+            self.dispatcher.submit(hwnd, self.post_key_down, hwnd, entry)
+            self.scheduler.schedule(hold, self._submit_key_up, hwnd, entry)
+        return len(targets)
+    
+    def _on_scheduler_error(self, error: Exception):
+        """Error en una tarea del planificador"""
+        self.log("Error", f"Error en tarea programada: {error}")
     
     def send_follow_command(self) -> bool:
         """Envía comando /follow"""
-        if not self.config["follow_target"]:
+        if not self.config.follow_target:
             self.log("Error", "Nombre para Follow no configurado")
             return False
         
-        command = f"/follow {self.config['follow_target']}"
+        command = f"/follow {self.config.follow_target}"
         count = self.send_command_to_slaves(command)
         self.log("Follow", f"Comando enviado a {count} ventana(s)")
         return count > 0
     
     def send_assist_command(self) -> bool:
         """Envía comando /assist"""
-        if not self.config["assist_target"]:
+        if not self.config.assist_target:
             self.log("Error", "Nombre para Assist no configurado")
             return False
         
-        command = f"/assist {self.config['assist_target']}"
+        command = f"/assist {self.config.assist_target}"
         count = self.send_command_to_slaves(command)
         self.log("Assist", f"Comando enviado a {count} ventana(s)")
         return count > 0
     
-    def replicate_key(self, key_char: str):
-        """Replica una tecla a las ventanas correspondientes"""
+    @traced("engine.replicate_key")
+    def replicate_key(self, key_char: str, t_event: int = 0):
+        """
+        Replica el KEYDOWN de una tecla a las ventanas correspondientes.
+        t_event: instante (perf_counter_ns) de recepción en el listener; 0 sin métricas.
+        """
         if not self.active or self.paused:
             return
         
-        # Verificar si la tecla está en la blacklist
-        if key_char in self.config["blacklisted_keys"]:
+        # Autorepetición: la tecla sigue presionada, repetir KEYDOWN a las mismas ventanas
+        held = self.held_keys.get(key_char)
+        if held is not None:
+            entry, held_targets, forwarded = held
+            forward = self.on_key_forward
+            if forwarded and forward is not None:
+                forward(key_char, True, True)
+            shards = self.shards
+            if shards is not None:
+                shards.post_many(held_targets, self.key_table.key_messages(entry, repeat=True), t_event)
+                return
+            # Las repeticiones de una tecla son equivalentes aunque cambie su instante
+            coalesce_key = (entry, True)
+            for hwnd in held_targets:
+                self.dispatcher.submit(hwnd, self.post_key_down, hwnd, entry, True, t_event,
+                                       coalesce_key=coalesce_key)
             return
         
-        # Verificar si la tecla debe replicarse
-        if key_char not in self.config["keys_to_replicate"]:
+        # Verificar si la tecla debe replicarse (blacklist ya descontada)
+        if key_char not in self.config.replicable_keys:
             return
         
-        current_window = self.get_foreground_window()
+        current_window = self.foreground_window
         
-        # Solo replicar si la ventana actual es de WoW
-        if not self.is_wow_window(current_window):
+        entry = self.key_table.get(key_char)
+        if entry is None:
             return
         
-        # Determinar ventanas objetivo
+        # Una sola búsqueda: None si la ventana actual no es de WoW
+        targets = self.registry.targets_except(current_window)
+        if targets is None:
+            return
+        
+        # Determinar ventanas objetivo: solo main, regla propia de la tecla o todas menos la activa
         if self.solo_main_mode:
-            target_windows = [w for w in self.wow_windows if w["is_main"]]
+            targets = self.registry.main_targets
         else:
-            target_windows = [w for w in self.wow_windows if w["hwnd"] != current_window]
+            routed = self.routing.targets(key_char, current_window)
+            if routed is not None:
+                targets = routed
+        
+        # Los otros equipos replican a todas sus ventanas (salvo en modo solo main);
+        # la repetición y el KEYUP solo se reenvían si se reenvió el KEYDOWN
+        forward = self.on_key_forward
+        forwarded = forward is not None and not self.solo_main_mode
+        self.held_keys[key_char] = (entry, targets, forwarded)
+        if forwarded:
+            forward(key_char, True, False)
+        
+        if self.log_debug:
+            self.log("Tecla", f"{key_char!r} -> {len(targets)} ventana(s)", DEBUG)
         
-        # Enviar tecla a ventanas objetivo
-        for w in target_windows:
-            self.send_key_to_window(w["hwnd"], key_char)
+        # Encolar el KEYDOWN en el carril de cada ventana objetivo (envío en paralelo);
+        # el KEYUP sale cuando se suelta la tecla física
+        if t_event:
+            self.metrics.record_dispatch(time.perf_counter_ns() - t_event)
+        shards = self.shards
+        if shards is not None:
+            shards.post_many(targets, self.key_table.key_messages(entry), t_event)
+            return
+        for hwnd in targets:
+            self.dispatcher.submit(hwnd, self.post_key_down, hwnd, entry, False, t_event)
+    
+    @traced("engine.release_key")
+    def release_key(self, key_char: str):
+        """Replica el KEYUP de una tecla a las ventanas que recibieron su KEYDOWN"""
+        # Se libera aunque el sistema se haya pausado, para no dejar teclas atascadas
+        held = self.held_keys.pop(key_char, None)
+        if held is None:
+            return
+        
+        entry, targets, forwarded = held
+        forward = self.on_key_forward
+        if forwarded and forward is not None:
+            forward(key_char, False, False)
+        
+        shards = self.shards
+        if shards is not None:
+            shards.post_many(targets, self.key_table.key_messages(entry, key_up=True), critical=True)
+            return
+        for hwnd in targets:
+            self._submit_key_up(hwnd, entry)
+    
+    def release_all_keys(self):
+        """Envía KEYUP de todas las teclas que siguen presionadas"""
+        for key_char in list(self.held_keys):
+            self.release_key(key_char)
+        self.release_remote_keys()
+    
+    def apply_remote_key(self, key_char: str, pressed: bool, repeat: bool = False) -> int:
+        """
+        Tecla recibida de otro equipo: se replica a todas las ventanas de WoW de este
+        (ninguna recibe la tecla física). Devuelve el número de ventanas destino.
+        """
+        if not pressed:
+            held = self.remote_held.pop(key_char, None)
+            if held is None:
+                return 0
+            entry, targets = held
+            for hwnd in targets:
+                self._submit_key_up(hwnd, entry)
+            return len(targets)
+        
+        if not self.active or self.paused:
+            return 0
+        
+        held = self.remote_held.get(key_char)
+        if held is not None:
+            entry, targets = held
+            coalesce_key = (entry, True)
+            for hwnd in targets:
+                self.dispatcher.submit(hwnd, self.post_key_down, hwnd, entry, True,
+                                       coalesce_key=coalesce_key)
+            return len(targets)
+        
+        # Repetición sin KEYDOWN previo (perdido, o tecla que el emisor no reenvió): se ignora
+        if repeat:
+            return 0
+        
+        entry = self.key_table.get(key_char)
+        if entry is None:
+            return 0
+        targets = self.resolve_targets(TARGET_ALL)
+        self.remote_held[key_char] = (entry, targets)
+        for hwnd in targets:
+            self.dispatcher.submit(hwnd, self.post_key_down, hwnd, entry)
+        return len(targets)
+    
+    def release_remote_keys(self):
+        """Envía KEYUP de las teclas recibidas de otro equipo que siguen presionadas"""
+        for key_char in list(self.remote_held):
+            self.apply_remote_key(key_char, False)
+    
+    def start_sharding(self, workers: int):
+        """
+        Reparte los KEYDOWN/KEYUP replicados entre procesos trabajadores con memoria
+        compartida (los comandos de chat y las macros siguen en los carriles)
+        """
+        if self.shards is not None:
+            return
+        try:
+            dispatcher = self.dispatcher
+            shards = ShardPool(workers, backend_factory_for(self.backend),
+                               backlog_capacity=dispatcher.capacity,
+                               overflow=dispatcher.overflow,
+                               is_tripped=dispatcher.is_tripped,
+                               on_breaker=self._on_shard_breaker)
+            if not shards.start():
+                self.log("Warning", "Los procesos de reparto tardan en arrancar")
+        except Exception as e:
+            self.log("Error", f"No se pudo iniciar el reparto en procesos: {e}")
+            return
+        shards.sync(w.hwnd for w in self.wow_windows)
+        self.shards = shards
+        self.log("Sistema", f"Reparto en {shards.workers} proceso(s) iniciado")
+    
+    def stop_sharding(self) -> Optional[Dict]:
+        """
+        Detiene los procesos trabajadores y suma sus latencias a las métricas.
+        Devuelve el resumen de ShardPool.stop (None si no había reparto).
+        """
+        shards = self.shards
+        if shards is None:
+            return None
+        self.release_all_keys()
+        self.shards = None
+        summary = shards.stop()
+        self.metrics.merge_windows(summary["windows"])
+        self.log("Sistema", f"Reparto en procesos detenido ({summary['posted']} mensajes, "
+                            f"{summary['failures']} fallidos, {summary['dropped']} descartados)")
+        return summary
+    
+    def _on_shard_breaker(self, index: int, tripped: bool, reason: str):
+        """El frontal abrió o cerró el cortocircuito de un proceso trabajador"""
+        if tripped:
+            self.log("Warning", f"Proceso de reparto {index} en cortocircuito: {reason}")
+        else:
+            self.log("Sistema", f"Proceso de reparto {index} recuperado: {reason}")
+    
+    def _on_dispatch_error(self, hwnd: int, error: Exception):
+        """Error no controlado en el carril de una ventana"""
+        self.log("Error", f"Error en el carril de la ventana {hwnd}: {error}")
+    
+    def _on_breaker_change(self, hwnd: int, tripped: bool, reason: str):
+        """El vigilante abrió o cerró el cortocircuito de una ventana"""
+        record = self.registry.get(hwnd)
+        title = record.title if record else hwnd
+        if tripped:
+            self.log("Warning", f"Ventana '{title}' {reason}: se omite hasta que se recupere")
+        else:
+            self.log("Sistema", f"Ventana '{title}' {reason}")
+        
+        if self.on_windows_updated:
+            self.on_windows_updated(self.wow_windows)
     
     def toggle_active(self):
         """Activa/desactiva el multiboxing"""
         self.active = not self.active
+        if not self.active:
+            self.release_all_keys()
         status = "ACTIVADO" if self.active else "DESACTIVADO"
         self.log("Sistema", f"Multiboxing {status}")
         
@@ -275,6 +764,8 @@ class WoWMultiboxEngine:
         """Pausa/reanuda la replicación"""
         if self.active:
             self.paused = not self.paused
+            if self.paused:
+                self.release_all_keys()
             status = "PAUSADA" if self.paused else "REANUDADA"
             self.log("Sistema", f"Replicación {status}")
             
@@ -290,55 +781,173 @@ class WoWMultiboxEngine:
         if self.on_status_change:
             self.on_status_change()
     
+    @traced("engine.on_key_press")
     def on_key_press(self, key):
         """Callback cuando se presiona una tecla"""
+        start = time.perf_counter_ns()
         try:
-            # F12: Toggle activación
-            if key == keyboard.Key.f12:
-                self.toggle_active()
-                return
+            key_name = self.get_key_name(key)
             
-            # F10: Pausar/Reanudar
-            if key == keyboard.Key.f10:
-                self.toggle_pause()
-                return
+            # Las teclas sin nombre (sin carácter ni tecla especial conocida) no se
+            # replican ni son atajos: no se graban
+            recorder = self.recorder
+            if recorder is not None and key_name is not None:
+                recorder.record(start, self._recorded_foreground(), KEY_PRESS, key_name)
             
-            # F11: Refrescar ventanas
-            if key == keyboard.Key.f11:
-                self.find_wow_windows()
-                return
+            # Atajos: una búsqueda en el mapa compilado
+            action = self.hotkey_map.get(key_name)
+            if action is not None:
+                action()
             
-            # F9: Enviar Follow
-            if key == keyboard.Key.f9:
-                self.send_follow_command()
-                return
-            
-            # F8: Enviar Assist
-            if key == keyboard.Key.f8:
-                self.send_assist_command()
-                return
-            
-            # F7: Toggle Solo Main Mode
-            if key == keyboard.Key.f7:
-                self.toggle_solo_main()
-                return
+            # Camino rápido: inactivo, en pausa o tecla no replicable -> nada más que hacer
+            elif self.active and not self.paused and key_name in self.config.replicable_keys:
+                self.replicate_key(key_name, start)
+                
+        except AttributeError:
+            pass
+        
+        self._record_listener_cost(time.perf_counter_ns() - start)
+    
+    @traced("engine.on_key_release")
+    def on_key_release(self, key):
+        """Callback cuando se suelta una tecla"""
+        start = time.perf_counter_ns()
+        try:
+            key_name = self.get_key_name(key)
             
-            # Replicar teclas normales
-            if hasattr(key, 'char') and key.char:
-                key_char = key.char.lower()
-                self.replicate_key(key_char)
+            recorder = self.recorder
+            if recorder is not None and key_name is not None:
+                recorder.record(start, self._recorded_foreground(), KEY_RELEASE, key_name)
             
-            # Tecla espacio
-            elif key == keyboard.Key.space:
-                self.replicate_key(' ')
+            if key_name in self.held_keys:
+                self.release_key(key_name)
                 
         except AttributeError:
             pass
+        
+        self._record_listener_cost(time.perf_counter_ns() - start)
+    
+    def _record_listener_cost(self, elapsed_ns: int):
+        """Acumula el coste del callback del listener"""
+        self.listener_events += 1
+        self.listener_total_ns += elapsed_ns
+        if elapsed_ns > self.listener_max_ns:
+            self.listener_max_ns = elapsed_ns
+    
+    def get_listener_stats(self) -> Dict:
+        """Coste medio y máximo del callback del listener (microsegundos)"""
+        events = self.listener_events
+        return {
+            "events": events,
+            "avg_us": self.listener_total_ns / events / 1000.0 if events else 0.0,
+            "max_us": self.listener_max_ns / 1000.0,
+        }
+    
+    def get_latency_stats(self) -> Dict:
+        """Percentiles de latencia por pulsación: reparto, total y por ventana"""
+        return self.metrics.snapshot({w.hwnd: w.title for w in self.wow_windows})
+    
+    def export_latency_stats(self, path: str) -> bool:
+        """Exporta las métricas de latencia a un fichero JSON"""
+        try:
+            self.metrics.export_json(path, {w.hwnd: w.title for w in self.wow_windows})
+            self.log("Sistema", f"Métricas exportadas a {path}")
+            return True
+        except Exception as e:
+            self.log("Error", f"Error exportando métricas: {e}")
+            return False
+    
+    def reset_latency_stats(self):
+        """Descarta las muestras de latencia acumuladas"""
+        self.metrics.reset()
+    
+    def start_trace(self):
+        """Empieza a registrar trazas de las funciones calientes"""
+        TRACER.start()
+        self.log("Sistema", "Traza iniciada")
+    
+    def stop_trace(self, path: str = "multibox_trace.json") -> bool:
+        """Detiene la traza y la exporta en formato Chrome trace-event"""
+        TRACER.stop()
+        try:
+            count = TRACER.dump(path)
+            self.log("Sistema", f"Traza guardada en {path} ({count} eventos)")
+            return True
+        except Exception as e:
+            self.log("Error", f"Error guardando la traza: {e}")
+            return False
+    
+    def toggle_trace(self):
+        """Inicia la traza o la detiene y la guarda"""
+        if TRACER.enabled:
+            self.stop_trace()
+        else:
+            self.start_trace()
+    
+    def start_recording(self):
+        """Empieza a grabar las teclas que recibe el listener"""
+        state = ((STATE_ACTIVE if self.active else 0) |
+                 (STATE_PAUSED if self.paused else 0) |
+                 (STATE_SOLO_MAIN if self.solo_main_mode else 0))
+        self.recorder = SessionRecorder(state, tuple(w.hwnd for w in self.wow_windows))
+        self.log("Sistema", "Grabación de sesión iniciada")
+    
+    def stop_recording(self, path: str = "multibox_session.mbs") -> bool:
+        """Detiene la grabación y guarda la sesión en un fichero binario"""
+        recorder = self.recorder
+        if recorder is None:
+            return False
+        self.recorder = None
+        
+        try:
+            session = recorder.stop()
+            session.save(path)
+            self.log("Sistema", f"Sesión guardada en {path} ({len(session.events)} eventos, "
+                                f"{session.duration:.1f} s)")
+            return True
+        except Exception as e:
+            self.log("Error", f"Error guardando la sesión: {e}")
+            return False
+    
+    def toggle_recording(self):
+        """Inicia la grabación o la detiene y la guarda"""
+        if self.recorder is None:
+            self.start_recording()
+        else:
+            self.stop_recording()
+    
+    def _recorded_foreground(self) -> int:
+        """Ventana activa para la grabación (0 si no es de WoW)"""
+        hwnd = self.foreground_window
+        return hwnd if hwnd in self.registry else 0
+    
+    def get_key_name(self, key) -> Optional[str]:
+        """
+        Convierte una tecla de pynput (o un nombre ya normalizado) en su nombre:
+        el carácter en minúscula, ' ' para espacio o el nombre de la tecla especial ('f12')
+        """
+        if isinstance(key, str):
+            return key
+        
+        # Teclas normales
+        if hasattr(key, 'char') and key.char:
+            return key.char.lower()
+        
+        name = getattr(key, 'name', None)
+        
+        # Tecla espacio
+        if name == "space":
+            return ' '
+        
+        return name
     
     def start_keyboard_listener(self):
         """Inicia el listener de teclado"""
         if self.keyboard_listener is None or not self.keyboard_listener.running:
-            self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press)
+            from pynput import keyboard
+            
+            self.keyboard_listener = keyboard.Listener(on_press=self.on_key_press,
+                                                      on_release=self.on_key_release)
             self.keyboard_listener.start()
             self.log("Sistema", "Listener de teclado iniciado")
     
@@ -348,6 +957,21 @@ class WoWMultiboxEngine:
             self.keyboard_listener.stop()
             self.log("Sistema", "Listener de teclado detenido")
     
+    def shutdown(self):
+        """Detiene el listener y los carriles de envío"""
+        self.stop_keyboard_listener()
+        self.backend.unwatch_foreground()
+        self.stop_layout_watch()
+        self.discovery.stop()
+        self.scheduler.stop()
+        self.stop_sharding()
+        self.dispatcher.stop()
+        self.config_store.stop()
+        try:
+            self.config_store.flush()
+        except Exception as e:
+            self.log("Error", f"Error guardando configuración: {e}")
+    
     def get_status(self) -> Dict:
         """Obtiene el estado actual del sistema"""
         return {
@@ -4,12 +4,25 @@ Interfaz gráfica usando Tkinter
 """
 
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 from multibox_engine import WoWMultiboxEngine
+from multibox_trace import traced
+from typing import Optional
 import threading
 
 class WoWMultiboxGUI:
-    def __init__(self, root):
+    # Líneas máximas del log en pantalla y periodo de vaciado del buffer (ms)
+    MAX_LOG_LINES = 500
+    LOG_POLL_MS = 100
+    
+    # Periodo del refresco coalescido (~30 Hz)
+    FRAME_MS = 33
+    
+    # Periodo de actualización de las estadísticas del listener (ms)
+    STATS_MS = 1000
+    
+    def __init__(self, root, engine: Optional[WoWMultiboxEngine] = None,
+                 start_listener: bool = True):
         self.root = root
         self.root.title(" Multiboxing Control Panel - Vanilla")
         self.root.geometry("1000x800")  # Ventana más grande
@@ -31,23 +44,40 @@ class WoWMultiboxGUI:
         # Configurar estilo
         self.configure_styles()
         
-        # Inicializar engine
-        self.engine = WoWMultiboxEngine()
+        # Inicializar engine (se puede pasar uno ya creado, p. ej. con backend simulado)
+        self.engine = engine if engine is not None else WoWMultiboxEngine()
+        
+        # Marcas de repintado: los callbacks del engine (hilo del listener) solo
+        # activan una bandera; el hilo de Tk repinta como mucho una vez por frame
+        self.dirty_status = False
+        self.dirty_windows = False
+        self.dirty_foreground = False
+        self.window_rows = []
         
         # Configurar callbacks
-        self.engine.on_status_change = self.update_status
-        self.engine.on_windows_updated = self.update_windows_list
-        self.engine.on_log_message = self.add_log_message
+        self.engine.on_status_change = self.mark_status_dirty
+        self.engine.on_windows_updated = self.mark_windows_dirty
+        self.engine.on_foreground_change = self.mark_foreground_dirty
         
         # Crear interfaz
         self.create_widgets()
         
         # Iniciar engine
         self.engine.find_wow_windows()
-        self.engine.start_keyboard_listener()
+        self.engine.start_window_discovery()
+        if start_listener:
+            self.engine.start_keyboard_listener()
         
         # Actualizar status inicial
         self.update_status()
+        self.dirty_foreground = True
+        self.refresh_tick()
+        
+        # Vaciar el log del engine por lotes en el hilo de Tk
+        self.log_cursor = 0
+        self.poll_log()
+        
+        self.update_listener_stats()
         
         # Protocolo de cierre
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -132,6 +162,7 @@ class WoWMultiboxGUI:
         
         self.create_status_panel(left_column)
         self.create_controls_panel(left_column)
+        self.create_metrics_panel(left_column)
         
         # Columna derecha - Lista de ventanas
         right_column = ttk.Frame(top_frame, style="Medium.TFrame")
@@ -181,6 +212,16 @@ class WoWMultiboxGUI:
         self.status_windows = ttk.Label(status_frame, text="0", style="Normal.TLabel", foreground=self.accent_blue)
         self.status_windows.grid(row=3, column=1, sticky=tk.E, pady=2)
         
+        # Ventana activa
+        ttk.Label(status_frame, text="Ventana activa:", style="Normal.TLabel").grid(row=4, column=0, sticky=tk.W, pady=2)
+        self.status_foreground = ttk.Label(status_frame, text="-", style="Normal.TLabel", foreground="#888888")
+        self.status_foreground.grid(row=4, column=1, sticky=tk.E, pady=2)
+        
+        # Coste del hook global de teclado
+        ttk.Label(status_frame, text="Coste listener:", style="Normal.TLabel").grid(row=5, column=0, sticky=tk.W, pady=2)
+        self.status_listener = ttk.Label(status_frame, text="-", style="Normal.TLabel", foreground="#888888")
+        self.status_listener.grid(row=5, column=1, sticky=tk.E, pady=2)
+        
         status_frame.columnconfigure(1, weight=1)
     
     def create_controls_panel(self, parent):
@@ -236,6 +277,34 @@ class WoWMultiboxGUI:
                                cursor="hand2")
         btn_refresh.pack(fill=tk.X, pady=5)
     
+    def create_metrics_panel(self, parent):
+        """Crea el panel de métricas de latencia"""
+        frame = ttk.LabelFrame(parent, text="Latencia por Pulsación", style="Medium.TFrame")
+        frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.metrics_text = tk.Text(frame,
+                                    height=6,
+                                    bg=self.bg_light,
+                                    fg=self.text_color,
+                                    font=('Courier', 9),
+                                    state=tk.DISABLED)
+        self.metrics_text.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        btn_frame = ttk.Frame(frame, style="Medium.TFrame")
+        btn_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        btn_export = tk.Button(btn_frame, text="📊 Exportar JSON",
+                               command=self.export_metrics,
+                               bg=self.accent_blue, fg="white",
+                               font=('Arial', 9, 'bold'), cursor="hand2")
+        btn_export.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        
+        btn_reset = tk.Button(btn_frame, text="↺ Reiniciar",
+                              command=self.engine.reset_latency_stats,
+                              bg="#34495e", fg="white",
+                              font=('Arial', 9, 'bold'), cursor="hand2")
+        btn_reset.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+    
     def create_windows_panel(self, parent):
         """Crea el panel de lista de ventanas"""
         frame = ttk.LabelFrame(parent, text="Ventanas de WoW", style="Medium.TFrame")
@@ -284,7 +353,7 @@ class WoWMultiboxGUI:
         self.entry_follow = tk.Entry(follow_frame, bg=self.bg_light, fg=self.text_color, 
                                      font=('Arial', 10), insertbackground='white')
         self.entry_follow.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.entry_follow.insert(0, self.engine.config["follow_target"])
+        self.entry_follow.insert(0, self.engine.config.follow_target)
         
         btn_follow = tk.Button(follow_frame, text="Enviar (F9)", command=self.send_follow,
                               bg=self.accent_blue, fg="white", font=('Arial', 9, 'bold'),
@@ -299,7 +368,7 @@ class WoWMultiboxGUI:
         self.entry_assist = tk.Entry(assist_frame, bg=self.bg_light, fg=self.text_color,
                                      font=('Arial', 10), insertbackground='white')
         self.entry_assist.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.entry_assist.insert(0, self.engine.config["assist_target"])
+        self.entry_assist.insert(0, self.engine.config.assist_target)
         
         btn_assist = tk.Button(assist_frame, text="Enviar (F8)", command=self.send_assist,
                               bg=self.accent, fg="white", font=('Arial', 9, 'bold'),
@@ -322,14 +391,14 @@ class WoWMultiboxGUI:
         self.entry_blacklist = tk.Entry(blacklist_frame, bg=self.bg_light, fg=self.text_color,
                                         font=('Arial', 10), insertbackground='white')
         self.entry_blacklist.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        blacklist_str = ','.join(self.engine.config["blacklisted_keys"])
+        blacklist_str = ','.join(sorted(self.engine.config.blacklisted_keys))
         self.entry_blacklist.insert(0, blacklist_str)
         
         # Delay
         delay_frame = ttk.Frame(config_frame, style="Medium.TFrame")
         delay_frame.pack(fill=tk.X, pady=5)
         
-        self.var_delay = tk.BooleanVar(value=self.engine.config["delay_enabled"])
+        self.var_delay = tk.BooleanVar(value=self.engine.config.delay_enabled)
         chk_delay = tk.Checkbutton(delay_frame, text="Delay (ms):", variable=self.var_delay,
                                    bg=self.bg_medium, fg=self.text_color,
                                    selectcolor=self.bg_light, font=('Arial', 10))
@@ -338,7 +407,7 @@ class WoWMultiboxGUI:
         self.entry_delay = tk.Entry(delay_frame, bg=self.bg_light, fg=self.text_color,
                                     font=('Arial', 10), width=10, insertbackground='white')
         self.entry_delay.pack(side=tk.LEFT, padx=5)
-        self.entry_delay.insert(0, str(self.engine.config["delay_ms"]))
+        self.entry_delay.insert(0, str(self.engine.config.delay_ms))
         
         # Botones de acción
         btn_frame = ttk.Frame(config_frame, style="Medium.TFrame")
@@ -376,9 +445,46 @@ class WoWMultiboxGUI:
         self.log_text.tag_config("Assist", foreground="#e74c3c")
         self.log_text.tag_config("Config", foreground="#f39c12")
         self.log_text.tag_config("Warning", foreground="#f39c12")
+        self.log_text.tag_config("Macro", foreground="#9b59b6")
     
     # === Métodos de actualización ===
     
+    @traced("gui.mark_status_dirty")
+    def mark_status_dirty(self):
+        """Callback del engine: el estado cambió (cualquier hilo)"""
+        self.dirty_status = True
+    
+    @traced("gui.mark_windows_dirty")
+    def mark_windows_dirty(self, windows=None):
+        """Callback del engine: la lista de ventanas cambió (cualquier hilo)"""
+        self.dirty_windows = True
+    
+    @traced("gui.mark_foreground_dirty")
+    def mark_foreground_dirty(self, hwnd=None):
+        """Callback del engine: cambió la ventana activa (cualquier hilo)"""
+        self.dirty_foreground = True
+    
+    @traced("gui.refresh_tick")
+    def refresh_tick(self):
+        """Repinta lo marcado desde el último frame y reprograma el siguiente"""
+        # Bajar la bandera antes de repintar: un cambio durante el repintado se verá en el siguiente frame
+        if self.dirty_windows:
+            self.dirty_windows = False
+            self.dirty_status = True
+            self.dirty_foreground = True
+            self.update_windows_list(self.engine.wow_windows)
+        
+        if self.dirty_status:
+            self.dirty_status = False
+            self.update_status()
+        
+        if self.dirty_foreground:
+            self.dirty_foreground = False
+            self.update_foreground(self.engine.foreground_window)
+        
+        self.root.after(self.FRAME_MS, self.refresh_tick)
+    
+    @traced("gui.update_status")
     def update_status(self):
         """Actualiza los indicadores de estado"""
         status = self.engine.get_status()
@@ -410,24 +516,96 @@ class WoWMultiboxGUI:
         # Ventanas
         self.status_windows.config(text=str(status["window_count"]))
     
+    @traced("gui.update_windows_list")
     def update_windows_list(self, windows):
-        """Actualiza la lista de ventanas"""
-        self.windows_listbox.delete(0, tk.END)
-        
+        """Actualiza la lista de ventanas tocando solo las filas que cambiaron"""
+        rows = []
         for w in windows:
-            main_tag = " [MAIN]" if w["is_main"] else ""
-            window_str = f"PID:{w['pid']:5d} | {w['title']}{main_tag}"
-            self.windows_listbox.insert(tk.END, window_str)
+            main_tag = " [MAIN]" if w.is_main else ""
+            hung_tag = " [NO RESPONDE]" if self.engine.dispatcher.is_tripped(w.hwnd) else ""
+            rows.append((f"PID:{w.pid:5d} | {w.title}{main_tag}{hung_tag}", w.is_main))
+        
+        old_rows = self.window_rows
+        for idx, row in enumerate(rows):
+            if idx < len(old_rows):
+                if old_rows[idx] == row:
+                    continue
+                self.windows_listbox.delete(idx)
+            
+            window_str, is_main = row
+            self.windows_listbox.insert(idx, window_str)
             
-            if w["is_main"]:
+            if is_main:
                 # Highlight main window
-                self.windows_listbox.itemconfig(tk.END, bg="#9b59b6")
+                self.windows_listbox.itemconfig(idx, bg="#9b59b6")
+        
+        # Filas sobrantes
+        if len(old_rows) > len(rows):
+            self.windows_listbox.delete(len(rows), tk.END)
+        
+        self.window_rows = rows
+    
+    @traced("gui.update_foreground")
+    def update_foreground(self, hwnd):
+        """Actualiza el indicador de ventana activa"""
+        record = self.engine.registry.get(hwnd)
+        if record:
+            self.status_foreground.config(text=record.title, foreground=self.accent_green)
+        else:
+            self.status_foreground.config(text="(no es WoW)", foreground="#888888")
+    
+    @traced("gui.update_listener_stats")
+    def update_listener_stats(self):
+        """Muestra el coste medio/máximo del callback del listener por evento"""
+        stats = self.engine.get_listener_stats()
+        if stats["events"]:
+            self.status_listener.config(text=f"{stats['avg_us']:.1f} µs (máx {stats['max_us']:.0f} µs)")
+        self.update_metrics()
+        self.root.after(self.STATS_MS, self.update_listener_stats)
     
-    def add_log_message(self, source, message, timestamp):
-        """Añade un mensaje al log"""
+    @traced("gui.update_metrics")
+    def update_metrics(self):
+        """Muestra p50/p95/p99/máx (ms) del reparto, del total y de cada ventana"""
+        stats = self.engine.get_latency_stats()
+        
+        def row(label, summary):
+            return (f"{label[:14]:<14} {summary['p50_us'] / 1000:6.2f} {summary['p95_us'] / 1000:6.2f} "
+                    f"{summary['p99_us'] / 1000:6.2f} {summary['max_us'] / 1000:6.2f}")
+        
+        lines = [f"{'ms':<14} {'p50':>6} {'p95':>6} {'p99':>6} {'máx':>6}",
+                 row("Reparto", stats["dispatch"]),
+                 row("Total", stats["overall"])]
+        for summary in stats["windows"].values():
+            lines.append(row(summary["title"] or "?", summary))
+        
+        self.metrics_text.config(state=tk.NORMAL, height=min(len(lines), 12))
+        self.metrics_text.delete("1.0", tk.END)
+        self.metrics_text.insert("1.0", "\n".join(lines))
+        self.metrics_text.config(state=tk.DISABLED)
+    
+    @traced("gui.poll_log")
+    def poll_log(self):
+        """Lee los mensajes nuevos del buffer del engine y reprograma la lectura"""
+        if self.engine.log_ring.last_seq > self.log_cursor:
+            records = self.engine.log_ring.since(self.log_cursor)
+            if records:
+                self.log_cursor = records[-1].seq
+                self.add_log_messages(records)
+        self.root.after(self.LOG_POLL_MS, self.poll_log)
+    
+    @traced("gui.add_log_messages")
+    def add_log_messages(self, records):
+        """Añade un lote de mensajes al log y recorta las líneas más antiguas"""
         self.log_text.config(state=tk.NORMAL)
-        log_line = f"[{timestamp}] [{source}] {message}\n"
-        self.log_text.insert(tk.END, log_line, source)
+        for record in records:
+            self.log_text.insert(tk.END, record.format() + "\n", record.source)
+        
+        # Limitar el número de líneas
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        excess = line_count - self.MAX_LOG_LINES
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
+        
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
     
@@ -446,48 +624,62 @@ class WoWMultiboxGUI:
         self.engine.toggle_solo_main()
     
     def refresh_windows(self):
-        """Refresca la lista de ventanas"""
-        self.engine.find_wow_windows()
+        """Pide un rescaneo en segundo plano: la lista se actualiza al llegar los cambios"""
+        self.engine.refresh_windows()
     
     def send_follow(self):
         """Envía comando follow"""
         follow_name = self.entry_follow.get().strip()
         if follow_name:
-            self.engine.config["follow_target"] = follow_name
+            # Solo en memoria, como antes: el fichero se escribe al guardar la configuración
+            if follow_name != self.engine.config.follow_target:
+                self.engine.update_config(persist=False, follow_target=follow_name)
             self.engine.send_follow_command()
     
     def send_assist(self):
         """Envía comando assist"""
         assist_name = self.entry_assist.get().strip()
         if assist_name:
-            self.engine.config["assist_target"] = assist_name
+            if assist_name != self.engine.config.assist_target:
+                self.engine.update_config(persist=False, assist_target=assist_name)
             self.engine.send_assist_command()
     
+    def export_metrics(self):
+        """Exporta las métricas de latencia a JSON"""
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            initialfile="multibox_latency.json",
+                                            filetypes=[("JSON", "*.json")])
+        if path:
+            self.engine.export_latency_stats(path)
+    
     def set_selected_as_main(self):
         """Establece la ventana seleccionada como main"""
         selection = self.windows_listbox.curselection()
         if selection:
             idx = selection[0]
             if idx < len(self.engine.wow_windows):
-                hwnd = self.engine.wow_windows[idx]["hwnd"]
+                hwnd = self.engine.wow_windows[idx].hwnd
                 self.engine.set_main_window(hwnd)
     
     def save_configuration(self):
         """Guarda la configuración actual"""
-        # Actualizar configuración desde los campos
-        self.engine.config["follow_target"] = self.entry_follow.get().strip()
-        self.engine.config["assist_target"] = self.entry_assist.get().strip()
-        self.engine.config["delay_enabled"] = self.var_delay.get()
+        # Reunir los cambios de los campos; el engine crea una configuración nueva
+        changes = {
+            "follow_target": self.entry_follow.get().strip(),
+            "assist_target": self.entry_assist.get().strip(),
+            "delay_enabled": self.var_delay.get(),
+        }
         
         try:
-            delay_ms = int(self.entry_delay.get())
-            self.engine.config["delay_ms"] = delay_ms
+            changes["delay_ms"] = int(self.entry_delay.get())
         except ValueError:
             pass
         
         blacklist_str = self.entry_blacklist.get().strip()
         if blacklist_str:
-            self.engine.config["blacklisted_keys"] = set(blacklist_str.split(','))
+            changes["blacklisted_keys"] = frozenset(blacklist_str.split(','))
+        
+        self.engine.update_config(persist=False, **changes)
         
         # Guardar
         if self.engine.save_config():
@@ -500,13 +692,12 @@ class WoWMultiboxGUI:
             self.entry_assist.delete(0, tk.END)
             self.entry_blacklist.delete(0, tk.END)
             self.entry_blacklist.insert(0, "b,m")
-            self.engine.config["follow_target"] = ""
-            self.engine.config["assist_target"] = ""
+            self.engine.update_config(persist=False, follow_target="", assist_target="")
             self.engine.save_config()
     
     def on_closing(self):
         """Maneja el cierre de la aplicación"""
-        self.engine.stop_keyboard_listener()
+        self.engine.shutdown()
         self.root.destroy()
 
 
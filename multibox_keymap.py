@@ -0,0 +1,172 @@
+"""
+WoW Multiboxing Keymap
+Tabla precalculada de teclas: código virtual, scan code y lParam listos para
+WM_KEYDOWN/WM_KEYUP. Se construye al iniciar y al cambiar la distribución del teclado,
+de modo que el envío de una tecla es una búsqueda en un diccionario y dos PostMessage.
+"""
+
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from multibox_backend import WindowBackend, WM_KEYDOWN, WM_KEYUP
+
+VK_SHIFT = 0x10
+
+# Teclas especiales replicables por nombre
+SPECIAL_KEYS = {
+    "enter": 0x0D,
+    "tab": 0x09,
+    "esc": 0x1B,
+    "backspace": 0x08,
+    "shift": VK_SHIFT,
+    "up": 0x26,
+    "down": 0x28,
+    "left": 0x25,
+    "right": 0x27,
+}
+SPECIAL_KEYS.update({f"f{n}": 0x6F + n for n in range(1, 13)})
+
+
+def make_lparam(scan: int, key_up: bool = False, repeat: bool = False) -> int:
+    """
+    Construye el lParam de WM_KEYDOWN/WM_KEYUP:
+    bits 0-15 repeticiones, 16-23 scan code, 30 estado previo, 31 transición
+    """
+    lparam = 1 | ((scan & 0xFF) << 16)
+    if repeat or key_up:
+        lparam |= 1 << 30
+    if key_up:
+        lparam |= 1 << 31
+    return lparam
+
+
+class KeyEntry:
+    """Datos precalculados de una tecla"""
+
+    __slots__ = ("name", "vk", "scan", "shift", "lparam_down", "lparam_repeat", "lparam_up")
+
+    def __init__(self, name: str, vk: int, scan: int, shift: bool = False):
+        self.name = name
+        self.vk = vk
+        self.scan = scan
+        self.shift = shift
+        self.lparam_down = make_lparam(scan)
+        self.lparam_repeat = make_lparam(scan, repeat=True)
+        self.lparam_up = make_lparam(scan, key_up=True)
+
+    def __repr__(self):
+        return f"KeyEntry({self.name!r}, vk=0x{self.vk:02X}, scan=0x{self.scan:02X}, shift={self.shift})"
+
+
+class KeyTable:
+    """Tabla nombre de tecla -> KeyEntry, reconstruida solo al cambiar la distribución"""
+
+    def __init__(self, backend: WindowBackend):
+        self.backend = backend
+        self.layout: Optional[int] = None
+        self._entries: Dict[str, KeyEntry] = {}
+        self._names = set(SPECIAL_KEYS)
+        self.shift_entry = KeyEntry("shift", VK_SHIFT, backend.map_virtual_key(VK_SHIFT))
+
+    def build(self, names: Iterable[str] = (), layout: Optional[int] = None):
+        """
+        Construye la tabla para los caracteres indicados y las teclas especiales en una
+        distribución (por defecto, la de la ventana activa)
+        """
+        if layout is None:
+            layout = self.backend.get_keyboard_layout()
+        self._names.update(names)
+        entries = {}
+        for name in self._names:
+            entry = self._make_entry(name, layout)
+            if entry is not None:
+                entries[name] = entry
+
+        self.shift_entry = KeyEntry("shift", VK_SHIFT, self.backend.map_virtual_key(VK_SHIFT, layout))
+        self.layout = layout
+        # Sustitución atómica por referencia: los lectores nunca ven una tabla a medias
+        self._entries = entries
+
+    def refresh_if_layout_changed(self, hwnd: int = 0) -> bool:
+        """Reconstruye la tabla si cambió la distribución del teclado de la ventana"""
+        layout = self.backend.get_keyboard_layout(hwnd)
+        if layout != self.layout:
+            self.build(layout=layout)
+            return True
+        return False
+
+    def get(self, name: str) -> Optional[KeyEntry]:
+        """Busca una tecla; las que no estaban precalculadas se calculan una vez y se guardan"""
+        entry = self._entries.get(name)
+        if entry is None and name not in self._names:
+            self._names.add(name)
+            entry = self._make_entry(name, self.layout or 0)
+            if entry is not None:
+                self._entries[name] = entry
+        return entry
+
+    def key_messages(self, entry: KeyEntry, key_up: bool = False,
+                     repeat: bool = False) -> Tuple[Tuple[int, int, int], ...]:
+        """Mensajes (msg, wParam, lParam) de un KEYDOWN o KEYUP, con el shift si la tecla lo necesita"""
+        shift = self.shift_entry
+        if key_up:
+            messages = ((WM_KEYUP, entry.vk, entry.lparam_up),)
+            if entry.shift:
+                messages += ((WM_KEYUP, shift.vk, shift.lparam_up),)
+            return messages
+
+        messages = ((WM_KEYDOWN, entry.vk, entry.lparam_repeat if repeat else entry.lparam_down),)
+        if entry.shift:
+            messages = ((WM_KEYDOWN, shift.vk, shift.lparam_down),) + messages
+        return messages
+
+    def _make_entry(self, name: str, layout: int = 0) -> Optional[KeyEntry]:
+        vk = SPECIAL_KEYS.get(name)
+        shift = False
+        if vk is None:
+            if len(name) != 1:
+                return None
+            result = self.backend.vk_key_scan(name, layout)
+            if result == -1 or result & 0xFF == 0xFF:
+                return None
+            vk = result & 0xFF
+            shift = bool(result & 0x100)
+        return KeyEntry(name, vk, self.backend.map_virtual_key(vk, layout), shift)
+
+
+def benchmark(backend: WindowBackend, iterations: int = 100000,
+              chars: str = "abcdefghijklmnopqrstuvwxyz1234567890 ") -> Dict[str, float]:
+    """Compara la búsqueda en la tabla con VkKeyScan + MapVirtualKey por llamada (ns por tecla)"""
+    table = KeyTable(backend)
+    table.build(chars)
+    keys = [chars[i % len(chars)] for i in range(iterations)]
+
+    start = time.perf_counter_ns()
+    for key in keys:
+        table.get(key)
+    table_ns = (time.perf_counter_ns() - start) / iterations
+
+    start = time.perf_counter_ns()
+    for key in keys:
+        vk = backend.vk_key_scan(key) & 0xFF
+        backend.map_virtual_key(vk)
+    per_call_ns = (time.perf_counter_ns() - start) / iterations
+
+    return {
+        "iterations": iterations,
+        "table_ns": table_ns,
+        "per_call_ns": per_call_ns,
+        "speedup": per_call_ns / table_ns if table_ns else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    from multibox_backend import SimulatedBackend, create_default_backend
+
+    bench_backend = create_default_backend() if sys.platform == "win32" else SimulatedBackend()
+    result = benchmark(bench_backend)
+    print(f"Tabla:      {result['table_ns']:8.1f} ns/tecla")
+    print(f"VkKeyScan:  {result['per_call_ns']:8.1f} ns/tecla")
+    print(f"Mejora:     {result['speedup']:8.1f}x")
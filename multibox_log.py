@@ -0,0 +1,75 @@
+"""
+WoW Multiboxing Log
+Log no bloqueante: los registros van a un buffer circular acotado en memoria
+y los consumidores (GUI, daemon) los leen por lotes con un cursor propio
+"""
+
+import collections
+import itertools
+import time
+from typing import Dict, List
+
+# Niveles de log
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+
+# Nivel por defecto según el origen del mensaje
+SOURCE_LEVELS: Dict[str, int] = {
+    "Error": ERROR,
+    "Warning": WARNING,
+}
+
+
+class LogRecord:
+    """Entrada del log"""
+
+    __slots__ = ("seq", "created", "level", "source", "message")
+
+    def __init__(self, seq: int, created: float, level: int, source: str, message: str):
+        self.seq = seq
+        self.created = created
+        self.level = level
+        self.source = source
+        self.message = message
+
+    @property
+    def timestamp(self) -> str:
+        """Hora en formato HH:MM:SS (se formatea solo al mostrarla)"""
+        return time.strftime("%H:%M:%S", time.localtime(self.created))
+
+    def format(self) -> str:
+        return f"[{self.timestamp}] [{self.source}] {self.message}"
+
+
+class LogRing:
+    """
+    Buffer circular de registros. append() nunca bloquea: si está lleno se descartan
+    los más antiguos. Cada consumidor guarda el último seq leído y pide los siguientes.
+    """
+
+    def __init__(self, capacity: int = 2000):
+        self._records: "collections.deque[LogRecord]" = collections.deque(maxlen=capacity)
+        self._seq = itertools.count(1)
+
+    def append(self, level: int, source: str, message: str):
+        # deque.append y next(count) son atómicos: no hace falta bloqueo
+        self._records.append(LogRecord(next(self._seq), time.time(), level, source, message))
+
+    def since(self, seq: int) -> List[LogRecord]:
+        """Registros con número de secuencia mayor que seq"""
+        # copy() es atómica; se filtra en lugar de indexar porque dos hilos pueden
+        # añadir registros en orden ligeramente distinto al de su secuencia
+        snapshot = self._records.copy()
+        if not snapshot or snapshot[-1].seq <= seq:
+            return []
+        return [r for r in snapshot if r.seq > seq]
+
+    @property
+    def last_seq(self) -> int:
+        """Secuencia del registro más reciente (0 si está vacío)"""
+        snapshot = self._records
+        return snapshot[-1].seq if snapshot else 0
@@ -0,0 +1,90 @@
+"""
+WoW Multiboxing Macros
+Secuencias con nombre de pasos (tecla, comando de chat, espera) definidas en la configuración.
+Cada macro se compila en una lista de acciones con su desfase; la ejecución la hace
+el planificador central, intercalando las secuencias de todas las ventanas.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from multibox_backend import WM_KEYUP
+from multibox_chat import ChatInjector, EncodedCommand, Message
+from multibox_keymap import KeyTable
+
+DEFAULT_HOLD_MS = 30
+
+
+class MacroAction:
+    """
+    Lote de mensajes que se envía a una ventana 'offset' segundos después de empezar,
+    o un comando de chat completo (se encola entero para que nada se intercale)
+    """
+
+    __slots__ = ("offset", "messages", "message_delay", "command", "critical")
+
+    def __init__(self, offset: float, messages: Tuple[Message, ...], message_delay: float = 0.0,
+                 command: Optional[EncodedCommand] = None):
+        self.offset = offset
+        self.messages = messages
+        self.message_delay = message_delay
+        self.command = command
+        # Los lotes que sueltan teclas no se descartan nunca al llenarse la cola
+        self.critical = any(msg == WM_KEYUP for msg, _, _ in messages)
+
+
+class Macro:
+    """Macro compilada"""
+
+    __slots__ = ("name", "actions", "targets", "stagger", "duration")
+
+    def __init__(self, name: str, actions: Tuple[MacroAction, ...], targets: str,
+                 stagger: float, duration: float):
+        self.name = name
+        self.actions = actions
+        self.targets = targets
+        self.stagger = stagger
+        self.duration = duration
+
+
+def compile_macro(name: str, spec: Dict, key_table: KeyTable, chat: ChatInjector,
+                  key_hold: float = DEFAULT_HOLD_MS / 1000.0) -> Macro:
+    """
+    Compila la definición de una macro:
+    {"steps": [{"key": "1"}, {"wait_ms": 1500}, {"command": "/follow X"}],
+     "targets": "others", "stagger_ms": 100}
+    key_hold: pulsación de los pasos 'key' sin hold_ms (segundos)
+    Lanza ValueError si la definición no es válida.
+    """
+    actions: List[MacroAction] = []
+    offset = 0.0
+
+    for step in spec.get("steps", []):
+        if "key" in step:
+            entry = key_table.get(str(step["key"]).lower())
+            if entry is None:
+                raise ValueError(f"tecla no soportada: {step['key']!r}")
+            hold = step["hold_ms"] / 1000.0 if "hold_ms" in step else key_hold
+
+            actions.append(MacroAction(offset, key_table.key_messages(entry)))
+            actions.append(MacroAction(offset + hold, key_table.key_messages(entry, key_up=True)))
+            offset += hold
+
+        elif "command" in step:
+            encoded = chat.encode(step["command"])
+            actions.append(MacroAction(offset, (), command=encoded))
+            offset += chat.open_delay + chat.char_delay * len(encoded.text) + chat.send_delay
+
+        elif "wait_ms" in step:
+            offset += step["wait_ms"] / 1000.0
+
+        else:
+            raise ValueError(f"paso desconocido: {step!r}")
+
+    if not actions:
+        raise ValueError("la macro no tiene pasos")
+
+    return Macro(name,
+                 tuple(actions),
+                 spec.get("targets", "others").lower(),
+                 spec.get("stagger_ms", 0) / 1000.0,
+                 offset)
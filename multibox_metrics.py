@@ -0,0 +1,134 @@
+"""
+WoW Multiboxing Metrics
+Latencia por pulsación: desde que el listener recibe la tecla hasta que empieza el
+reparto y hasta el PostMessage de cada ventana. Se agrega en histogramas de cubetas
+fijas (registrar es una búsqueda binaria y un incremento) con p50/p95/p99/máx.
+"""
+
+import bisect
+import json
+from typing import Dict, List, Optional
+
+
+def _bucket_bounds() -> List[int]:
+    """Límites superiores de las cubetas en ns: progresión geométrica x1.25 de 1 µs a 10 s"""
+    bounds = []
+    bound = 1000.0
+    while bound < 10_000_000_000:
+        bounds.append(int(bound))
+        bound *= 1.25
+    return bounds
+
+
+BUCKET_BOUNDS_NS: List[int] = _bucket_bounds()
+
+
+class LatencyHistogram:
+    """Histograma de latencias con cubetas fijas (la última recoge el desbordamiento)"""
+
+    __slots__ = ("counts", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, elapsed_ns: int):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_NS, elapsed_ns)] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def merge(self, other: "LatencyHistogram"):
+        """Suma las muestras de otro histograma a este"""
+        for idx, value in enumerate(other.counts):
+            self.counts[idx] += value
+        self.count += other.count
+        self.total_ns += other.total_ns
+        if other.max_ns > self.max_ns:
+            self.max_ns = other.max_ns
+
+    def percentile(self, pct: float) -> int:
+        """Límite superior de la cubeta que contiene el percentil (ns, acotado al máximo)"""
+        if not self.count:
+            return 0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for idx, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank and value:
+                if idx >= len(BUCKET_BOUNDS_NS):
+                    return self.max_ns
+                return min(BUCKET_BOUNDS_NS[idx], self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> Dict:
+        """Resumen en microsegundos"""
+        return {
+            "count": self.count,
+            "avg_us": self.total_ns / self.count / 1000.0 if self.count else 0.0,
+            "p50_us": self.percentile(50) / 1000.0,
+            "p95_us": self.percentile(95) / 1000.0,
+            "p99_us": self.percentile(99) / 1000.0,
+            "max_us": self.max_ns / 1000.0,
+        }
+
+
+class LatencyMetrics:
+    """
+    Latencias del engine. Cada histograma tiene un único hilo escritor: el de reparto
+    lo escribe el listener y cada histograma por ventana su carril de envío; el total
+    se obtiene sumando los de cada ventana al leer, sin bloqueos en el camino caliente.
+    """
+
+    def __init__(self):
+        self.dispatch = LatencyHistogram()
+        self._windows: Dict[int, LatencyHistogram] = {}
+
+    def record_dispatch(self, elapsed_ns: int):
+        """Listener -> inicio del reparto (hilo del listener)"""
+        self.dispatch.record(elapsed_ns)
+
+    def record_post(self, hwnd: int, elapsed_ns: int):
+        """Listener -> PostMessage terminado en una ventana (carril de la ventana)"""
+        histogram = self._windows.get(hwnd)
+        if histogram is None:
+            histogram = self._windows.setdefault(hwnd, LatencyHistogram())
+        histogram.record(elapsed_ns)
+
+    def merge_windows(self, histograms: Dict[int, LatencyHistogram]):
+        """Suma histogramas por ventana registrados fuera (procesos trabajadores)"""
+        for hwnd, histogram in histograms.items():
+            self._windows.setdefault(hwnd, LatencyHistogram()).merge(histogram)
+
+    def reset(self):
+        """Descarta las muestras (sustitución por referencia)"""
+        self.dispatch = LatencyHistogram()
+        self._windows = {}
+
+    def snapshot(self, titles: Optional[Dict[int, str]] = None) -> Dict:
+        """Resumen de reparto, total y por ventana"""
+        titles = titles or {}
+        overall = LatencyHistogram()
+        windows = {}
+        for hwnd, histogram in list(self._windows.items()):
+            overall.merge(histogram)
+            summary = histogram.summary()
+            summary["title"] = titles.get(hwnd, "")
+            windows[f"{hwnd:#x}"] = summary
+
+        return {
+            "dispatch": self.dispatch.summary(),
+            "overall": overall.summary(),
+            "windows": windows,
+        }
+
+    def export_json(self, path: str, titles: Optional[Dict[int, str]] = None) -> Dict:
+        """Escribe el resumen en un fichero JSON y lo devuelve"""
+        data = self.snapshot(titles)
+        data["bucket_bounds_us"] = [b / 1000.0 for b in BUCKET_BOUNDS_NS]
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        return data
@@ -0,0 +1,658 @@
+"""
+WoW Multiboxing Net
+Difusión a otros equipos: el equipo principal (NetServer) reenvía las teclas replicadas
+y los comandos de chat (follow/assist) a engines remotos (NetClient), que los aplican a
+todas sus ventanas de WoW.
+
+Tramas binarias de tamaño fijo (80 bytes, little-endian) sobre UDP, o sobre TCP si se
+pide el canal fiable (el tamaño fijo hace trivial separar las tramas del flujo):
+  magic (2s), versión (B), tipo (B), secuencia (I), instante ns del emisor (Q),
+  longitud (B), datos (47s: nombre de la tecla o texto del comando en UTF-8),
+  firma (16s: HMAC-SHA256 truncado de todo lo anterior con el secreto compartido)
+Cada trama recibida se confirma con un ACK que devuelve su secuencia e instante; el
+servidor calcula con él el tiempo de ida y vuelta de cada equipo remoto.
+
+Alta de un equipo remoto: HELLO -> CHALLENGE (nonce aleatorio) -> AUTH (el mismo nonce,
+firmado). Sin el secreto no se puede ni recibir ni inyectar tramas; además el servidor
+puede limitar las altas a una lista de direcciones permitidas. Las tramas no van
+cifradas: en una red no confiable, usar una VPN.
+"""
+
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from multibox_metrics import LatencyHistogram
+
+MAGIC = b"MB"
+VERSION = 2
+DEFAULT_NET_PORT = 47610
+DEFAULT_NET_HOST = "127.0.0.1"
+
+FRAME_KEY_DOWN = 1
+FRAME_KEY_REPEAT = 2
+FRAME_KEY_UP = 3
+FRAME_COMMAND = 4
+FRAME_ACK = 5
+FRAME_HELLO = 6      # alta / mantenimiento del cliente
+FRAME_WELCOME = 7    # respuesta al HELLO con la secuencia actual del servidor
+FRAME_BYE = 8
+FRAME_CHALLENGE = 9  # nonce que el cliente debe devolver firmado
+FRAME_AUTH = 10      # respuesta al CHALLENGE
+
+_BODY = struct.Struct("<2sBBIQB47s")
+TAG_SIZE = 16
+FRAME_SIZE = _BODY.size + TAG_SIZE
+MAX_PAYLOAD = 47
+NONCE_SIZE = 16
+
+# Cada cuánto renueva el cliente su alta y cuándo la da por perdida el servidor (segundos)
+KEEPALIVE_INTERVAL = 2.0
+PEER_TIMEOUT = 10.0
+
+# Validez de un CHALLENGE y máximo de altas pendientes a la vez
+CHALLENGE_TIMEOUT = 5.0
+MAX_PENDING_CHALLENGES = 64
+
+# Espera máxima de un envío TCP (en el hilo escritor del equipo) antes de dar el canal
+# por roto, y tramas que pueden quedar pendientes antes de eliminar al equipo
+TCP_SEND_TIMEOUT = 1.0
+PEER_QUEUE_SIZE = 1024
+
+# Diferencia de secuencia a partir de la cual se supone que el servidor se reinició
+_SEQ_RESTART_GAP = 1 << 20
+
+
+def _sign(key: bytes, body: bytes) -> bytes:
+    return hmac.new(key, body, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+def encode_frame(kind: int, seq: int, t_ns: int, payload: bytes = b"", key: bytes = b"") -> bytes:
+    """Empaqueta y firma una trama de tamaño fijo"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"datos demasiado largos para una trama ({len(payload)} > {MAX_PAYLOAD} bytes)")
+    body = _BODY.pack(MAGIC, VERSION, kind, seq & 0xFFFFFFFF, t_ns, len(payload), payload)
+    return body + _sign(key, body)
+
+
+def decode_frame(data: bytes, key: bytes = b"") -> Optional[Tuple[int, int, int, bytes]]:
+    """
+    Desempaqueta una trama: (tipo, secuencia, instante, datos).
+    None si no es válida o si su firma no corresponde al secreto.
+    """
+    if len(data) != FRAME_SIZE:
+        return None
+    body = data[:_BODY.size]
+    if not hmac.compare_digest(data[_BODY.size:], _sign(key, body)):
+        return None
+    magic, version, kind, seq, t_ns, length, payload = _BODY.unpack(body)
+    if magic != MAGIC or version != VERSION or length > MAX_PAYLOAD:
+        return None
+    return kind, seq, t_ns, payload[:length]
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Lee exactamente 'size' bytes de un socket TCP (None si se cierra)"""
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+class _Peer:
+    """Equipo remoto visto desde el servidor"""
+
+    __slots__ = ("address", "sock", "last_seen", "sent", "acked", "rtt", "outbox")
+
+    def __init__(self, address, sock: Optional[socket.socket] = None):
+        self.address = address
+        self.sock = sock            # None: UDP
+        self.last_seen = time.monotonic()
+        self.sent = 0
+        self.acked = 0
+        self.rtt = LatencyHistogram()
+        # TCP: tramas pendientes para el hilo escritor (el listener nunca espera a la red)
+        self.outbox: Optional[queue.Queue] = queue.Queue(PEER_QUEUE_SIZE) if sock else None
+
+    @property
+    def label(self) -> str:
+        return f"{'tcp' if self.sock else 'udp'}://{self.address[0]}:{self.address[1]}"
+
+
+class NetServer:
+    """
+    Equipo principal: difunde a los equipos remotos las teclas que replica el engine y
+    los comandos que envía a sus slaves. Los clientes se dan de alta con un HELLO (UDP)
+    o conectándose al puerto TCP si el canal fiable está activado, y deben superar el
+    CHALLENGE con el secreto compartido.
+
+    Por defecto solo escucha en 127.0.0.1; para escuchar en la red hay que indicar la
+    interfaz y un secreto o una lista de direcciones permitidas (allow).
+    """
+
+    def __init__(self, engine, host: str = DEFAULT_NET_HOST, port: int = DEFAULT_NET_PORT,
+                 reliable: bool = False, secret: str = "", allow: Iterable[str] = ()):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.reliable = reliable
+        self.allow = frozenset(allow)
+        self._key = secret.encode("utf-8")
+
+        self.rejected = 0
+        self._peers: Dict[tuple, _Peer] = {}
+        self._challenges: Dict[tuple, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._udp: Optional[socket.socket] = None
+        self._tcp: Optional[socket.socket] = None
+        self._running = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Dirección UDP real (útil con port=0)"""
+        return self._udp.getsockname() if self._udp else (self.host, self.port)
+
+    @property
+    def tcp_address(self) -> Optional[Tuple[str, int]]:
+        return self._tcp.getsockname() if self._tcp else None
+
+    def start(self):
+        """Abre los sockets y se engancha a los reenvíos del engine"""
+        if self._running:
+            return
+        if not self._key and not self.allow and not _is_loopback(self.host):
+            raise ValueError(f"escuchar en {self.host} requiere un secreto compartido "
+                             f"o una lista de equipos permitidos")
+
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((self.host, self.port))
+        self._udp.settimeout(1.0)
+        self._running = True
+        threading.Thread(target=self._udp_loop, name="net-server-udp", daemon=True).start()
+
+        if self.reliable:
+            self._tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._tcp.bind((self.host, self.address[1]))
+            self._tcp.listen()
+            self._tcp.settimeout(1.0)
+            threading.Thread(target=self._accept_loop, name="net-server-tcp", daemon=True).start()
+
+        self.engine.on_key_forward = self.send_key
+        self.engine.on_command_forward = self.send_command
+        host, port = self.address
+        self.engine.log("Sistema", f"Difusión a otros equipos en {host}:{port}"
+                                   f"{' (UDP + TCP)' if self.reliable else ' (UDP)'}")
+        if not self._key:
+            self.engine.log("Warning", "Difusión sin secreto compartido: las tramas no van firmadas")
+
+    def stop(self):
+        """Cierra los sockets y se desengancha del engine"""
+        if not self._running:
+            return
+        self._running = False
+        if self.engine.on_key_forward == self.send_key:
+            self.engine.on_key_forward = None
+        if self.engine.on_command_forward == self.send_command:
+            self.engine.on_command_forward = None
+        with self._lock:
+            peers = list(self._peers.values())
+            self._peers.clear()
+        for peer in peers:
+            self._close_peer(peer)
+        for sock in (self._udp, self._tcp):
+            if sock is not None:
+                sock.close()
+
+    # === Envío (hilo del listener) ===
+
+    def send_key(self, key: str, pressed: bool, repeat: bool = False):
+        """Reenvía una tecla replicada (callback on_key_forward del engine)"""
+        kind = FRAME_KEY_UP if not pressed else FRAME_KEY_REPEAT if repeat else FRAME_KEY_DOWN
+        self._broadcast(kind, key.encode("utf-8"))
+
+    def send_command(self, command: str):
+        """Reenvía un comando de chat (callback on_command_forward del engine)"""
+        try:
+            self._broadcast(FRAME_COMMAND, command.encode("utf-8"))
+        except ValueError as e:
+            self.engine.log("Error", f"Comando no reenviado a otros equipos: {e}")
+
+    def _broadcast(self, kind: int, payload: bytes) -> int:
+        """
+        Envía una trama a todos los equipos remotos; devuelve a cuántos se entregó.
+        Nunca espera a la red: UDP sale directamente y TCP se encola para el hilo
+        escritor del equipo (si su cola se llena, el equipo se elimina).
+        """
+        seq = next(self._seq)
+        self._last_seq = seq
+        frame = encode_frame(kind, seq, time.perf_counter_ns(), payload, self._key)
+        sent = 0
+        with self._lock:
+            peers = list(self._peers.values())
+        for peer in peers:
+            try:
+                if peer.sock is None:
+                    self._udp.sendto(frame, peer.address)
+                else:
+                    peer.outbox.put_nowait(frame)
+                peer.sent += 1
+                sent += 1
+            except queue.Full:
+                self._drop_peer(peer, "no consume las tramas a tiempo")
+            except OSError as e:
+                self._drop_peer(peer, f"error de envío: {e}")
+        return sent
+
+    def _tcp_writer(self, peer: _Peer):
+        """Hilo escritor de un equipo TCP: saca tramas de su cola y las envía"""
+        while True:
+            frame = peer.outbox.get()
+            if frame is None:
+                return
+            try:
+                peer.sock.sendall(frame)
+            except OSError as e:
+                self._drop_peer(peer, f"error de envío: {e}")
+                return
+
+    # === Recepción ===
+
+    def _allowed(self, host: str) -> bool:
+        return not self.allow or host in self.allow
+
+    def _challenge(self, peer_key: tuple, sock: Optional[socket.socket]):
+        """Responde al HELLO de un equipo desconocido con un nonce que debe firmar"""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._challenges) >= MAX_PENDING_CHALLENGES:
+                self._challenges = {key: pending for key, pending in self._challenges.items()
+                                    if now - pending[1] < CHALLENGE_TIMEOUT}
+                if len(self._challenges) >= MAX_PENDING_CHALLENGES:
+                    return
+            nonce = os.urandom(NONCE_SIZE)
+            self._challenges[peer_key] = (nonce, now)
+        frame = encode_frame(FRAME_CHALLENGE, 0, time.perf_counter_ns(), nonce, self._key)
+        if sock is None:
+            self._udp.sendto(frame, peer_key)
+        else:
+            # Aún no es un equipo dado de alta: ningún otro hilo escribe en este socket
+            sock.sendall(frame)
+
+    def _authenticate(self, peer_key: tuple, nonce: bytes, sock: Optional[socket.socket]) -> bool:
+        """Da de alta al equipo si devolvió el nonce pendiente dentro de plazo"""
+        with self._lock:
+            pending = self._challenges.pop(peer_key, None)
+            if (pending is None or time.monotonic() - pending[1] > CHALLENGE_TIMEOUT
+                    or not hmac.compare_digest(pending[0], nonce)):
+                return False
+            peer = self._peers.get(peer_key)
+            if peer is None:
+                address = peer_key[1:] if sock is not None else peer_key
+                peer = self._peers[peer_key] = _Peer(address, sock)
+                if sock is not None:
+                    threading.Thread(target=self._tcp_writer, args=(peer,),
+                                     name=f"net-writer-{address[1]}", daemon=True).start()
+        self.engine.log("Sistema", f"Equipo remoto conectado: {peer.label}")
+        return True
+
+    def _handle(self, peer_key: tuple, data: bytes, sock: Optional[socket.socket] = None):
+        frame = decode_frame(data, self._key)
+        if frame is None:
+            self.rejected += 1
+            return
+        kind, seq, t_ns, payload = frame
+        now = time.perf_counter_ns()
+
+        if kind == FRAME_HELLO:
+            peer = self._peers.get(peer_key)
+            if peer is None:
+                self._challenge(peer_key, sock)
+                return
+            peer.last_seen = time.monotonic()
+            # Por TCP la conexión ya ordena las tramas: no hace falta resincronizar
+            if sock is None:
+                self._udp.sendto(encode_frame(FRAME_WELCOME, self._last_seq, now, b"", self._key),
+                                 peer_key)
+            return
+
+        if kind == FRAME_AUTH:
+            if not self._authenticate(peer_key, payload, sock):
+                self.rejected += 1
+                return
+            if sock is None:
+                self._udp.sendto(encode_frame(FRAME_WELCOME, self._last_seq, now, b"", self._key),
+                                 peer_key)
+            return
+
+        peer = self._peers.get(peer_key)
+        if peer is None:
+            return
+        peer.last_seen = time.monotonic()
+        if kind == FRAME_ACK:
+            peer.acked += 1
+            if 0 < t_ns <= now:
+                peer.rtt.record(now - t_ns)
+        elif kind == FRAME_BYE:
+            self._drop_peer(peer, "desconectado")
+
+    def _udp_loop(self):
+        while self._running:
+            try:
+                data, address = self._udp.recvfrom(FRAME_SIZE)
+            except socket.timeout:
+                self._expire_peers()
+                continue
+            except OSError:
+                return
+            if self._allowed(address[0]):
+                self._handle(address, data)
+            else:
+                self.rejected += 1
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                conn, address = self._tcp.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if not self._allowed(address[0]):
+                self.rejected += 1
+                conn.close()
+                continue
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(TCP_SEND_TIMEOUT)
+            threading.Thread(target=self._tcp_reader, args=(conn, address),
+                             name=f"net-peer-{address[1]}", daemon=True).start()
+
+    def _tcp_reader(self, conn: socket.socket, address: tuple):
+        key = ("tcp",) + tuple(address)
+        while self._running:
+            try:
+                data = _recv_exact(conn, FRAME_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                data = None
+            if data is None:
+                self._challenges.pop(key, None)
+                peer = self._peers.get(key)
+                if peer is not None:
+                    self._drop_peer(peer, "conexión cerrada")
+                else:
+                    conn.close()
+                return
+            self._handle(key, data, conn)
+
+    def _expire_peers(self):
+        now = time.monotonic()
+        for peer in list(self._peers.values()):
+            if peer.sock is None and now - peer.last_seen > PEER_TIMEOUT:
+                self._drop_peer(peer, "sin respuesta")
+
+    def _drop_peer(self, peer: _Peer, reason: str):
+        with self._lock:
+            key = ("tcp",) + tuple(peer.address) if peer.sock else peer.address
+            if self._peers.pop(key, None) is None:
+                return
+        self._close_peer(peer)
+        self.engine.log("Warning", f"Equipo remoto {peer.label} eliminado: {reason}")
+
+    @staticmethod
+    def _close_peer(peer: _Peer):
+        if peer.sock is not None:
+            try:
+                peer.outbox.put_nowait(None)
+            except queue.Full:
+                pass  # el escritor sale al fallar el envío sobre el socket cerrado
+            try:
+                peer.sock.close()
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        """Tramas enviadas, confirmadas y tiempo de ida y vuelta de cada equipo remoto"""
+        peers = {}
+        for peer in list(self._peers.values()):
+            summary = peer.rtt.summary()
+            peers[peer.label] = {
+                "sent": peer.sent,
+                "acked": peer.acked,
+                "rtt_p50_us": summary["p50_us"],
+                "rtt_p99_us": summary["p99_us"],
+                "rtt_max_us": summary["max_us"],
+            }
+        return {"seq": self._last_seq, "rejected": self.rejected, "peers": peers}
+
+
+class NetClient:
+    """
+    Equipo remoto: recibe las tramas del servidor, las confirma y las aplica a todas
+    sus ventanas de WoW. Por UDP las tramas atrasadas se descartan salvo los KEYUP
+    (para no dejar teclas atascadas); los huecos de secuencia se cuentan como perdidas.
+    Las tramas sin la firma del secreto compartido se descartan.
+    """
+
+    def __init__(self, engine, host: str, port: int = DEFAULT_NET_PORT, reliable: bool = False,
+                 secret: str = ""):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.reliable = reliable
+        self._key = secret.encode("utf-8")
+
+        self.received = 0
+        self.lost = 0
+        self.late = 0
+        self.rejected = 0
+        self._last_seq = 0
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        if self.reliable:
+            sock = socket.create_connection((self.host, self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect((self.host, self.port))
+        sock.settimeout(KEEPALIVE_INTERVAL)
+        self._sock = sock
+        self._running = True
+        self._send_frame(FRAME_HELLO, 0, time.perf_counter_ns())
+        threading.Thread(target=self._run, name="net-client", daemon=True).start()
+        self.engine.log("Sistema", f"Recibiendo teclas de {self.host}:{self.port} "
+                                   f"({'TCP' if self.reliable else 'UDP'})")
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self._send_frame(FRAME_BYE, 0, 0)
+        except OSError:
+            pass
+        self._sock.close()
+        self.engine.release_remote_keys()
+
+    def _send_frame(self, kind: int, seq: int, t_ns: int, payload: bytes = b""):
+        frame = encode_frame(kind, seq, t_ns, payload, self._key)
+        with self._send_lock:
+            self._sock.sendall(frame) if self.reliable else self._sock.send(frame)
+
+    def _receive(self) -> Optional[bytes]:
+        if self.reliable:
+            return _recv_exact(self._sock, FRAME_SIZE)
+        return self._sock.recv(FRAME_SIZE)
+
+    def _run(self):
+        next_hello = time.monotonic() + KEEPALIVE_INTERVAL
+        while self._running:
+            try:
+                if time.monotonic() >= next_hello:
+                    next_hello = time.monotonic() + KEEPALIVE_INTERVAL
+                    self._send_frame(FRAME_HELLO, 0, time.perf_counter_ns())
+                data = self._receive()
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if isinstance(e, ConnectionRefusedError) and not self.reliable and self._running:
+                    # UDP: el servidor aún no escucha; el siguiente HELLO lo reintenta
+                    time.sleep(0.1)
+                    continue
+                if self._running:
+                    self.engine.log("Error", f"Conexión con {self.host}:{self.port} perdida: {e}")
+                    self.engine.release_remote_keys()
+                return
+            if data is None:
+                self.engine.log("Warning", f"El servidor {self.host}:{self.port} cerró la conexión")
+                self.engine.release_remote_keys()
+                return
+
+            frame = decode_frame(data, self._key)
+            if frame is None:
+                self.rejected += 1
+            else:
+                self._handle(*frame)
+
+    def _handle(self, kind: int, seq: int, t_ns: int, payload: bytes):
+        if kind == FRAME_CHALLENGE:
+            try:
+                self._send_frame(FRAME_AUTH, 0, time.perf_counter_ns(), payload)
+            except OSError:
+                pass
+            return
+
+        if kind == FRAME_WELCOME:
+            # Secuencia actual del servidor (si se reinició, empieza de nuevo)
+            if seq < self._last_seq:
+                self._last_seq = seq
+            return
+
+        # Confirmar primero: el tiempo de ida y vuelta no incluye la aplicación
+        try:
+            self._send_frame(FRAME_ACK, seq, t_ns)
+        except OSError:
+            pass
+        self.received += 1
+
+        if seq <= self._last_seq and self._last_seq - seq < _SEQ_RESTART_GAP:
+            self.late += 1
+            if kind != FRAME_KEY_UP:
+                return
+        else:
+            if self._last_seq and seq > self._last_seq + 1:
+                self.lost += seq - self._last_seq - 1
+            self._last_seq = seq
+
+        text = payload.decode("utf-8", "replace")
+        engine = self.engine
+        if kind == FRAME_KEY_DOWN:
+            engine.apply_remote_key(text, True)
+        elif kind == FRAME_KEY_REPEAT:
+            engine.apply_remote_key(text, True, repeat=True)
+        elif kind == FRAME_KEY_UP:
+            engine.apply_remote_key(text, False)
+        elif kind == FRAME_COMMAND:
+            engine.send_command_to_slaves(text, forward=False)
+
+    def stats(self) -> Dict:
+        return {"received": self.received, "lost": self.lost, "late": self.late,
+                "rejected": self.rejected, "last_seq": self._last_seq}
+
+
+def loopback_demo(presses: int = 200, reliable: bool = False, windows: int = 3) -> Dict:
+    """
+    Dos engines con ventanas simuladas en este equipo: uno difunde y el otro recibe.
+    Un tercer cliente con otro secreto intenta darse de alta y no debe recibir nada.
+    """
+    from multibox_backend import SimulatedBackend
+    from multibox_engine import WoWMultiboxEngine
+
+    secret = "demo-" + os.urandom(8).hex()
+    main_backend = SimulatedBackend(windows)
+    remote_backend = SimulatedBackend(windows)
+    intruder_backend = SimulatedBackend(windows)
+    main = WoWMultiboxEngine(main_backend)
+    remote = WoWMultiboxEngine(remote_backend)
+    intruder = WoWMultiboxEngine(intruder_backend)
+    server = NetServer(main, "127.0.0.1", 0, reliable, secret=secret)
+    clients = []
+    try:
+        for engine in (main, remote, intruder):
+            engine.find_wow_windows()
+            engine.active = True
+        server.start()
+        host, port = server.tcp_address if reliable else server.address
+        client = NetClient(remote, host, port, reliable, secret=secret)
+        clients.append(client)
+        client.start()
+        intruder_client = NetClient(intruder, host, port, reliable, secret="otro")
+        clients.append(intruder_client)
+        intruder_client.start()
+
+        deadline = time.monotonic() + 2.0
+        while not server.stats()["peers"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        keys = "123qe"
+        for idx in range(presses):
+            key = keys[idx % len(keys)]
+            main.on_key_press(key)
+            main.on_key_release(key)
+            time.sleep(0.001)
+        time.sleep(0.2)
+
+        for engine, backend in ((remote, remote_backend), (intruder, intruder_backend)):
+            engine.dispatcher.wait_idle()
+            backend.wait_idle()
+        delivered = sum(len(w.received) for w in remote_backend.windows.values())
+        leaked = sum(len(w.received) for w in intruder_backend.windows.values())
+        return {"server": server.stats(), "client": client.stats(),
+                "remote_messages": delivered, "intruder_messages": leaked}
+    finally:
+        for client in clients:
+            client.stop()
+        server.stop()
+        for engine, backend in ((main, main_backend), (remote, remote_backend),
+                                (intruder, intruder_backend)):
+            engine.shutdown()
+            backend.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Prueba de difusión entre dos engines por loopback")
+    parser.add_argument("--presses", type=int, default=200, help="pulsaciones a difundir")
+    parser.add_argument("--tcp", action="store_true", help="usar el canal fiable TCP")
+    parser.add_argument("--windows", type=int, default=3, help="ventanas simuladas de cada engine")
+    args = parser.parse_args()
+
+    print(json.dumps(loopback_demo(args.presses, args.tcp, args.windows), indent=2))
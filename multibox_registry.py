@@ -0,0 +1,93 @@
+"""
+WoW Multiboxing Registry
+Registro indexado de ventanas de WoW con conjuntos de destino precalculados
+"""
+
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+class WindowRecord:
+    """Datos de una ventana de WoW detectada"""
+
+    __slots__ = ("hwnd", "pid", "title", "is_main")
+
+    def __init__(self, hwnd: int, pid: int, title: str, is_main: bool = False):
+        self.hwnd = hwnd
+        self.pid = pid
+        self.title = title
+        self.is_main = is_main
+
+    def __repr__(self):
+        return f"WindowRecord(hwnd={self.hwnd}, pid={self.pid}, title={self.title!r}, is_main={self.is_main})"
+
+
+class WindowRegistry:
+    """
+    Ventanas indexadas por HWND. Los destinos ("todas menos X", "solo main", slaves)
+    se recalculan solo cuando cambia el conjunto de ventanas o la main, nunca por tecla.
+    """
+
+    def __init__(self):
+        self._records: Dict[int, WindowRecord] = {}
+        self.main_window: Optional[int] = None
+
+        # Precalculados en _rebuild()
+        self.windows: Tuple[WindowRecord, ...] = ()
+        self.slaves: Tuple[WindowRecord, ...] = ()
+        self.main_targets: Tuple[int, ...] = ()
+        self.except_targets: Dict[int, Tuple[int, ...]] = {}
+
+    def __contains__(self, hwnd: int) -> bool:
+        return hwnd in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[WindowRecord]:
+        return iter(self.windows)
+
+    def get(self, hwnd: int) -> Optional[WindowRecord]:
+        return self._records.get(hwnd)
+
+    def apply_delta(self, added: Iterable[WindowRecord], removed: Iterable[int],
+                    changed: Iterable[WindowRecord]):
+        """Aplica cambios incrementales conservando la main y el orden de las demás"""
+        for hwnd in removed:
+            self._records.pop(hwnd, None)
+            if hwnd == self.main_window:
+                self.main_window = None
+
+        for record in added:
+            self._records[record.hwnd] = record
+
+        for record in changed:
+            existing = self._records.get(record.hwnd)
+            if existing is not None:
+                existing.title = record.title
+            else:
+                self._records[record.hwnd] = record
+
+        self._rebuild()
+
+    def set_main(self, hwnd: Optional[int]) -> Optional[WindowRecord]:
+        """Marca una ventana como main y devuelve su registro"""
+        self.main_window = hwnd
+        self._rebuild()
+        return self._records.get(hwnd)
+
+    def targets_except(self, hwnd: int) -> Optional[Tuple[int, ...]]:
+        """Todas las ventanas menos la indicada, o None si no es una ventana de WoW"""
+        return self.except_targets.get(hwnd)
+
+    def _rebuild(self):
+        for record in self._records.values():
+            record.is_main = record.hwnd == self.main_window
+
+        self.windows = tuple(self._records.values())
+        self.slaves = tuple(r for r in self.windows if not r.is_main)
+        self.main_targets = tuple(r.hwnd for r in self.windows if r.is_main)
+
+        hwnds = tuple(self._records)
+        self.except_targets = {
+            hwnd: tuple(h for h in hwnds if h != hwnd) for hwnd in hwnds
+        }
@@ -0,0 +1,219 @@
+"""
+WoW Multiboxing Routing
+Grupos de ventanas con nombre y reglas de enrutado por tecla ("1 a los healers,
+2 a los DPS, espacio a todos") compiladas en una tabla tecla -> máscara de ventanas
+-> tupla de HWND por ventana origen. Cada grupo difunde según su modo: a todas,
+a todas menos la activa o en round-robin (cada pulsación a la siguiente ventana).
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from multibox_registry import WindowRecord
+
+# Destinos especiales (grupos predefinidos)
+TARGET_OTHERS = "others"   # todas menos la ventana activa (comportamiento por defecto)
+TARGET_ALL = "all"         # todas; la ventana activa ya recibe la tecla física
+TARGET_MAIN = "main"       # solo la main
+
+# Modos de difusión de un grupo
+MODE_ALL = "all"
+MODE_OTHERS = "others"
+MODE_ROUND_ROBIN = "round_robin"
+MODES = (MODE_ALL, MODE_OTHERS, MODE_ROUND_ROBIN)
+
+
+def window_matches(window: WindowRecord, patterns: Iterable[str]) -> bool:
+    """Indica si una ventana coincide con algún patrón ('pid:1234' o texto del título)"""
+    title = window.title.lower()
+    for pattern in patterns:
+        if pattern.startswith("pid:"):
+            if pattern[4:].strip() == str(window.pid):
+                return True
+        elif pattern in title:
+            return True
+    return False
+
+
+class WindowGroup:
+    """
+    Grupo de ventanas definido por patrones, de modo que sobrevive a los rescaneos.
+    Las tuplas de destino se precalculan en set_members(); elegir destino es O(1).
+    """
+
+    __slots__ = ("name", "patterns", "mode", "members", "_except", "_singles", "_cursor")
+
+    def __init__(self, name: str, patterns: Tuple[str, ...], mode: str = MODE_ALL):
+        self.name = name
+        self.patterns = patterns
+        self.mode = mode
+        self.members: Tuple[int, ...] = ()
+        self._except: Dict[int, Tuple[int, ...]] = {}
+        self._singles: Tuple[Tuple[int], ...] = ()
+        self._cursor = 0
+
+    def set_members(self, members: Tuple[int, ...]):
+        """Fija los miembros actuales y precalcula las tuplas de cada modo"""
+        self.members = members
+        self._except = {hwnd: tuple(h for h in members if h != hwnd) for hwnd in members}
+        self._singles = tuple((hwnd,) for hwnd in members)
+
+    def targets(self, foreground: int) -> Tuple[int, ...]:
+        """Destinos de una difusión al grupo según su modo"""
+        if self.mode == MODE_ROUND_ROBIN:
+            return self.next_target(foreground)
+        if self.mode == MODE_OTHERS:
+            return self._except.get(foreground, self.members)
+        return self.members
+
+    def next_target(self, skip: int = 0) -> Tuple[int, ...]:
+        """Siguiente miembro del round-robin; se salta 'skip' si hay otro miembro"""
+        singles = self._singles
+        count = len(singles)
+        if not count:
+            return ()
+
+        idx = self._cursor % count
+        if singles[idx][0] == skip:
+            if count == 1:
+                return ()
+            idx = (idx + 1) % count
+        self._cursor = idx + 1
+        return singles[idx]
+
+
+class RoutingTable:
+    """
+    Tabla de enrutado. configure() compila grupos y reglas al cargar la configuración y
+    rebuild() recalcula las máscaras cuando cambian las ventanas; targets() es O(1).
+    """
+
+    def __init__(self):
+        self.groups: Dict[str, WindowGroup] = {}
+
+        # Reglas compiladas: tecla -> nombres de destino, o el grupo round-robin de la tecla
+        self._routes: Dict[str, Tuple[str, ...]] = {}
+        self._rr_routes: Dict[str, WindowGroup] = {}
+
+        # Precalculados en rebuild()
+        self.masks: Dict[str, int] = {}
+        self._table: Dict[str, Dict[int, Tuple[int, ...]]] = {}
+
+    def configure(self, groups: Dict[str, object], routes: Dict[str, object]) -> List[str]:
+        """
+        Compila grupos y reglas; devuelve los errores encontrados.
+        Un grupo es una lista de patrones o {"match": [...], "mode": "all|others|round_robin"}.
+        En las reglas por tecla los modos 'all' y 'others' son equivalentes (la ventana
+        origen nunca recibe copia): se avisa si una regla usa un grupo con modo 'all' explícito.
+        """
+        errors = []
+        explicit_all = set()
+
+        compiled_groups = {
+            TARGET_OTHERS: WindowGroup(TARGET_OTHERS, (), MODE_OTHERS),
+            TARGET_ALL: WindowGroup(TARGET_ALL, (), MODE_ALL),
+            TARGET_MAIN: WindowGroup(TARGET_MAIN, (), MODE_ALL),
+        }
+        for name, spec in groups.items():
+            if isinstance(spec, dict):
+                patterns = spec.get("match", [])
+                mode = str(spec.get("mode", MODE_ALL)).lower()
+            else:
+                patterns = spec
+                mode = MODE_ALL
+            if mode not in MODES:
+                errors.append(f"Grupo '{name}': modo desconocido {mode}")
+                continue
+            if isinstance(spec, dict) and "mode" in spec and mode == MODE_ALL:
+                explicit_all.add(name.lower())
+            compiled_groups[name.lower()] = WindowGroup(name.lower(),
+                                                        tuple(p.lower() for p in patterns),
+                                                        mode)
+
+        compiled = {}
+        rr_routes = {}
+        for key, targets in routes.items():
+            names = (targets,) if isinstance(targets, str) else tuple(targets)
+            names = tuple(n.lower() for n in names)
+            unknown = [n for n in names if n not in compiled_groups]
+            if unknown:
+                errors.append(f"Regla '{key}': destino desconocido {', '.join(unknown)}")
+                continue
+
+            if any(compiled_groups[n].mode == MODE_ROUND_ROBIN for n in names):
+                if len(names) > 1:
+                    errors.append(f"Regla '{key}': un grupo round-robin no se puede combinar con otros")
+                    continue
+                rr_routes[key.lower()] = compiled_groups[names[0]]
+                continue
+
+            for name in names:
+                if name in explicit_all:
+                    errors.append(f"Regla '{key}': el modo 'all' del grupo '{name}' no se aplica "
+                                  f"a las teclas físicas (la ventana activa ya recibe la tecla)")
+            compiled[key.lower()] = names
+
+        self.groups = compiled_groups
+        self._routes = compiled
+        self._rr_routes = rr_routes
+        return errors
+
+    def rebuild(self, windows: Tuple[WindowRecord, ...]):
+        """Recalcula máscaras, miembros y tuplas de destino para el conjunto actual de ventanas"""
+        bits = {w.hwnd: 1 << idx for idx, w in enumerate(windows)}
+        all_mask = (1 << len(windows)) - 1
+
+        masks = {}
+        for name, group in self.groups.items():
+            if name in (TARGET_OTHERS, TARGET_ALL):
+                mask = all_mask
+            elif name == TARGET_MAIN:
+                mask = sum(bits[w.hwnd] for w in windows if w.is_main)
+            else:
+                mask = sum(bits[w.hwnd] for w in windows if window_matches(w, group.patterns))
+            masks[name] = mask
+            group.set_members(tuple(w.hwnd for w in windows if mask & bits[w.hwnd]))
+
+        # Una tupla por (máscara, origen), compartida entre teclas con la misma máscara.
+        # La ventana origen se excluye siempre: ya recibe la tecla física
+        tuples_by_mask: Dict[int, Dict[int, Tuple[int, ...]]] = {}
+        table = {}
+        for key, names in self._routes.items():
+            mask = 0
+            for name in names:
+                mask |= masks[name]
+
+            by_source = tuples_by_mask.get(mask)
+            if by_source is None:
+                by_source = {
+                    source.hwnd: tuple(w.hwnd for w in windows
+                                       if mask & bits[w.hwnd] and w.hwnd != source.hwnd)
+                    for source in windows
+                }
+                tuples_by_mask[mask] = by_source
+            table[key] = by_source
+
+        self.masks = masks
+        # Sustitución atómica por referencia
+        self._table = table
+
+    def targets(self, key: str, source: int) -> Optional[Tuple[int, ...]]:
+        """
+        Ventanas destino de una tecla pulsada en 'source'.
+        None si la tecla no tiene regla propia (se usa el destino por defecto).
+        """
+        by_source = self._table.get(key)
+        if by_source is not None:
+            return by_source.get(source)
+
+        group = self._rr_routes.get(key)
+        if group is not None:
+            return group.next_target(source)
+
+        return None
+
+    def resolve(self, name: str, foreground: int) -> Optional[Tuple[int, ...]]:
+        """Destinos de una difusión a un grupo con nombre según su modo (None si no existe)"""
+        group = self.groups.get(name)
+        if group is None:
+            return None
+        return group.targets(foreground)
@@ -0,0 +1,122 @@
+"""
+WoW Multiboxing Scheduler
+Planificador central basado en una rueda de temporizadores: un solo hilo ejecuta
+todas las esperas de macros y secuencias, sin un hilo (ni un sleep) por cada espera
+"""
+
+import math
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class TimerEntry:
+    """Tarea programada en la rueda"""
+
+    __slots__ = ("rounds", "fn", "args", "cancelled")
+
+    def __init__(self, rounds: int, fn: Callable, args: tuple):
+        self.rounds = rounds
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Rueda de temporizadores con resolución 'tick' segundos. Las tareas se guardan en la
+    ranura de su tick de vencimiento; las que superan una vuelta llevan un contador de vueltas.
+    Las tareas se ejecutan en el hilo de la rueda y deben ser cortas (p. ej. encolar en un carril).
+    """
+
+    def __init__(self, tick: float = 0.005, slots: int = 512,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.tick = tick
+        self.on_error = on_error
+        self._slots: List[List[TimerEntry]] = [[] for _ in range(slots)]
+        self._count = 0
+
+        # El tick k vence en _t0 + k * tick
+        self._t0 = time.monotonic()
+        self._tick_no = 0
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def schedule(self, delay: float, fn: Callable, *args) -> TimerEntry:
+        """Programa fn(*args) dentro de 'delay' segundos; nunca bloquea al llamador"""
+        now = time.monotonic()
+        with self._cond:
+            if self._count == 0:
+                # La rueda estaba parada: resincronizar con el reloj
+                self._tick_no = int((now - self._t0) / self.tick)
+
+            target = math.ceil((now + delay - self._t0) / self.tick)
+            ticks_ahead = max(1, target - self._tick_no)
+            target = self._tick_no + ticks_ahead
+
+            slots = len(self._slots)
+            entry = TimerEntry((ticks_ahead - 1) // slots, fn, args)
+            self._slots[target % slots].append(entry)
+            self._count += 1
+            self._cond.notify()
+        return entry
+
+    @property
+    def pending(self) -> int:
+        """Tareas pendientes"""
+        return self._count
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._count == 0:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                next_tick = self._tick_no + 1
+                deadline = self._t0 + next_tick * self.tick
+
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+
+            with self._cond:
+                self._tick_no = next_tick
+                idx = next_tick % len(self._slots)
+                due = []
+                keep = []
+                for entry in self._slots[idx]:
+                    if entry.rounds == 0:
+                        due.append(entry)
+                    else:
+                        entry.rounds -= 1
+                        keep.append(entry)
+                self._slots[idx] = keep
+                self._count -= len(due)
+
+            for entry in due:
+                if entry.cancelled:
+                    continue
+                try:
+                    entry.fn(*entry.args)
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(e)
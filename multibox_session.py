@@ -0,0 +1,237 @@
+"""
+WoW Multiboxing Session
+Grabación de la secuencia de teclas que recibe el listener (instante, ventana activa,
+pulsar/soltar, tecla) en un fichero binario compacto, y reproducción determinista
+contra el backend simulado a velocidad real o acelerada. Sirve para medir cambios
+en el reparto con carga reproducible sin abrir clientes del juego.
+
+Formato (little-endian):
+  cabecera: MAGIC, versión (H), inicio en epoch µs (Q), estado (B), nº de ventanas (H),
+            HWND de cada ventana en orden (Q...)
+  evento:   delta desde el evento anterior en µs (I), ventana activa (Q),
+            tipo (B), longitud de la tecla (B), tecla en UTF-8
+"""
+
+import struct
+import time
+from typing import BinaryIO, Dict, List, Tuple
+
+MAGIC = b"MBSESS\x00"
+VERSION = 1
+
+KEY_PRESS = 1
+KEY_RELEASE = 2
+
+# Bits del estado inicial del engine
+STATE_ACTIVE = 0x01
+STATE_PAUSED = 0x02
+STATE_SOLO_MAIN = 0x04
+
+_HEADER = struct.Struct("<HQBH")
+_HWND = struct.Struct("<Q")
+_EVENT = struct.Struct("<IQBB")
+
+# Evento en memoria: (instante perf_counter_ns, ventana activa, tipo, tecla)
+SessionEvent = Tuple[int, int, int, str]
+
+
+class Session:
+    """Sesión grabada: estado inicial, ventanas al empezar y eventos con instante relativo (ns)"""
+
+    __slots__ = ("started", "state", "windows", "events")
+
+    def __init__(self, started: float, state: int, windows: Tuple[int, ...],
+                 events: List[SessionEvent]):
+        self.started = started
+        self.state = state
+        self.windows = windows
+        self.events = events
+
+    @property
+    def duration(self) -> float:
+        """Duración en segundos"""
+        return self.events[-1][0] / 1e9 if self.events else 0.0
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            self.write(f)
+
+    def write(self, f: BinaryIO):
+        f.write(MAGIC)
+        f.write(_HEADER.pack(VERSION, int(self.started * 1e6), self.state, len(self.windows)))
+        for hwnd in self.windows:
+            f.write(_HWND.pack(hwnd))
+
+        pack = _EVENT.pack
+        last_us = 0
+        for t_ns, hwnd, kind, key in self.events:
+            t_us = t_ns // 1000
+            name = key.encode("utf-8")[:255]
+            f.write(pack(min(t_us - last_us, 0xFFFFFFFF), hwnd, kind, len(name)))
+            f.write(name)
+            last_us = t_us
+
+    @classmethod
+    def load(cls, path: str) -> "Session":
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if not data.startswith(MAGIC):
+            raise ValueError("no es un fichero de sesión")
+        offset = len(MAGIC)
+        version, started_us, state, window_count = _HEADER.unpack_from(data, offset)
+        if version != VERSION:
+            raise ValueError(f"versión de sesión no soportada: {version}")
+        offset += _HEADER.size
+
+        windows = []
+        for _ in range(window_count):
+            windows.append(_HWND.unpack_from(data, offset)[0])
+            offset += _HWND.size
+
+        events = []
+        t_us = 0
+        unpack = _EVENT.unpack_from
+        while offset < len(data):
+            delta_us, hwnd, kind, length = unpack(data, offset)
+            offset += _EVENT.size
+            key = data[offset:offset + length].decode("utf-8")
+            offset += length
+            t_us += delta_us
+            events.append((t_us * 1000, hwnd, kind, key))
+
+        return cls(started_us / 1e6, state, tuple(windows), events)
+
+
+class SessionRecorder:
+    """
+    Graba en memoria los eventos del listener; record() solo añade una tupla a una lista.
+    El fichero se escribe al terminar (stop).
+    """
+
+    def __init__(self, state: int, windows: Tuple[int, ...]):
+        self.started = time.time()
+        self.state = state
+        self.windows = windows
+        self._t0 = time.perf_counter_ns()
+        self._events: List[SessionEvent] = []
+
+    def record(self, t_ns: int, foreground: int, kind: int, key: str):
+        self._events.append((t_ns - self._t0, foreground, kind, key))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def stop(self) -> Session:
+        return Session(self.started, self.state, self.windows, list(self._events))
+
+
+class SessionPlayer:
+    """
+    Reproduce una sesión en un engine con backend simulado. Las ventanas grabadas se
+    asignan a ventanas simuladas por orden (las que aparecieron después, por orden de
+    aparición); speed=0 reproduce sin esperas.
+    """
+
+    def __init__(self, engine, backend, session: Session, speed: float = 1.0):
+        self.engine = engine
+        self.backend = backend
+        self.session = session
+        self.speed = speed
+        self._mapping: Dict[int, int] = {}
+        self._simulated: List[int] = []
+
+    def _map_window(self, hwnd: int) -> int:
+        """HWND simulado que corresponde a un HWND grabado (0: la activa no era de WoW)"""
+        if not hwnd:
+            return 0
+        mapped = self._mapping.get(hwnd)
+        if mapped is None:
+            mapped = self._simulated[len(self._mapping) % len(self._simulated)]
+            self._mapping[hwnd] = mapped
+        return mapped
+
+    def run(self) -> Dict:
+        """Reproduce la sesión completa; devuelve eventos reproducidos y duración"""
+        engine = self.engine
+        backend = self.backend
+        session = self.session
+
+        # Una ventana simulada por cada ventana grabada
+        while len(backend.windows) < len(session.windows):
+            backend.add_window()
+        engine.find_wow_windows()
+        self._simulated = [w.hwnd for w in engine.wow_windows]
+        if not self._simulated:
+            raise RuntimeError("el backend no tiene ventanas de WoW")
+        for hwnd in session.windows:
+            self._map_window(hwnd)
+
+        engine.active = bool(session.state & STATE_ACTIVE)
+        engine.paused = bool(session.state & STATE_PAUSED)
+        engine.solo_main_mode = bool(session.state & STATE_SOLO_MAIN)
+
+        # El atajo de grabación no se reproduce (empezaría otra grabación)
+        skip = {key for key, action in engine.hotkey_map.items()
+                if getattr(action, "__name__", "") == "toggle_recording"}
+
+        played = 0
+        foreground = -1
+        start = time.perf_counter()
+        for t_ns, hwnd, kind, key in session.events:
+            if key in skip:
+                continue
+
+            if self.speed > 0:
+                remaining = start + t_ns / 1e9 / self.speed - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+
+            target = self._map_window(hwnd)
+            if target != foreground:
+                backend.set_foreground(target)
+                foreground = target
+
+            if kind == KEY_PRESS:
+                engine.on_key_press(key)
+            else:
+                engine.on_key_release(key)
+            played += 1
+
+        return {"events": played, "elapsed_s": time.perf_counter() - start}
+
+
+def replay(path: str, speed: float = 0.0, latency_ms: float = 0.0) -> Dict:
+    """Reproduce un fichero de sesión en un engine nuevo con backend simulado"""
+    from multibox_backend import SimulatedBackend
+    from multibox_engine import WoWMultiboxEngine
+
+    session = Session.load(path)
+    backend = SimulatedBackend(latency_ms=latency_ms)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        result = SessionPlayer(engine, backend, session, speed).run()
+        engine.dispatcher.wait_idle()
+        backend.wait_idle()
+        result["latency"] = engine.get_latency_stats()
+        return result
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Reproduce una sesión grabada contra el backend simulado")
+    parser.add_argument("session", help="fichero .mbs grabado con toggle_recording")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="factor de velocidad (1 = tiempo real, 0 = sin esperas)")
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="latencia simulada de cada cliente")
+    args = parser.parse_args()
+
+    summary = replay(args.session, args.speed, args.latency_ms)
+    print(f"Eventos reproducidos: {summary['events']} en {summary['elapsed_s']:.2f} s")
+    print(json.dumps(summary["latency"]["overall"], indent=2))
@@ -0,0 +1,589 @@
+"""
+WoW Multiboxing Shard
+Reparto opcional en varios procesos: el engine actúa de frontal y escribe cada mensaje
+de teclado (ventana, msg, wParam, lParam, instante) en un buffer circular de memoria
+compartida por proceso trabajador. Cada trabajador posee un subconjunto de las ventanas,
+crea su propio backend y hace los PostMessage en paralelo con los demás, sin competir
+por el GIL del proceso principal.
+
+La interfaz es solo de datos: post(hwnd, mensajes), sin objetos ni callbacks, para que
+cruce la frontera entre procesos. Requiere multiprocessing.shared_memory (Python 3.8+).
+
+El frontal nunca espera: si el buffer de un trabajador está lleno, los mensajes quedan
+en una cola acotada del frontal con la misma política de desbordamiento que los carriles
+(los KEYUP nunca se descartan) y un hilo propio los pasa al buffer cuando hay hueco. Un
+cortocircuito por trabajador deja de aceptar KEYDOWN si su proceso muere o deja de
+vaciar el buffer; las ventanas con el cortocircuito de su carril abierto tampoco los reciben.
+
+Formato de cada buffer (little-endian):
+  cabecera (64 bytes): posición leída por el trabajador (Q)
+  hueco:               secuencia (Q), HWND (Q), instante perf_counter_ns (Q),
+                       msg (I), wParam (I), lParam (I)
+La secuencia se escribe la última: el trabajador solo lee huecos ya completos.
+"""
+
+import collections
+import struct
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import multiprocessing
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python 3.7
+    shared_memory = None
+
+from multibox_backend import SimulatedBackend, WindowBackend, create_default_backend
+from multibox_dispatch import OVERFLOW_COALESCE, OVERFLOW_DROP_OLDEST, OVERFLOW_POLICIES
+from multibox_metrics import LatencyHistogram
+
+DEFAULT_RING_CAPACITY = 4096
+
+# Espera máxima del trabajador sin avisos (para comprobar la parada)
+WORKER_WAKE_TIMEOUT = 0.05
+
+# Cola del frontal por trabajador cuando su buffer está lleno (lotes de una ventana)
+DEFAULT_BACKLOG_CAPACITY = 64
+
+# Sondeo del hilo que pasa la cola del frontal al buffer mientras haya pendientes, y
+# periodo de la comprobación de los trabajadores (segundos)
+FLUSH_INTERVAL = 0.0005
+MONITOR_INTERVAL = 0.25
+
+# Sin avance durante este tiempo con mensajes pendientes, el trabajador se da por atascado
+STALL_TIMEOUT = 1.0
+
+# Espera máxima para vaciar la cola del frontal al detener el reparto
+STOP_FLUSH_TIMEOUT = 1.0
+
+_HEADER_SIZE = 64
+_TAIL = struct.Struct("<Q")
+_SEQ = struct.Struct("<Q")
+_SLOT = struct.Struct("<QQQIII4x")
+_PAYLOAD = struct.Struct("<QQIII")
+
+# Mensaje de ventana: (msg, wParam, lParam)
+Message = Tuple[int, int, int]
+
+
+def sharding_available() -> bool:
+    """Indica si esta versión de Python tiene memoria compartida"""
+    return shared_memory is not None
+
+
+class ShardRing:
+    """
+    Buffer circular de un solo productor (el engine) y un solo consumidor (un trabajador)
+    sobre un bloque de memoria compartida. Sin bloqueos: cada lado solo escribe su posición.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RING_CAPACITY, name: Optional[str] = None):
+        if shared_memory is None:
+            raise RuntimeError("el reparto en procesos requiere Python 3.8 o superior")
+        self.capacity = capacity
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner,
+                                              size=_HEADER_SIZE + capacity * _SLOT.size)
+        self.name = self.shm.name
+        self._buf = self.shm.buf
+
+        # Productor
+        self._head = 0
+        self._tail_seen = 0
+
+        # Consumidor
+        self._cursor = 0
+
+    def push(self, hwnd: int, msg: int, wparam: int, lparam: int, t_event: int = 0) -> bool:
+        """Escribe un mensaje (lado del engine); False si el buffer está lleno"""
+        head = self._head
+        if head - self._tail_seen >= self.capacity:
+            self._tail_seen = _TAIL.unpack_from(self._buf, 0)[0]
+            if head - self._tail_seen >= self.capacity:
+                return False
+
+        offset = _HEADER_SIZE + (head % self.capacity) * _SLOT.size
+        _PAYLOAD.pack_into(self._buf, offset + _SEQ.size, hwnd, t_event, msg, wparam, lparam)
+        _SEQ.pack_into(self._buf, offset, head + 1)
+        self._head = head + 1
+        return True
+
+    def push_many(self, hwnd: int, messages: Sequence[Message], t_event: int = 0) -> bool:
+        """Escribe todos los mensajes de una ventana o ninguno (lado del engine)"""
+        needed = len(messages)
+        head = self._head
+        if head - self._tail_seen + needed > self.capacity:
+            self._tail_seen = _TAIL.unpack_from(self._buf, 0)[0]
+            if head - self._tail_seen + needed > self.capacity:
+                return False
+        for msg, wparam, lparam in messages:
+            self.push(hwnd, msg, wparam, lparam, t_event)
+        return True
+
+    @property
+    def read_position(self) -> int:
+        """Mensajes leídos por el trabajador desde el principio"""
+        return _TAIL.unpack_from(self._buf, 0)[0]
+
+    @property
+    def pending(self) -> int:
+        """Mensajes escritos que el trabajador aún no ha leído"""
+        return self._head - self.read_position
+
+    def drain(self, limit: int = 1024) -> List[Tuple[int, int, int, int, int]]:
+        """Lee los mensajes completos pendientes (lado del trabajador)"""
+        buf = self._buf
+        cursor = self._cursor
+        batch = []
+        while len(batch) < limit:
+            offset = _HEADER_SIZE + (cursor % self.capacity) * _SLOT.size
+            if _SEQ.unpack_from(buf, offset)[0] != cursor + 1:
+                break
+            batch.append(_PAYLOAD.unpack_from(buf, offset + _SEQ.size))
+            cursor += 1
+
+        if batch:
+            self._cursor = cursor
+            _TAIL.pack_into(buf, 0, cursor)
+        return batch
+
+    def close(self):
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _AutoSimulatedBackend(SimulatedBackend):
+    """Backend simulado de un trabajador: crea la ventana la primera vez que recibe un mensaje"""
+
+    def post_message(self, hwnd: int, msg: int, wparam: int, lparam: int):
+        if hwnd not in self.windows:
+            self.add_window(hwnd=hwnd)
+        super().post_message(hwnd, msg, wparam, lparam)
+
+
+def backend_factory_for(backend: WindowBackend) -> Callable[[], WindowBackend]:
+    """
+    Fábrica (serializable) del backend que usarán los trabajadores: el nativo, o uno
+    simulado con la misma latencia si el engine usa el simulado.
+    """
+    if isinstance(backend, SimulatedBackend):
+        return partial(_AutoSimulatedBackend, 0, backend.latency_ms)
+    return create_default_backend
+
+
+def _worker_main(index: int, ring_name: str, capacity: int,
+                 backend_factory: Callable[[], WindowBackend],
+                 wake, ready, stop, results):
+    """Bucle de un proceso trabajador: vacía su buffer y envía cada mensaje a su ventana"""
+    ring = ShardRing(capacity, ring_name)
+    backend = backend_factory()
+    ready.release()
+    histograms: Dict[int, LatencyHistogram] = {}
+    posted = failures = 0
+    post_message = backend.post_message
+
+    try:
+        while True:
+            wake.acquire(timeout=WORKER_WAKE_TIMEOUT)
+            batch = ring.drain()
+            if not batch:
+                if stop.is_set():
+                    break
+                continue
+
+            for hwnd, t_event, msg, wparam, lparam in batch:
+                try:
+                    post_message(hwnd, msg, wparam, lparam)
+                    posted += 1
+                except Exception:
+                    failures += 1
+                    continue
+                if t_event:
+                    histogram = histograms.get(hwnd)
+                    if histogram is None:
+                        histogram = histograms[hwnd] = LatencyHistogram()
+                    histogram.record(time.perf_counter_ns() - t_event)
+    finally:
+        if isinstance(backend, SimulatedBackend):
+            backend.wait_idle()
+            backend.close()
+        results.put((index, posted, failures, histograms))
+        ring.close()
+
+
+class _Shard:
+    """
+    Trabajador visto desde el engine: su buffer, su semáforo de aviso, su proceso y la
+    cola del frontal con los lotes (hwnd, mensajes, instante, crítico) sin hueco aún
+    """
+
+    __slots__ = ("index", "ring", "wake", "process", "windows", "backlog", "dropped",
+                 "tripped", "tripped_at", "progress")
+
+    def __init__(self, index: int, ring: ShardRing, wake, process):
+        self.index = index
+        self.ring = ring
+        self.wake = wake
+        self.process = process
+        self.windows = 0
+        self.backlog: "collections.deque" = collections.deque()
+        self.dropped = 0
+        self.tripped = False
+        self.tripped_at = 0.0
+        # (posición leída, desde cuándo) para detectar un trabajador que no avanza
+        self.progress = (0, time.monotonic())
+
+
+class ShardPool:
+    """
+    Procesos trabajadores con un buffer compartido cada uno. Cada ventana se asigna al
+    trabajador con menos ventanas la primera vez que recibe un mensaje y se queda en él,
+    así el orden de sus mensajes se mantiene.
+    """
+
+    def __init__(self, workers: int, backend_factory: Callable[[], WindowBackend],
+                 capacity: int = DEFAULT_RING_CAPACITY,
+                 backlog_capacity: int = DEFAULT_BACKLOG_CAPACITY,
+                 overflow: str = OVERFLOW_DROP_OLDEST,
+                 is_tripped: Optional[Callable[[int], bool]] = None,
+                 on_breaker: Optional[Callable[[int, bool, str], None]] = None):
+        if shared_memory is None:
+            raise RuntimeError("el reparto en procesos requiere Python 3.8 o superior")
+        self.workers = max(1, workers)
+        self.backend_factory = backend_factory
+        self.capacity = capacity
+        self.backlog_capacity = max(1, backlog_capacity)
+        self.overflow = overflow
+        # Cortocircuito por ventana (el del vigilante de los carriles) y aviso por trabajador
+        self.is_tripped = is_tripped
+        self.on_breaker = on_breaker
+
+        self._shards: List[_Shard] = []
+        self._assigned: Dict[int, _Shard] = {}
+        self._lock = threading.Lock()
+        self._flush_wake = threading.Event()
+        self._flush_stop: Optional[threading.Event] = None
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = None
+        self._results = None
+        self.submitted = 0
+
+    def configure(self, backlog_capacity: int, overflow: str):
+        """Ajusta la cola del frontal con los mismos valores que las colas de los carriles"""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"política de desbordamiento desconocida: {overflow}")
+        self.backlog_capacity = max(1, backlog_capacity)
+        self.overflow = overflow
+
+    @property
+    def running(self) -> bool:
+        return bool(self._shards)
+
+    def start(self, timeout: float = 10.0) -> bool:
+        """
+        Crea los buffers y arranca los procesos trabajadores. Espera a que estén listos
+        (los mensajes escritos antes quedarían en el buffer hasta entonces); False si no.
+        """
+        if self._shards:
+            return True
+        ctx = self._context
+        self._stop = ctx.Event()
+        self._results = ctx.Queue()
+        ready = ctx.Semaphore(0)
+        for index in range(self.workers):
+            ring = ShardRing(self.capacity)
+            wake = ctx.Semaphore(0)
+            process = ctx.Process(target=_worker_main, name=f"multibox-shard-{index}",
+                                  args=(index, ring.name, self.capacity, self.backend_factory,
+                                        wake, ready, self._stop, self._results),
+                                  daemon=True)
+            process.start()
+            self._shards.append(_Shard(index, ring, wake, process))
+
+        stop = self._flush_stop = threading.Event()
+        threading.Thread(target=self._flush_loop, args=(stop,), name="shard-flush",
+                         daemon=True).start()
+
+        deadline = time.monotonic() + timeout
+        return all(ready.acquire(timeout=max(0.0, deadline - time.monotonic()))
+                   for _ in self._shards)
+
+    def _shard_for(self, hwnd: int) -> _Shard:
+        shard = self._assigned.get(hwnd)
+        if shard is None:
+            shard = min(self._shards, key=lambda s: s.windows)
+            shard.windows += 1
+            self._assigned[hwnd] = shard
+        return shard
+
+    def post(self, hwnd: int, messages: Sequence[Message], t_event: int = 0,
+             critical: bool = False) -> bool:
+        """Escribe los mensajes de una ventana en el buffer de su trabajador (no bloquea)"""
+        return self.post_many((hwnd,), messages, t_event, critical) == 1
+
+    def post_many(self, hwnds: Iterable[int], messages: Sequence[Message], t_event: int = 0,
+                  critical: bool = False) -> int:
+        """
+        Escribe los mismos mensajes para varias ventanas y avisa una sola vez a cada
+        trabajador afectado. Nunca espera: si el buffer está lleno (o ya hay lotes en cola
+        para ese trabajador, para no desordenarlos) el lote pasa a la cola del frontal.
+        Devuelve las ventanas servidas o encoladas.
+        """
+        messages = tuple(messages)
+        woken = set()
+        queued = False
+        sent = 0
+        is_tripped = self.is_tripped
+        with self._lock:
+            if not self._shards:
+                return 0
+            for hwnd in hwnds:
+                shard = self._shard_for(hwnd)
+                if not critical and (shard.tripped or (is_tripped is not None and is_tripped(hwnd))):
+                    shard.dropped += 1
+                    continue
+                if not shard.backlog and shard.ring.push_many(hwnd, messages, t_event):
+                    woken.add(shard)
+                    sent += 1
+                elif self._enqueue(shard, (hwnd, messages, t_event, critical)):
+                    queued = True
+                    sent += 1
+            self.submitted += sent
+        for shard in woken:
+            shard.wake.release()
+        if queued:
+            self._flush_wake.set()
+        return sent
+
+    def _enqueue(self, shard: _Shard, job: tuple) -> bool:
+        """
+        Encola un lote en el frontal aplicando la política de desbordamiento (con el lock).
+        Los lotes críticos no se fusionan: entre dos KEYUP iguales puede haber un KEYDOWN.
+        """
+        backlog = shard.backlog
+        if len(backlog) >= self.backlog_capacity:
+            if not job[3] and (self.overflow == OVERFLOW_COALESCE or shard.tripped):
+                # Equivalentes: misma ventana y mismos mensajes (el instante no cuenta)
+                if any(queued[0] == job[0] and queued[1] == job[1] for queued in backlog):
+                    shard.dropped += 1
+                    return False
+            for idx, queued in enumerate(backlog):
+                if not queued[3]:
+                    del backlog[idx]
+                    shard.dropped += 1
+                    break
+            else:
+                # Solo quedan lotes críticos: se admite el nuevo solo si también lo es
+                if not job[3]:
+                    shard.dropped += 1
+                    return False
+        backlog.append(job)
+        return True
+
+    def _flush(self) -> bool:
+        """Pasa al buffer los lotes en cola que quepan; True si aún queda alguno"""
+        woken = []
+        remaining = False
+        with self._lock:
+            for shard in self._shards:
+                backlog = shard.backlog
+                moved = False
+                while backlog:
+                    hwnd, messages, t_event, _ = backlog[0]
+                    if not shard.ring.push_many(hwnd, messages, t_event):
+                        break
+                    backlog.popleft()
+                    moved = True
+                if moved:
+                    woken.append(shard)
+                remaining = remaining or bool(backlog)
+        for shard in woken:
+            shard.wake.release()
+        return remaining
+
+    def _flush_loop(self, stop: threading.Event):
+        """Hilo del frontal: vacía las colas en los buffers y vigila a los trabajadores"""
+        next_check = time.monotonic() + MONITOR_INTERVAL
+        while not stop.is_set():
+            if self._flush():
+                wait = FLUSH_INTERVAL
+            else:
+                self._flush_wake.clear()
+                # Un lote encolado entre el vaciado y el clear() no debe quedarse esperando
+                wait = FLUSH_INTERVAL if any(s.backlog for s in self._shards) else MONITOR_INTERVAL
+            self._flush_wake.wait(wait)
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + MONITOR_INTERVAL
+                self.check_shards()
+
+    def check_shards(self):
+        """Abre el cortocircuito de los trabajadores muertos o atascados y lo cierra al recuperarse"""
+        now = time.monotonic()
+        changes = []
+        with self._lock:
+            for shard in self._shards:
+                position = shard.ring.read_position
+                last, since = shard.progress
+                if position != last or (not shard.ring.pending and not shard.backlog):
+                    since = now
+                shard.progress = (position, since)
+                alive = shard.process.is_alive()
+                stalled = now - since >= STALL_TIMEOUT
+
+                if not shard.tripped:
+                    if not alive:
+                        reason = "el proceso terminó"
+                    elif stalled:
+                        reason = "no vacía su buffer"
+                    else:
+                        continue
+                    shard.tripped = True
+                    shard.tripped_at = now
+                    kept = collections.deque(job for job in shard.backlog if job[3])
+                    shard.dropped += len(shard.backlog) - len(kept)
+                    shard.backlog = kept
+                    changes.append((shard.index, True, reason))
+                elif alive and not stalled and now - shard.tripped_at >= STALL_TIMEOUT:
+                    shard.tripped = False
+                    changes.append((shard.index, False, "vuelve a avanzar"))
+        if self.on_breaker:
+            for change in changes:
+                self.on_breaker(*change)
+
+    def sync(self, hwnds: Iterable[int]):
+        """Olvida las ventanas que ya no existen (libera su hueco en el reparto)"""
+        wanted = set(hwnds)
+        with self._lock:
+            for hwnd in list(self._assigned):
+                if hwnd not in wanted:
+                    self._assigned.pop(hwnd).windows -= 1
+
+    def stats(self) -> Dict:
+        """Ventanas y mensajes descartados de cada trabajador"""
+        return {
+            "workers": len(self._shards),
+            "submitted": self.submitted,
+            "dropped": sum(s.dropped for s in self._shards),
+            "shards": [{"windows": s.windows, "backlog": len(s.backlog), "dropped": s.dropped,
+                        "tripped": s.tripped, "alive": s.process.is_alive()}
+                       for s in self._shards],
+        }
+
+    def stop(self, timeout: float = 5.0) -> Dict:
+        """
+        Detiene los trabajadores después de vaciar sus buffers y devuelve lo que enviaron:
+        {"posted", "failures", "dropped", "windows": {hwnd: LatencyHistogram}}
+        """
+        if self._flush_stop is not None:
+            self._flush_stop.set()
+            self._flush_stop = None
+        # Los lotes en cola (sobre todo los KEYUP) salen antes de parar
+        deadline = time.monotonic() + STOP_FLUSH_TIMEOUT
+        while self._flush() and time.monotonic() < deadline:
+            time.sleep(FLUSH_INTERVAL)
+
+        with self._lock:
+            shards, self._shards = self._shards, []
+            self._assigned = {}
+        summary = {"posted": 0, "failures": 0, "windows": {},
+                   "dropped": sum(s.dropped + len(s.backlog) for s in shards)}
+        if not shards:
+            return summary
+
+        self._stop.set()
+        for shard in shards:
+            shard.wake.release()
+
+        deadline = time.monotonic() + timeout
+        for _ in shards:
+            try:
+                _, posted, failures, histograms = self._results.get(
+                    timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                break
+            summary["posted"] += posted
+            summary["failures"] += failures
+            summary["windows"].update(histograms)
+
+        for shard in shards:
+            shard.process.join(max(0.0, deadline - time.monotonic()))
+            if shard.process.is_alive():
+                shard.process.terminate()
+            shard.ring.close()
+        return summary
+
+
+def benchmark(windows: int = 40, workers: int = 4, presses: int = 2000,
+              latency_ms: float = 0.0) -> Dict:
+    """
+    Compara el reparto con carriles en un proceso y con trabajadores en varios procesos
+    sobre el backend simulado: coste del frontal por pulsación, latencia hasta el envío
+    y mensajes entregados y descartados (las colas acotadas descartan si no dan abasto,
+    así que el rendimiento solo es comparable con los descartes a la vista).
+    """
+    from multibox_engine import WoWMultiboxEngine
+
+    keys = "123456qer"
+    results = {}
+    for mode in ("carriles", "procesos"):
+        backend = SimulatedBackend(windows + 1, latency_ms=latency_ms)
+        engine = WoWMultiboxEngine(backend)
+        engine.find_wow_windows()
+        if mode == "procesos":
+            engine.start_sharding(workers)
+        engine.active = True
+
+        start = time.perf_counter()
+        for idx in range(presses):
+            key = keys[idx % len(keys)]
+            engine.on_key_press(key)
+            engine.on_key_release(key)
+        front_s = time.perf_counter() - start
+
+        if mode == "procesos":
+            summary = engine.stop_sharding()
+            delivered = summary["posted"]
+            dropped = summary["dropped"]
+        engine.dispatcher.wait_idle(30.0)
+        elapsed_s = time.perf_counter() - start
+        if mode == "carriles":
+            backend.wait_idle(30.0)
+            delivered = sum(len(w.received) for w in backend.windows.values())
+            dropped = sum(lane["dropped"] for lane in engine.dispatcher.stats().values())
+
+        latency = engine.get_latency_stats()["overall"]
+        results[mode] = {
+            "front_us_per_press": front_s / presses * 1e6,
+            "elapsed_s": elapsed_s,
+            "expected_messages": presses * windows * 2,
+            "delivered_messages": delivered,
+            "dropped_batches": dropped,
+            "posts": latency["count"],
+            "p50_us": latency["p50_us"],
+            "p99_us": latency["p99_us"],
+        }
+        engine.shutdown()
+        backend.close()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Compara el reparto en un proceso y en varios")
+    parser.add_argument("--windows", type=int, default=40, help="ventanas simuladas (sin contar la activa)")
+    parser.add_argument("--workers", type=int, default=4, help="procesos trabajadores")
+    parser.add_argument("--presses", type=int, default=2000, help="pulsaciones a replicar")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latencia simulada de cada cliente")
+    args = parser.parse_args()
+
+    print(json.dumps(benchmark(args.windows, args.workers, args.presses, args.latency_ms), indent=2))
@@ -0,0 +1,96 @@
+"""
+WoW Multiboxing Trace
+Trazas opcionales de inicio/fin de las funciones calientes (listener, reparto, envíos,
+búsqueda de ventanas, callbacks de la GUI) en un buffer circular preasignado,
+exportables al formato JSON de Chrome (chrome://tracing, Perfetto).
+Desactivado, cada función trazada solo paga la comprobación de una bandera.
+"""
+
+import functools
+import itertools
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+class Tracer:
+    """Buffer circular de eventos (fase, nombre, instante ns, hilo)"""
+
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = capacity
+        self.enabled = False
+        self._events: List[Optional[tuple]] = [None] * capacity
+        self._counter = itertools.count()
+        self._written = 0
+        self._thread_names: Dict[int, str] = {}
+
+    def start(self):
+        """Vacía el buffer y empieza a registrar"""
+        self._events = [None] * self.capacity
+        self._counter = itertools.count()
+        self._thread_names = {}
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def begin(self, name: str):
+        self._record("B", name)
+
+    def end(self, name: str):
+        self._record("E", name)
+
+    def _record(self, phase: str, name: str):
+        # next(count) es atómico: cada hilo obtiene su propia posición sin bloqueo
+        idx = next(self._counter)
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self._events[idx % self.capacity] = (phase, name, time.perf_counter_ns(), tid)
+        self._written = idx + 1
+
+    def events(self) -> List[tuple]:
+        """Eventos en orden de escritura (solo los últimos 'capacity' si el buffer dio la vuelta)"""
+        written = self._written
+        if written <= self.capacity:
+            events = self._events[:written]
+        else:
+            start = written % self.capacity
+            events = self._events[start:] + self._events[:start]
+        return [e for e in events if e is not None]
+
+    def to_chrome(self) -> Dict:
+        """Eventos en formato Chrome trace-event (instantes en microsegundos)"""
+        trace = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                 for tid, name in list(self._thread_names.items())]
+        for phase, name, ts_ns, tid in self.events():
+            trace.append({"name": name, "ph": phase, "ts": ts_ns / 1000.0, "pid": 1, "tid": tid})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> int:
+        """Escribe la traza en un fichero JSON; devuelve el número de eventos"""
+        data = self.to_chrome()
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        return len(data["traceEvents"])
+
+
+# Trazador global: un único buffer para engine y GUI
+TRACER = Tracer()
+
+
+def traced(name: str) -> Callable:
+    """Decorador que registra el inicio y el fin de cada llamada si la traza está activa"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            TRACER.begin(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                TRACER.end(name)
+        return wrapper
+    return decorator
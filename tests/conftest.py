@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _isolated_config(tmp_path, monkeypatch):
+    """El engine lee y escribe wow_multibox_config.json en el directorio actual"""
+    monkeypatch.chdir(tmp_path)
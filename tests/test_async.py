@@ -0,0 +1,39 @@
+import asyncio
+
+from multibox_async import AsyncMultibox, _chat_lines
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+
+
+def test_commands_from_every_path_never_interleave():
+    backend = SimulatedBackend(3)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.update_config(persist=False, chat_open_delay_ms=5, chat_char_delay_ms=1,
+                             chat_send_delay_ms=5,
+                             macros={"saludo": {"steps": [{"command": "/say macro"}]}})
+        engine.find_wow_windows()
+        engine.set_main_window(engine.wow_windows[0].hwnd)
+
+        async def run():
+            async with AsyncMultibox(engine) as mb:
+                async def sync_paths():
+                    # Entre las etapas del comando asíncrono llegan los del engine y la macro
+                    await asyncio.sleep(0.002)
+                    engine.send_command_to_slaves("/say engine", forward=False)
+                    engine.run_macro("saludo")
+
+                sent, _ = await asyncio.gather(mb.send_command("/say async", forward=False),
+                                               sync_paths())
+                assert sent == 2
+                assert engine.dispatcher.wait_idle()
+
+        asyncio.run(run())
+
+        for window in engine.registry.slaves:
+            lines = _chat_lines(backend.windows[window.hwnd].received)
+            assert sorted(lines) == ["/say async", "/say engine", "/say macro"]
+    finally:
+        engine.shutdown()
+        backend.close()
@@ -0,0 +1,81 @@
+import sys
+
+import pytest
+
+from multibox_backend import WM_KEYDOWN, SimulatedBackend, create_default_backend
+
+
+def test_simulated_windows_receive_posted_messages():
+    backend = SimulatedBackend(2, title="WoW")
+    try:
+        first, second = backend.windows
+        assert [title for _, title in backend.enum_windows()][0].startswith("WoW (")
+        assert backend.get_process_id(first) != backend.get_process_id(second)
+
+        backend.post_message(first, WM_KEYDOWN, 0x31, 1)
+        assert backend.wait_idle()
+        assert backend.windows[first].received[0][:3] == (WM_KEYDOWN, 0x31, 1)
+        assert backend.windows[second].received == []
+
+        backend.remove_window(second)
+        assert backend.get_process_id(second) is None
+        with pytest.raises(OSError):
+            backend.post_message(second, WM_KEYDOWN, 0x31, 1)
+    finally:
+        backend.close()
+
+
+def test_hung_window_keeps_messages_until_it_recovers():
+    backend = SimulatedBackend(1)
+    try:
+        hwnd = next(iter(backend.windows))
+        backend.set_hung(hwnd)
+        assert backend.is_hung(hwnd)
+
+        backend.post_message(hwnd, WM_KEYDOWN, 0x31, 1)
+        assert not backend.windows[hwnd].wait_idle(timeout=0.05)
+        assert backend.windows[hwnd].received == []
+
+        backend.set_hung(hwnd, False)
+        assert backend.wait_idle()
+        assert len(backend.windows[hwnd].received) == 1
+    finally:
+        backend.close()
+
+
+def test_message_quota_rejects_posts():
+    backend = SimulatedBackend(1)
+    try:
+        hwnd = next(iter(backend.windows))
+        window = backend.windows[hwnd]
+        window.MESSAGE_QUOTA = 3
+        backend.set_hung(hwnd)
+        for _ in range(3):
+            backend.post_message(hwnd, WM_KEYDOWN, 0x31, 1)
+        with pytest.raises(OSError):
+            backend.post_message(hwnd, WM_KEYDOWN, 0x31, 1)
+        backend.set_hung(hwnd, False)
+    finally:
+        backend.close()
+
+
+def test_foreground_events_fire_on_change_only():
+    backend = SimulatedBackend(2)
+    try:
+        first, second = backend.windows
+        seen = []
+        backend.watch_foreground(seen.append)
+        backend.set_foreground(second)
+        backend.set_foreground(second)
+        backend.unwatch_foreground()
+        backend.set_foreground(first)
+        assert seen == [first, second]
+        assert backend.get_foreground_window() == first
+    finally:
+        backend.close()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="en Windows hay backend nativo")
+def test_no_native_backend_outside_windows():
+    with pytest.raises(RuntimeError):
+        create_default_backend()
@@ -0,0 +1,58 @@
+import json
+import sys
+
+from multibox_bench import MIN_DELTA_US, BenchResult, compare, main, run_suite
+
+
+def _case(p50_us, ops_per_s):
+    return {"p50_us": p50_us, "ops_per_s": ops_per_s}
+
+
+def test_percentiles_and_summary():
+    result = BenchResult("caso", 5)
+    result.samples = [n * 1000 for n in range(1, 101)]
+    result.elapsed_s = 0.5
+    data = result.to_dict()
+
+    assert result.key == "caso/5"
+    assert (data["p50_us"], data["p95_us"], data["p99_us"], data["max_us"]) == (50.0, 95.0, 99.0, 100.0)
+    assert data["ops"] == 100 and data["ops_per_s"] == 200.0
+    assert BenchResult("vacío", 1).to_dict()["p50_us"] == 0.0
+
+
+def test_compare_applies_threshold_and_noise_floor():
+    baseline = {"a/1": _case(10.0, 1000.0), "b/1": _case(1.0, 1000.0), "c/1": _case(10.0, 1000.0)}
+    results = {
+        "a/1": _case(12.9, 800.0),                  # dentro del 30 %
+        "b/1": _case(1.0 + MIN_DELTA_US, 1000.0),   # x3, pero por debajo del ruido del reloj
+        # "c/1" no se midió en esta ejecución
+    }
+    assert compare(results, baseline, 0.30) == []
+
+    results["a/1"] = _case(20.0, 700.0)
+    regressions = compare(results, baseline, 0.30)
+    assert len(regressions) == 2 and all(line.startswith("a/1:") for line in regressions)
+
+
+def test_suite_and_baseline_exit_codes(tmp_path, monkeypatch):
+    results = run_suite((1, 3), ops=20, gui=False, repeat=1)
+    assert {key.split("/")[0] for key in results} == {"replicate_key", "on_key_press",
+                                                      "send_command_to_slaves", "find_wow_windows"}
+    assert {key.split("/")[1] for key in results} == {"1", "3"}
+
+    def run(*args):
+        monkeypatch.setattr(sys, "argv", ["multibox_bench.py", "--windows", "1", "--ops", "20",
+                                          "--repeat", "1", "--no-gui", *args])
+        return main()
+
+    base = tmp_path / "base.json"
+    assert run("--save-baseline", str(base)) == 0
+    saved = json.loads(base.read_text())
+    assert saved["threshold"] == 0.30 and "replicate_key/1" in saved["results"]
+
+    # Una línea base imposible de alcanzar se detecta como regresión
+    for data in saved["results"].values():
+        data["ops_per_s"] = 1e12
+    base.write_text(json.dumps(saved))
+    assert run("--baseline", str(base)) == 1
+    assert run("--baseline", str(tmp_path / "no_existe.json")) == 2
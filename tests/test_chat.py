@@ -0,0 +1,68 @@
+from multibox_backend import WM_CHAR, WM_KEYDOWN, WM_KEYUP, SimulatedBackend
+from multibox_chat import STAGE_MAX_SECONDS, ChatInjector
+from multibox_engine import WoWMultiboxEngine
+from multibox_keymap import KeyTable
+
+
+def _injector():
+    backend = SimulatedBackend()
+    table = KeyTable(backend)
+    table.build("abcdefghijklmnopqrstuvwxyz ")
+    return ChatInjector(backend, table)
+
+
+def test_encode_is_cached_and_uses_wm_char():
+    chat = _injector()
+    encoded = chat.encode("/follow Ana")
+    assert chat.encode("/follow Ana") is encoded
+
+    enter = chat.key_table.get("enter")
+    assert encoded.open_chat == encoded.send == ((WM_KEYDOWN, enter.vk, enter.lparam_down),
+                                                 (WM_KEYUP, enter.vk, enter.lparam_up))
+    assert "".join(chr(wparam) for _, wparam, _ in encoded.text) == "/follow Ana"
+    assert {msg for msg, _, _ in encoded.text} == {WM_CHAR}
+    # El scan code de la tecla va en los bits 16-23
+    assert encoded.text[1][2] == 1 | (chat.key_table.get("f").scan << 16)
+
+    chat.clear_cache()
+    assert chat.encode("/follow Ana") is not encoded
+
+
+def test_stages_never_exceed_the_stage_limit():
+    chat = _injector()
+    chat.configure(open_delay_ms=250, char_delay_ms=40, send_delay_ms=30)
+    encoded = chat.encode("/follow Ana")
+    stages = chat.stages(encoded)
+
+    assert stages[0] == (encoded.open_chat, 0.0, 0.0)
+    assert stages[-1] == (encoded.send, 0.0, 0.0)
+    for messages, delay, pause in stages:
+        assert len(messages) * delay + pause <= STAGE_MAX_SECONDS + 1e-9
+    text = tuple(m for messages, _, _ in stages[1:-1] for m in messages)
+    assert text == encoded.text
+    total = sum(len(messages) * delay + pause for messages, delay, pause in stages)
+    assert abs(total - (0.25 + 11 * 0.04 + 0.03)) < 1e-9
+
+
+def test_command_reaches_every_slave():
+    backend = SimulatedBackend(3)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.update_config(persist=False, follow_target="Ana")
+        engine.find_wow_windows()
+        main = engine.wow_windows[0].hwnd
+        engine.set_main_window(main)
+
+        assert engine.send_follow_command()
+        assert engine.dispatcher.wait_idle()
+        assert backend.wait_idle()
+        for window in engine.registry.slaves:
+            received = backend.windows[window.hwnd].received
+            chars = "".join(chr(wparam) for msg, wparam, *_ in received if msg == WM_CHAR)
+            assert chars == "/follow Ana"
+            assert [msg for msg, *_ in received if msg != WM_CHAR] == [WM_KEYDOWN, WM_KEYUP] * 2
+        assert backend.windows[main].received == []
+    finally:
+        engine.shutdown()
+        backend.close()
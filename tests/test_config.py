@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+
+import pytest
+
+from multibox_backend import SimulatedBackend
+from multibox_config import DEFAULT_KEY_HOLD, ConfigSnapshot, ConfigStore
+from multibox_engine import WoWMultiboxEngine
+
+
+def _snapshot(**changes):
+    values = dict(follow_target="Tanque", delay_enabled=True, delay_ms=45,
+                  blacklisted_keys=frozenset("bm"), key_routes={"1": "healers"},
+                  window_groups={"healers": ["priest"]},
+                  macros={"m": {"steps": [{"key": "1"}]}}, queue_overflow="coalesce")
+    values.update(changes)
+    return ConfigSnapshot(**values)
+
+
+def test_snapshot_round_trip_and_derived_values():
+    snapshot = _snapshot()
+    copy = ConfigSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+
+    assert copy.to_dict() == snapshot.to_dict()
+    assert copy.key_hold == 0.045
+    assert "b" not in copy.replicable_keys and "1" in copy.replicable_keys
+    assert copy.replace(delay_enabled=False).key_hold == DEFAULT_KEY_HOLD
+
+
+def test_snapshot_is_immutable():
+    snapshot = _snapshot()
+    with pytest.raises(AttributeError):
+        snapshot.follow_target = "otro"
+    with pytest.raises(TypeError):
+        snapshot.key_routes["2"] = "dps"
+    with pytest.raises(KeyError):
+        snapshot.replace(no_existe=1)
+    assert snapshot.replace(follow_target="otro").follow_target == "otro"
+    assert snapshot.follow_target == "Tanque"
+
+
+def test_atomic_write_keeps_previous_file_on_error(tmp_path):
+    path = tmp_path / "config.json"
+    store = ConfigStore(str(path))
+    store.write(_snapshot())
+    before = path.read_text()
+
+    with pytest.raises(TypeError):
+        store.write(_snapshot(macros={"m": object()}))
+
+    assert path.read_text() == before
+    assert os.listdir(tmp_path) == ["config.json"]
+    assert store.load().follow_target == "Tanque"
+
+
+def test_saves_are_batched_and_do_not_trigger_reload(tmp_path):
+    path = tmp_path / "config.json"
+    reloads = []
+    store = ConfigStore(str(path), on_reload=lambda: reloads.append(1),
+                        poll_interval=0.02, debounce=0.05)
+    store.start()
+    try:
+        for idx in range(5):
+            store.request_save(_snapshot(follow_target=f"Tanque{idx}"))
+        assert not path.exists()
+        threading.Event().wait(0.3)
+    finally:
+        store.stop()
+
+    assert json.loads(path.read_text())["follow_target"] == "Tanque4"
+    assert reloads == []
+
+
+def test_external_change_reloads_engine_config(tmp_path):
+    path = tmp_path / "config.json"
+    backend = SimulatedBackend(1)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        reloaded = threading.Event()
+
+        def on_reload():
+            engine.reload_config()
+            reloaded.set()
+
+        store = engine.config_store = ConfigStore(str(path), on_reload=on_reload,
+                                                  poll_interval=0.02)
+        store.write(_snapshot())
+        store.start()
+
+        # Fichero inválido: se conserva la configuración anterior
+        path.write_text("{roto")
+        os.utime(path, ns=(1, 1))
+        assert reloaded.wait(5)
+        assert engine.config.follow_target != "Editado"
+
+        reloaded.clear()
+        path.write_text(json.dumps(_snapshot(follow_target="Editado", delay_ms=70).to_dict()))
+        os.utime(path, ns=(2, 2))
+        assert reloaded.wait(5)
+        assert engine.config.follow_target == "Editado"
+        assert engine.config.key_hold == 0.07
+        assert "m" in engine.macros
+    finally:
+        engine.shutdown()
+        backend.close()
@@ -0,0 +1,99 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from multibox_backend import SimulatedBackend
+import multibox_daemon
+from multibox_daemon import MultiboxDaemon, connect, send_command
+from multibox_engine import WoWMultiboxEngine
+
+
+@pytest.fixture
+def daemon():
+    backend = SimulatedBackend(3)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    engine.find_wow_windows()
+    engine.set_main_window(engine.wow_windows[0].hwnd)
+    daemon = MultiboxDaemon(engine, socket_path=None, port=0)
+    try:
+        yield daemon
+    finally:
+        daemon.shutdown()
+        backend.close()
+
+
+def test_commands_map_to_engine(daemon):
+    engine = daemon.engine
+    response = daemon.handle_command("toggle")
+    assert response == {"ok": True, "status": engine.get_status()}
+    assert engine.active
+
+    assert daemon.handle_command("SOLO")["status"]["solo_main_mode"]
+    assert daemon.handle_command("status")["status"]["window_count"] == 3
+    assert daemon.handle_command("key 1")["count"] == 2
+    assert daemon.handle_command("key 1 all")["count"] == 3
+    assert not daemon.handle_command("key")["ok"]
+    assert daemon.handle_command("macro no_existe") == {"ok": False, "count": 0}
+    assert not daemon.handle_command("net")["ok"]
+    assert daemon.handle_command("bailar")["error"] == "orden desconocida: bailar"
+
+
+def test_tcp_control_and_watch(daemon):
+    address = daemon.start_server()
+    port = int(address.rsplit(":", 1)[1])
+
+    with connect(None, port) as watcher:
+        watcher.settimeout(5)
+        watcher.sendall(b"watch\n")
+        events = watcher.makefile("rb")
+        first = json.loads(events.readline())
+        assert first == {"event": "status", "status": daemon.engine.get_status()}
+
+        assert send_command("toggle", None, port)["status"]["active"]
+        # Llegan el cambio de estado y la línea del log de la activación
+        seen = set()
+        while not {"status", "log"} <= seen:
+            event = json.loads(events.readline())
+            seen.add(event["event"])
+            if event["event"] == "status":
+                assert event["status"]["active"]
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="sin sockets Unix")
+def test_unix_socket_and_stop(tmp_path):
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    path = str(tmp_path / "control.sock")
+    daemon = MultiboxDaemon(engine, socket_path=path)
+    runner = threading.Thread(target=daemon.run, kwargs={"start_listener": False})
+    try:
+        runner.start()
+        for _ in range(200):
+            if daemon.address:
+                break
+            threading.Event().wait(0.01)
+        assert daemon.address == path
+        assert send_command("status", path)["status"]["window_count"] == 2
+        assert send_command("stop", path) == {"ok": True}
+        runner.join(5)
+        assert not runner.is_alive()
+        assert not (tmp_path / "control.sock").exists()
+    finally:
+        daemon.stop()
+        runner.join(5)
+        backend.close()
+
+
+def test_daemon_does_not_import_tkinter():
+    code = "import sys, multibox_daemon; print('tkinter' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(multibox_daemon.__file__)),
+                            check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,118 @@
+import re
+
+import pytest
+
+from multibox_backend import SimulatedBackend
+from multibox_discovery import WindowDiscovery, WindowMatcher
+from multibox_engine import WoWMultiboxEngine
+
+
+def _discovery(backend, **kwargs):
+    deltas = []
+    return WindowDiscovery(backend, on_delta=deltas.append, **kwargs), deltas
+
+
+def test_scan_emits_only_changes():
+    backend = SimulatedBackend(2)
+    discovery, deltas = _discovery(backend)
+    try:
+        first = discovery.scan()
+        assert sorted(r.hwnd for r in first.added) == sorted(backend.windows)
+        assert not first.removed and not first.changed
+
+        # Sin cambios: delta vacío y sin notificación
+        assert not discovery.scan()
+        assert len(deltas) == 1
+
+        hwnd = backend.add_window()
+        gone = first.added[0].hwnd
+        backend.remove_window(gone)
+        renamed = first.added[1].hwnd
+        backend.windows[renamed].title = "World of Warcraft - Druida"
+
+        delta = discovery.scan()
+        assert [r.hwnd for r in delta.added] == [hwnd]
+        assert delta.removed == (gone,)
+        assert [(r.hwnd, r.title) for r in delta.changed] == [(renamed, "World of Warcraft - Druida")]
+        assert len(deltas) == 2
+    finally:
+        backend.close()
+
+
+def test_non_wow_title_and_reused_hwnd():
+    backend = SimulatedBackend(1)
+    discovery, _ = _discovery(backend)
+    try:
+        hwnd = discovery.scan().added[0].hwnd
+        pid = backend.windows[hwnd].pid
+
+        # Mismo HWND reutilizado por otro proceso: se elimina y se vuelve a añadir
+        backend.remove_window(hwnd)
+        backend.add_window(hwnd=hwnd)
+        delta = discovery.scan()
+        assert delta.removed == (hwnd,)
+        assert [r.hwnd for r in delta.added] == [hwnd]
+        assert delta.added[0].pid != pid
+
+        # El título deja de ser de WoW: la ventana sale de la lista
+        backend.windows[hwnd].title = "Battle.net"
+        assert discovery.scan().removed == (hwnd,)
+        assert not discovery.scan()
+    finally:
+        backend.close()
+
+
+def test_matcher_criteria_and_cached_queries():
+    backend = SimulatedBackend(0)
+    wow = backend.add_window()
+    other_exe = backend.add_window(exe="Launcher.exe")
+    other_class = backend.add_window(class_name="Chrome_WidgetWin_1")
+    discovery, _ = _discovery(backend, matcher=WindowMatcher.from_config(
+        {"classes": ["GxWindowClass"], "titles": [r"^world of warcraft"], "exes": ["wow.exe"]}))
+    try:
+        assert [r.hwnd for r in discovery.scan().added] == [wow]
+        # 3 clases, 2 títulos, 2 PIDs y 2 ejecutables
+        assert discovery.last_scan_queries == 9
+
+        # Sin cambios: clase y ejecutable en caché; solo título y PID de las candidatas
+        # (la ventana de otra clase ni siquiera se lee)
+        assert not discovery.scan()
+        assert discovery.last_scan_queries == 3
+        assert other_class not in discovery._titles
+        assert other_exe not in discovery._records
+    finally:
+        backend.close()
+
+
+def test_set_matcher_reclassifies_windows():
+    backend = SimulatedBackend(0)
+    wow = backend.add_window()
+    private = backend.add_window(title="Ascension Launcher - WoW")
+    discovery, _ = _discovery(backend)
+    try:
+        assert [r.hwnd for r in discovery.scan().added] == [wow]
+
+        discovery.set_matcher(WindowMatcher.from_config({"titles": ["ascension", "^world"]}))
+        delta = discovery.scan()
+        assert [r.hwnd for r in delta.added] == [private]
+        assert not delta.removed
+    finally:
+        backend.close()
+
+
+def test_invalid_title_pattern_keeps_previous_matcher():
+    backend = SimulatedBackend(1)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        matcher = engine.window_matcher
+        with pytest.raises(re.error):
+            WindowMatcher.from_config({"titles": ["(sin cerrar"]})
+
+        engine.update_config(persist=False, window_match={"titles": ["(sin cerrar"]})
+        assert engine.window_matcher is matcher
+        assert engine.discovery.matcher is matcher
+        assert any("Criterios de ventanas inválidos" in r.message for r in engine.log_ring.since(0))
+    finally:
+        engine.shutdown()
+        backend.close()
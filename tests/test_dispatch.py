@@ -0,0 +1,273 @@
+import threading
+import time
+
+from multibox_backend import WM_CHAR, WM_KEYDOWN, WM_KEYUP, SimulatedBackend
+from multibox_dispatch import OVERFLOW_COALESCE, DispatchEngine, WindowSender
+from multibox_engine import WoWMultiboxEngine
+
+
+def _block(sender_submit):
+    """Ocupa el carril con un trabajo que espera a que se abra la compuerta"""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(5)
+
+    sender_submit(hold)
+    assert started.wait(5)
+    return gate
+
+
+def test_coalesce_ignores_timestamp():
+    sender = WindowSender(1, capacity=4, overflow=OVERFLOW_COALESCE)
+    gate = _block(sender.submit)
+
+    def post(key, repeat, t_event):
+        pass
+
+    try:
+        for t_event in range(1, 21):
+            sender.submit(post, "1", True, t_event, coalesce_key=("1", True))
+        # Con la cola llena se descartan las repeticiones nuevas, no las ya encoladas
+        assert [job[1][2] for job in sender._jobs] == [1, 2, 3, 4]
+        assert sender.dropped == 16
+    finally:
+        gate.set()
+        sender.stop()
+
+
+def test_held_key_repeats_coalesce_in_engine():
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        main, slave = (w.hwnd for w in engine.wow_windows)
+        engine.set_main_window(main)
+        engine.foreground_window = main
+        engine.active = True
+        engine.dispatcher.configure(4, OVERFLOW_COALESCE, 0.25)
+
+        gate = _block(lambda fn: engine.dispatcher.submit(slave, fn))
+        try:
+            for _ in range(20):
+                engine.replicate_key("1", time.perf_counter_ns())
+            sender = engine.dispatcher._senders[slave]
+            queued = [job[1][2] for job in sender._jobs]
+            # El KEYDOWN inicial se conserva: las repeticiones nuevas se fusionan
+            assert queued == [False, True, True, True]
+        finally:
+            gate.set()
+            engine.release_key("1")
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_coalesce_never_drops_key_up():
+    sender = WindowSender(1, capacity=4, overflow=OVERFLOW_COALESCE)
+    gate = _block(sender.submit)
+    sent = []
+
+    def down(key):
+        sent.append(("down", key))
+
+    def up(key):
+        sent.append(("up", key))
+
+    try:
+        sender.submit(down, "a")
+        sender.submit(up, "a", critical=True)
+        sender.submit(down, "a")
+        sender.submit(down, "c")
+        # Igual al KEYUP ya encolado, pero después de un KEYDOWN de la misma tecla
+        assert sender.submit(up, "a", critical=True)
+    finally:
+        gate.set()
+        sender.stop()
+    assert sender.wait_idle()
+
+    assert sent.count(("up", "a")) == 2
+    assert sent[-1] == ("up", "a")
+
+
+def test_long_chat_command_does_not_trip_lane():
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    breaker = []
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        main, slave = (w.hwnd for w in engine.wow_windows)
+        engine.set_main_window(main)
+        engine.dispatcher.on_breaker = lambda hwnd, tripped, reason: breaker.append(reason)
+        engine.chat.configure(0, 40, 0)
+
+        # ~1.9 s escribiendo en el chat: más que el plazo del vigilante
+        command = "/follow " + "x" * 40
+        assert engine.send_command_to_slaves(command, forward=False) == 1
+        assert engine.dispatcher.wait_idle()
+
+        assert breaker == []
+        assert not engine.dispatcher.is_tripped(slave)
+        chars = [wparam for msg, wparam, *_ in backend.windows[slave].received if msg == WM_CHAR]
+        assert "".join(map(chr, chars)) == command
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_lane_runs_jobs_in_order_and_survives_errors():
+    errors = []
+    sender = WindowSender(1, on_error=lambda hwnd, e: errors.append((hwnd, str(e))))
+    done = []
+
+    def job(idx):
+        if idx == 3:
+            raise OSError("fallo")
+        done.append(idx)
+
+    try:
+        for idx in range(10):
+            sender.submit(job, idx)
+        assert sender.wait_idle()
+    finally:
+        sender.stop()
+
+    assert done == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert errors == [(1, "fallo")]
+    assert sender.completed == 10 and sender.failures == 0
+
+
+def test_slow_window_does_not_delay_the_others():
+    backend = SimulatedBackend(0)
+    main = backend.add_window()
+    slow = backend.add_window()
+    fast = backend.add_window()
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        engine.set_main_window(main)
+        engine.foreground_window = main
+        engine.active = True
+
+        # El carril de la ventana lenta queda ocupado; las demás reciben sus teclas igual
+        gate = _block(lambda fn: engine.dispatcher.submit(slow, fn))
+        try:
+            engine.replicate_key("1")
+            engine.release_key("1")
+            assert engine.dispatcher._senders[fast].wait_idle()
+            assert backend.windows[fast].wait_idle()
+            assert [msg for msg, *_ in backend.windows[fast].received] == [WM_KEYDOWN, WM_KEYUP]
+            assert backend.windows[slow].received == []
+        finally:
+            gate.set()
+        assert engine.dispatcher.wait_idle()
+        assert backend.windows[slow].wait_idle()
+        assert [msg for msg, *_ in backend.windows[slow].received] == [WM_KEYDOWN, WM_KEYUP]
+        assert backend.windows[main].received == []
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_drop_oldest_keeps_critical_jobs():
+    sender = WindowSender(0x10, capacity=2)
+    try:
+        ran = []
+        gate = _block(sender.submit)
+        sender.submit(ran.append, "down a")
+        sender.submit(ran.append, "up a", critical=True)
+        assert sender.submit(ran.append, "down b")       # descarta 'down a'
+        assert sender.submit(ran.append, "up b", critical=True)   # descarta 'down b'
+        assert not sender.submit(ran.append, "down c")   # solo quedan críticos
+        gate.set()
+
+        assert sender.wait_idle()
+        assert ran == ["up a", "up b"] and sender.dropped == 3
+    finally:
+        sender.stop()
+
+
+def test_submit_many_is_all_or_nothing():
+    sender = WindowSender(0x10, capacity=1)
+    try:
+        ran = []
+        gate = _block(sender.submit)
+        assert sender.submit_many([(ran.append, ("a",)), (ran.append, ("b",)), (ran.append, ("c",))])
+        # La secuencia admitida no se parte aunque la cola se desborde
+        assert not sender.submit_many([(ran.append, ("x",)), (ran.append, ("y",))])
+        sender.trip()
+        assert not sender.submit_many([(ran.append, ("z",))])
+        assert sender.submit_many([(ran.append, ("up",))], critical=True)
+        gate.set()
+
+        assert sender.wait_idle()
+        assert ran == ["a", "b", "c", "up"]
+    finally:
+        sender.stop()
+
+
+def _dispatch(**params):
+    events = []
+    dispatch = DispatchEngine(on_breaker=lambda hwnd, tripped, reason: events.append((tripped, reason)))
+    dispatch.stall_timeout = params.get("stall_timeout", 0.05)
+    dispatch.failure_threshold = params.get("failure_threshold", 5)
+    return dispatch, events
+
+
+def test_breaker_opens_on_hung_window_and_recovers():
+    dispatch, events = _dispatch()
+    hung = {0x10}
+    dispatch._is_hung = lambda hwnd: hwnd in hung
+    try:
+        ran = []
+        gate = _block(lambda fn: dispatch.submit(0x10, fn))
+        dispatch.submit(0x10, ran.append, "down")
+        dispatch.submit(0x10, ran.append, "up", critical=True)
+
+        dispatch.check_senders()
+        assert dispatch.is_tripped(0x10) and events == [(True, "no responde")]
+        assert not dispatch.submit(0x10, ran.append, "down 2")
+        gate.set()
+        assert dispatch.wait_idle()
+        assert ran == ["up"]
+
+        # Sigue abierto mientras no responda; se cierra cuando responde durante stall_timeout
+        dispatch.check_senders()
+        assert dispatch.is_tripped(0x10)
+        hung.clear()
+        time.sleep(dispatch.stall_timeout)
+        dispatch.check_senders()
+        assert not dispatch.is_tripped(0x10) and events[-1] == (False, "vuelve a responder")
+        assert dispatch.submit(0x10, ran.append, "down 3")
+    finally:
+        dispatch.stop()
+
+
+def test_breaker_opens_on_stalled_lane_and_repeated_failures():
+    dispatch, events = _dispatch(failure_threshold=2)
+    try:
+        gate = _block(lambda fn: dispatch.submit(0x10, fn))
+        dispatch.submit(0x10, time.sleep, 0)
+        dispatch.check_senders()
+        assert not dispatch.is_tripped(0x10)
+        time.sleep(dispatch.stall_timeout)
+        dispatch.check_senders()
+        assert events == [(True, "su carril no avanza")]
+        gate.set()
+
+        def fail():
+            raise OSError("PostMessage falló")
+
+        dispatch.submit(0x20, fail)
+        dispatch.submit(0x20, fail)
+        assert dispatch.wait_idle()
+        dispatch.check_senders()
+        assert dispatch.is_tripped(0x20)
+        assert events[-1] == (True, "2 envíos fallidos seguidos")
+    finally:
+        dispatch.stop()
@@ -0,0 +1,55 @@
+import collections
+
+import pytest
+
+tk = pytest.importorskip("tkinter")
+from multibox_gui import WoWMultiboxGUI  # noqa: E402
+
+
+class _Frame:
+    """Lo mínimo de la GUI que usa refresh_tick, contando los repintados"""
+
+    FRAME_MS = WoWMultiboxGUI.FRAME_MS
+
+    def __init__(self):
+        self.painted = collections.Counter()
+        self.scheduled = []
+        self.dirty_status = self.dirty_windows = self.dirty_foreground = False
+        self.engine = type("Engine", (), {"wow_windows": (), "foreground_window": 0})()
+        self.root = type("Root", (), {"after": lambda _, ms, fn: self.scheduled.append(ms)})()
+
+    def update_windows_list(self, windows):
+        self.painted["windows"] += 1
+
+    def update_status(self):
+        self.painted["status"] += 1
+
+    def update_foreground(self, hwnd):
+        self.painted["foreground"] += 1
+
+    mark_status_dirty = WoWMultiboxGUI.mark_status_dirty
+    mark_windows_dirty = WoWMultiboxGUI.mark_windows_dirty
+    mark_foreground_dirty = WoWMultiboxGUI.mark_foreground_dirty
+    refresh_tick = WoWMultiboxGUI.refresh_tick
+
+
+def test_many_changes_paint_once_per_frame():
+    frame = _Frame()
+    for _ in range(100):
+        frame.mark_status_dirty()
+        frame.mark_foreground_dirty(0x10)
+    frame.refresh_tick()
+    assert frame.painted == {"status": 1, "foreground": 1}
+
+    # Sin cambios: solo se reprograma el siguiente frame
+    frame.refresh_tick()
+    assert frame.painted == {"status": 1, "foreground": 1}
+    assert frame.scheduled == [WoWMultiboxGUI.FRAME_MS] * 2
+
+
+def test_window_changes_repaint_status_and_foreground():
+    frame = _Frame()
+    frame.mark_windows_dirty(())
+    frame.refresh_tick()
+    assert frame.painted == {"windows": 1, "status": 1, "foreground": 1}
+    assert not (frame.dirty_windows or frame.dirty_status or frame.dirty_foreground)
@@ -0,0 +1,80 @@
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+
+
+def _active_engine(windows=2):
+    backend = SimulatedBackend(windows)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    engine.find_wow_windows()
+    main = engine.wow_windows[0].hwnd
+    engine.set_main_window(main)
+    engine.foreground_window = main
+    engine.active = True
+    return engine, backend
+
+
+def _received(engine, backend, hwnd):
+    assert engine.dispatcher.wait_idle()
+    assert backend.windows[hwnd].wait_idle()
+    return backend.windows[hwnd].received
+
+
+def test_hotkeys_compiled_from_config():
+    engine, backend = _active_engine()
+    try:
+        engine.apply_config(engine.config.replace(hotkeys={"F5": "toggle_active",
+                                                           "f6": "no_existe"}))
+        assert set(engine.hotkey_map) == {"f5"}
+
+        engine.on_key_press("f5")
+        assert not engine.active
+        # F12 ya no es un atajo: con el engine inactivo no hace nada
+        engine.on_key_press("f12")
+        assert not engine.active
+        engine.on_key_press("f5")
+        assert engine.active
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_hotkey_keys_are_not_replicated():
+    engine, backend = _active_engine()
+    try:
+        slave = engine.wow_windows[1].hwnd
+        engine.apply_config(engine.config.replace(hotkeys={"1": "toggle_solo_main"}))
+
+        engine.on_key_press("1")
+        engine.on_key_release("1")
+        assert engine.solo_main_mode
+        assert _received(engine, backend, slave) == []
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_early_reject_inactive_paused_and_blacklisted():
+    engine, backend = _active_engine()
+    try:
+        slave = engine.wow_windows[1].hwnd
+        assert "b" not in engine.config.replicable_keys
+
+        engine.on_key_press("b")            # en la lista negra
+        engine.on_key_press("?")            # no replicable
+        engine.paused = True
+        engine.on_key_press("1")
+        engine.paused = False
+        engine.active = False
+        engine.on_key_press("2")
+        for key in ("b", "?", "1", "2"):
+            engine.on_key_release(key)
+
+        assert _received(engine, backend, slave) == []
+        assert not engine.held_keys
+        stats = engine.get_listener_stats()
+        assert stats["events"] == 8
+        assert stats["max_us"] >= stats["avg_us"] > 0
+    finally:
+        engine.shutdown()
+        backend.close()
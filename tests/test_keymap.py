@@ -0,0 +1,65 @@
+import time
+
+from multibox_backend import SIMULATED_LAYOUT_FR, SimulatedBackend, WM_KEYDOWN, WM_KEYUP
+from multibox_engine import WoWMultiboxEngine
+from multibox_keymap import KeyTable, make_lparam
+
+
+def test_layout_change_in_game_rebuilds_keys_macros_and_chat():
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        main = engine.wow_windows[0].hwnd
+        engine.set_main_window(main)
+        engine._on_foreground_change(main)
+        engine.apply_config(engine.config.replace(macros={"q": {"steps": [{"key": "q"}]}}))
+
+        assert engine.key_table.get("q").vk == ord("Q")
+        assert engine.chat.encode("/q").text[1][2] >> 16 == 0x10
+
+        # Cambio hecho dentro del juego: la ventana activa no cambia
+        backend.set_keyboard_layout(SIMULATED_LAYOUT_FR)
+        deadline = time.monotonic() + 3.0
+        # Lo último que reconstruye el engine son las macros
+        while (engine.macros["q"].actions[0].messages[0][1] != ord("A")
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+
+        assert engine.key_table.layout == SIMULATED_LAYOUT_FR
+        assert engine.key_table.get("q").vk == ord("A")
+        assert engine.chat.encode("/q").text[1][2] >> 16 == 0x1E
+        down = engine.macros["q"].actions[0].messages
+        assert down == ((WM_KEYDOWN, ord("A"), engine.key_table.get("q").lparam_down),)
+        assert not engine.refresh_keyboard_layout(main)
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_lparam_bits():
+    assert make_lparam(0x1E) == 0x001E0001
+    assert make_lparam(0x1E, repeat=True) == 0x401E0001
+    assert make_lparam(0x1E, key_up=True) == 0xC01E0001
+
+
+def test_table_entries_and_shift_messages():
+    backend = SimulatedBackend()
+    table = KeyTable(backend)
+    table.build("a1")
+
+    entry = table.get("a")
+    assert (entry.vk, entry.scan, entry.shift) == (ord("A"), 0x1E, False)
+    assert table.get("f12").vk == 0x7B
+    assert table.get("?") is None
+
+    # Las mayúsculas no estaban precalculadas: se calculan una vez y llevan shift
+    upper = table.get("A")
+    assert upper.shift and table.get("A") is upper
+    shift = table.shift_entry
+    assert table.key_messages(upper) == ((WM_KEYDOWN, shift.vk, shift.lparam_down),
+                                         (WM_KEYDOWN, upper.vk, upper.lparam_down))
+    assert table.key_messages(upper, key_up=True) == ((WM_KEYUP, upper.vk, upper.lparam_up),
+                                                      (WM_KEYUP, shift.vk, shift.lparam_up))
+    assert table.key_messages(entry, repeat=True) == ((WM_KEYDOWN, entry.vk, entry.lparam_repeat),)
@@ -0,0 +1,70 @@
+import threading
+
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+from multibox_log import DEBUG, ERROR, INFO, LogRing
+
+
+def test_ring_wraps_around_keeping_newest():
+    ring = LogRing(capacity=5)
+    assert ring.last_seq == 0 and ring.since(0) == []
+
+    for idx in range(12):
+        ring.append(INFO, "Sistema", f"mensaje {idx}")
+
+    records = ring.since(0)
+    assert [r.seq for r in records] == [8, 9, 10, 11, 12]
+    assert records[-1].message == "mensaje 11"
+    assert ring.last_seq == 12
+
+
+def test_cursor_reads_each_record_once():
+    ring = LogRing(capacity=100)
+    cursor = ring.last_seq
+    ring.append(INFO, "A", "uno")
+    ring.append(ERROR, "B", "dos")
+
+    batch = ring.since(cursor)
+    assert [r.message for r in batch] == ["uno", "dos"]
+    cursor = batch[-1].seq
+    assert ring.since(cursor) == []
+
+    ring.append(INFO, "C", "tres")
+    assert [r.message for r in ring.since(cursor)] == ["tres"]
+    assert batch[1].format().endswith("[B] dos")
+
+
+def test_concurrent_appends_get_unique_sequences():
+    ring = LogRing(capacity=10000)
+
+    def writer(tag):
+        for idx in range(1000):
+            ring.append(INFO, tag, str(idx))
+
+    threads = [threading.Thread(target=writer, args=(f"t{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    seqs = [r.seq for r in ring.since(0)]
+    assert len(seqs) == len(set(seqs)) == 4000
+
+
+def test_engine_filters_by_level():
+    backend = SimulatedBackend(0)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        cursor = engine.log_ring.last_seq
+        engine.log("Tecla", "oculto", DEBUG)
+        engine.log("Error", "visible")
+        assert [(r.level, r.message) for r in engine.log_ring.since(cursor)] == [(ERROR, "visible")]
+
+        engine.set_log_level("debug")
+        assert engine.log_debug
+        engine.log("Tecla", "ahora sí", DEBUG)
+        assert engine.log_ring.since(cursor)[-1].message == "ahora sí"
+    finally:
+        engine.shutdown()
+        backend.close()
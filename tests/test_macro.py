@@ -0,0 +1,56 @@
+import time
+
+from multibox_backend import WM_KEYDOWN, WM_KEYUP, SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+
+
+def test_key_hold_follows_delay_config():
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        macros = {"pulsar": {"steps": [{"key": "1"}, {"key": "2", "hold_ms": 5}]}}
+        engine.update_config(persist=False, delay_enabled=True, delay_ms=80, macros=macros)
+
+        macro = engine.macros["pulsar"]
+        assert [round(action.offset, 3) for action in macro.actions] == [0.0, 0.08, 0.08, 0.085]
+        assert [action.messages[0][0] for action in macro.actions] == [WM_KEYDOWN, WM_KEYUP,
+                                                                      WM_KEYDOWN, WM_KEYUP]
+
+        engine.update_config(persist=False, delay_enabled=False)
+        assert round(engine.macros["pulsar"].duration, 3) == 0.035
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_run_macro_staggers_windows_and_releases_keys():
+    backend = SimulatedBackend(3)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        macros = {"rotar": {"steps": [{"key": "1", "hold_ms": 10}, {"wait_ms": 10}, {"key": "2"}],
+                            "targets": "all", "stagger_ms": 40}}
+        engine.update_config(persist=False, macros=macros)
+        engine.find_wow_windows()
+        hwnds = [w.hwnd for w in engine.wow_windows]
+
+        assert engine.run_macro("rotar") == 3
+        assert engine.run_macro("nada") == 0
+        deadline = time.monotonic() + 5
+        while engine.scheduler.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert engine.dispatcher.wait_idle()
+        backend.wait_idle()
+
+        one, two = engine.key_table.get("1").vk, engine.key_table.get("2").vk
+        for hwnd in hwnds:
+            keys = [(msg, wparam) for msg, wparam, *_ in backend.windows[hwnd].received]
+            assert keys == [(WM_KEYDOWN, one), (WM_KEYUP, one), (WM_KEYDOWN, two), (WM_KEYUP, two)]
+
+        # Escalonado: cada ventana empieza después que la anterior
+        first = [backend.windows[hwnd].received[0][3] for hwnd in hwnds]
+        assert first == sorted(first)
+    finally:
+        engine.shutdown()
+        backend.close()
@@ -0,0 +1,77 @@
+import json
+import time
+
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+from multibox_metrics import BUCKET_BOUNDS_NS, LatencyHistogram, LatencyMetrics
+
+
+def test_percentiles_use_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0
+
+    for _ in range(90):
+        histogram.record(1_000)
+    for _ in range(10):
+        histogram.record(1_000_000)
+
+    assert histogram.percentile(50) == 1_000
+    assert histogram.percentile(95) == 1_000_000   # acotado al máximo observado
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["max_us"] == 1_000.0
+    assert abs(summary["avg_us"] - 100.9) < 1e-9
+
+
+def test_overflow_bucket_and_merge():
+    slow = LatencyHistogram()
+    slow.record(BUCKET_BOUNDS_NS[-1] * 2)
+    assert slow.counts[-1] == 1
+    assert slow.percentile(99) == slow.max_ns
+
+    total = LatencyHistogram()
+    fast = LatencyHistogram()
+    fast.record(2_000)
+    total.merge(fast)
+    total.merge(slow)
+    assert total.count == 2 and total.max_ns == slow.max_ns
+
+
+def test_snapshot_aggregates_windows(tmp_path):
+    metrics = LatencyMetrics()
+    metrics.record_dispatch(500)
+    metrics.record_post(0x10, 2_000)
+    metrics.record_post(0x20, 4_000)
+
+    data = metrics.export_json(str(tmp_path / "latencia.json"), {0x10: "WoW 1"})
+    assert data["overall"]["count"] == 2
+    assert data["windows"]["0x10"]["title"] == "WoW 1"
+    assert json.loads((tmp_path / "latencia.json").read_text())["dispatch"]["count"] == 1
+
+    metrics.reset()
+    assert metrics.snapshot()["overall"]["count"] == 0
+
+
+def test_engine_records_latency_per_keystroke():
+    backend = SimulatedBackend(3)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        main = engine.wow_windows[0].hwnd
+        engine.set_main_window(main)
+        engine.foreground_window = main
+        engine.active = True
+
+        for _ in range(5):
+            engine.on_key_press("1")
+            engine.on_key_release("1")
+        assert engine.dispatcher.wait_idle()
+
+        stats = engine.get_latency_stats()
+        assert stats["dispatch"]["count"] == 5
+        assert stats["overall"]["count"] == 10
+        assert len(stats["windows"]) == 2
+    finally:
+        engine.shutdown()
+        backend.close()
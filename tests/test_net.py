@@ -0,0 +1,184 @@
+import socket
+import time
+
+import pytest
+
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+from multibox_net import (FRAME_AUTH, FRAME_COMMAND, FRAME_KEY_DOWN, FRAME_KEY_UP, FRAME_SIZE,
+                          MAX_PAYLOAD, NetClient, NetServer, decode_frame, encode_frame,
+                          loopback_demo)
+
+KEY = b"secreto"
+
+
+def test_frame_round_trip():
+    frame = encode_frame(FRAME_COMMAND, 7, 123456789, "/follow Ñandú".encode("utf-8"), KEY)
+    assert len(frame) == FRAME_SIZE
+    assert decode_frame(frame, KEY) == (FRAME_COMMAND, 7, 123456789, "/follow Ñandú".encode("utf-8"))
+
+
+def test_frames_with_wrong_key_or_tampered_are_rejected():
+    frame = encode_frame(FRAME_KEY_DOWN, 1, 1, b"1", KEY)
+    assert decode_frame(frame, b"otro") is None
+    assert decode_frame(frame) is None
+
+    tampered = bytearray(frame)
+    tampered[20] ^= 0x01
+    assert decode_frame(bytes(tampered), KEY) is None
+    assert decode_frame(frame[:-1], KEY) is None
+
+
+def test_payload_limit():
+    encode_frame(FRAME_COMMAND, 1, 1, b"x" * MAX_PAYLOAD, KEY)
+    with pytest.raises(ValueError):
+        encode_frame(FRAME_COMMAND, 1, 1, b"x" * (MAX_PAYLOAD + 1), KEY)
+
+
+def test_public_bind_requires_secret_or_allowlist():
+    with pytest.raises(ValueError):
+        NetServer(None, "0.0.0.0", 0).start()
+
+
+class _RecordingEngine:
+    def __init__(self):
+        self.keys = []
+        self.commands = []
+        self.on_key_forward = None
+        self.on_command_forward = None
+
+    def apply_remote_key(self, key, pressed, repeat=False):
+        self.keys.append((key, pressed, repeat))
+
+    def send_command_to_slaves(self, command, forward=True):
+        self.commands.append(command)
+
+    def release_remote_keys(self):
+        pass
+
+    def log(self, source, message, level=None):
+        pass
+
+
+def test_client_drops_late_frames_except_key_up():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    engine = _RecordingEngine()
+    client = NetClient(engine, *sink.getsockname(), secret="s")
+    client._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client._sock.connect(sink.getsockname())
+    try:
+        client._handle(FRAME_KEY_DOWN, 1, 0, b"1")
+        client._handle(FRAME_KEY_DOWN, 4, 0, b"2")
+        client._handle(FRAME_KEY_DOWN, 3, 0, b"3")     # atrasada: se descarta
+        client._handle(FRAME_KEY_UP, 2, 0, b"1")       # atrasada, pero es un KEYUP
+        client._handle(FRAME_COMMAND, 5, 0, b"/assist X")
+
+        assert engine.keys == [("1", True, False), ("2", True, False), ("1", False, False)]
+        assert engine.commands == ["/assist X"]
+        assert client.stats() == {"received": 5, "lost": 2, "late": 2, "rejected": 0,
+                                  "last_seq": 5}
+    finally:
+        client._sock.close()
+        sink.close()
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def main_engine():
+    backend = SimulatedBackend(1)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    yield engine
+    engine.shutdown()
+    backend.close()
+
+
+def test_auth_without_challenge_is_rejected(main_engine):
+    server = NetServer(main_engine, "127.0.0.1", 0, secret="s")
+    server.start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Un AUTH bien firmado pero sin CHALLENGE previo no da de alta
+        sock.sendto(encode_frame(FRAME_AUTH, 0, 1, b"\0" * 16, b"s"), server.address)
+        assert _wait_for(lambda: server.rejected == 1)
+        assert server.stats()["peers"] == {}
+    finally:
+        sock.close()
+        server.stop()
+
+
+def test_allowlist_rejects_other_hosts(main_engine):
+    server = NetServer(main_engine, "127.0.0.1", 0, allow=("192.0.2.1",))
+    server.start()
+    client = NetClient(_RecordingEngine(), *server.address)
+    try:
+        client.start()
+        assert _wait_for(lambda: server.rejected > 0)
+        assert server.stats()["peers"] == {}
+    finally:
+        client.stop()
+        server.stop()
+
+
+@pytest.mark.parametrize("reliable", [False, True])
+def test_loopback_only_authenticated_peer_receives(reliable):
+    result = loopback_demo(presses=20, reliable=reliable, windows=2)
+    assert len(result["server"]["peers"]) == 1
+    assert result["client"]["received"] == 40
+    assert result["client"]["rejected"] == 0
+    assert result["remote_messages"] == 2 * 40
+    assert result["intruder_messages"] == 0
+
+
+def _engine_with_windows(windows=3):
+    backend = SimulatedBackend(windows)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    engine.find_wow_windows()
+    main = engine.wow_windows[0].hwnd
+    engine.set_main_window(main)
+    engine.foreground_window = main
+    engine.active = True
+    return engine, backend
+
+
+def test_engine_forwards_keys_except_in_solo_main():
+    engine, backend = _engine_with_windows()
+    forwarded = []
+    engine.on_key_forward = lambda key, pressed, repeat: forwarded.append((key, pressed, repeat))
+    try:
+        engine.replicate_key("1")
+        engine.replicate_key("1")
+        engine.release_key("1")
+        assert forwarded == [("1", True, False), ("1", True, True), ("1", False, False)]
+
+        forwarded.clear()
+        engine.solo_main_mode = True
+        engine.replicate_key("2")
+        engine.replicate_key("2")
+        engine.release_key("2")
+        assert forwarded == []
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_remote_keys_reach_every_window_and_orphan_repeats_are_ignored():
+    engine, backend = _engine_with_windows()
+    try:
+        assert engine.apply_remote_key("q", True, repeat=True) == 0
+        assert engine.apply_remote_key("q", True) == 3
+        assert engine.apply_remote_key("q", True, repeat=True) == 3
+        assert engine.apply_remote_key("q", False) == 3
+        assert engine.apply_remote_key("q", False) == 0
+        assert engine.remote_held == {}
+    finally:
+        engine.shutdown()
+        backend.close()
@@ -0,0 +1,33 @@
+from multibox_registry import WindowRecord, WindowRegistry
+
+
+def _registry():
+    registry = WindowRegistry()
+    registry.apply_delta([WindowRecord(h, h, f"WoW {h}") for h in (1, 2, 3)], (), ())
+    return registry
+
+
+def test_precomputed_targets():
+    registry = _registry()
+    registry.set_main(2)
+
+    assert [r.hwnd for r in registry.slaves] == [1, 3]
+    assert registry.main_targets == (2,)
+    assert registry.targets_except(1) == (2, 3)
+    assert registry.targets_except(2) == (1, 3)
+    # Ventana que no es de WoW: None, para que el llamador no replique
+    assert registry.targets_except(99) is None
+    assert 2 in registry and 99 not in registry
+
+
+def test_delta_keeps_order_and_clears_removed_main():
+    registry = _registry()
+    registry.set_main(2)
+
+    registry.apply_delta([WindowRecord(4, 4, "WoW 4")], (2,), [WindowRecord(1, 1, "WoW renombrada")])
+    assert [r.hwnd for r in registry] == [1, 3, 4]
+    assert registry.get(1).title == "WoW renombrada"
+    assert registry.main_window is None
+    assert registry.main_targets == ()
+    assert [r.hwnd for r in registry.slaves] == [1, 3, 4]
+    assert registry.targets_except(4) == (1, 3)
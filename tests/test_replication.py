@@ -0,0 +1,92 @@
+from multibox_backend import WM_KEYDOWN, WM_KEYUP, SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+
+
+def _active_engine(windows=3):
+    backend = SimulatedBackend(windows)
+    engine = WoWMultiboxEngine(backend)
+    engine.config_store.stop()
+    engine.find_wow_windows()
+    main = engine.wow_windows[0].hwnd
+    engine.set_main_window(main)
+    engine.foreground_window = main
+    engine.active = True
+    return engine, backend
+
+
+def _received(engine, backend, hwnd):
+    assert engine.dispatcher.wait_idle()
+    assert backend.windows[hwnd].wait_idle()
+    return [(msg, lparam) for msg, _, lparam, *_ in backend.windows[hwnd].received]
+
+
+def test_key_up_follows_physical_release():
+    engine, backend = _active_engine()
+    try:
+        main, slave, other = (w.hwnd for w in engine.wow_windows)
+        entry = engine.key_table.get("1")
+
+        engine.on_key_press("1")
+        engine.on_key_press("1")   # autorepetición
+        assert _received(engine, backend, slave) == [(WM_KEYDOWN, entry.lparam_down),
+                                                     (WM_KEYDOWN, entry.lparam_repeat)]
+
+        # Aunque cambie la ventana activa, el KEYUP va a las ventanas del KEYDOWN
+        engine.foreground_window = slave
+        engine.on_key_release("1")
+        assert _received(engine, backend, slave)[-1] == (WM_KEYUP, entry.lparam_up)
+        assert [msg for msg, _ in _received(engine, backend, other)] == [WM_KEYDOWN, WM_KEYDOWN,
+                                                                          WM_KEYUP]
+        assert _received(engine, backend, main) == []
+        assert engine.held_keys == {}
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_pause_and_deactivate_release_held_keys():
+    engine, backend = _active_engine(2)
+    try:
+        slave = engine.wow_windows[1].hwnd
+        engine.on_key_press("w")
+        engine.toggle_pause()
+        assert engine.held_keys == {}
+        assert [msg for msg, _ in _received(engine, backend, slave)] == [WM_KEYDOWN, WM_KEYUP]
+
+        # En pausa no se replica; soltar una tecla no presionada no envía nada
+        engine.on_key_press("w")
+        engine.on_key_release("w")
+        engine.toggle_pause()
+        engine.on_key_press("q")
+        engine.toggle_active()
+        assert [msg for msg, _ in _received(engine, backend, slave)] == [WM_KEYDOWN, WM_KEYUP,
+                                                                          WM_KEYDOWN, WM_KEYUP]
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_foreground_comes_from_backend_events():
+    engine, backend = _active_engine()
+    try:
+        main, slave, other = (w.hwnd for w in engine.wow_windows)
+        changes = []
+        engine.on_foreground_change = changes.append
+
+        backend.set_foreground(slave)
+        assert engine.get_foreground_window() == slave
+        engine.on_key_press("1")
+        engine.on_key_release("1")
+        assert [msg for msg, _ in _received(engine, backend, main)] == [WM_KEYDOWN, WM_KEYUP]
+        assert _received(engine, backend, slave) == []
+
+        # Ventana activa que no es de WoW (p. ej. el navegador): no se replica
+        browser = backend.add_window(title="Navegador", class_name="Chrome_WidgetWin_1")
+        backend.set_foreground(browser)
+        engine.on_key_press("2")
+        engine.on_key_release("2")
+        assert len(_received(engine, backend, other)) == 2
+        assert changes == [slave, browser]
+    finally:
+        engine.shutdown()
+        backend.close()
@@ -0,0 +1,108 @@
+from multibox_registry import WindowRecord
+from multibox_routing import RoutingTable
+
+WINDOWS = (
+    WindowRecord(0x10, 1, "World of Warcraft - Priest", is_main=True),
+    WindowRecord(0x20, 2, "World of Warcraft - Mage"),
+    WindowRecord(0x30, 3, "World of Warcraft - Druid"),
+)
+
+
+def test_key_route_with_explicit_all_mode_is_reported():
+    table = RoutingTable()
+    errors = table.configure({"todos": {"match": ["warcraft"], "mode": "all"},
+                              "casters": ["mage", "druid"]},
+                             {"1": "todos", "2": "casters", "3": "all"})
+    # Solo el grupo con modo 'all' explícito: 'casters' usa el modo por defecto y 'all' es especial
+    assert len(errors) == 1
+    assert "'1'" in errors[0] and "'todos'" in errors[0]
+
+    # La regla se conserva; la ventana origen sigue sin recibir copia
+    table.rebuild(WINDOWS)
+    assert table.targets("1", 0x10) == (0x20, 0x30)
+    assert table.resolve("todos", 0x10) == (0x10, 0x20, 0x30)
+
+
+def _table(groups, routes):
+    table = RoutingTable()
+    assert table.configure(groups, routes) == []
+    table.rebuild(WINDOWS)
+    return table
+
+
+def test_masks_and_targets_per_source():
+    table = _table({"healers": ["priest", "druid"], "dps": ["mage", "pid:3"]},
+                   {"1": "healers", "2": "dps", "3": ["healers", "main"], "4": "others"})
+
+    assert table.masks["healers"] == 0b101
+    assert table.masks["dps"] == 0b110
+    assert table.masks["main"] == 0b001
+    assert table.masks["all"] == table.masks["others"] == 0b111
+
+    # La ventana origen nunca recibe copia
+    assert table.targets("1", 0x20) == (0x10, 0x30)
+    assert table.targets("1", 0x10) == (0x30,)
+    assert table.targets("2", 0x10) == (0x20, 0x30)
+    assert table.targets("4", 0x30) == (0x10, 0x20)
+
+    # Teclas con la misma máscara comparten las tuplas precalculadas
+    assert table._table["1"] is table._table["3"]
+    # Sin regla propia: destino por defecto
+    assert table.targets("5", 0x10) is None
+
+
+def test_rebuild_follows_window_changes():
+    table = _table({"casters": ["mage"]}, {"1": "casters"})
+    assert table.targets("1", 0x10) == (0x20,)
+
+    mage2 = WindowRecord(0x40, 4, "World of Warcraft - Mage 2")
+    table.rebuild(WINDOWS[:2] + (mage2,))
+    assert table.targets("1", 0x10) == (0x20, 0x40)
+    assert table.targets("1", 0x30) is None
+
+
+def test_invalid_rules_are_reported_and_skipped():
+    table = RoutingTable()
+    errors = table.configure({"raro": {"match": ["x"], "mode": "aleatorio"}},
+                             {"1": "nadie", "2": "main"})
+    assert len(errors) == 2
+    table.rebuild(WINDOWS)
+    assert "raro" not in table.groups
+    assert table.targets("1", 0x10) is None
+    assert table.targets("2", 0x20) == (0x10,)
+
+
+def test_round_robin_rotates_and_skips_source():
+    table = _table({"interrupts": {"match": ["mage", "druid", "priest"], "mode": "round_robin"}},
+                   {"4": "interrupts"})
+
+    assert [table.targets("4", 0)[0] for _ in range(4)] == [0x10, 0x20, 0x30, 0x10]
+    # La ventana origen se salta si el grupo tiene otro miembro
+    assert [table.targets("4", 0x20)[0] for _ in range(3)] == [0x30, 0x10, 0x30]
+
+
+def test_round_robin_single_member_source_gets_nothing():
+    table = _table({"solo": {"match": ["mage"], "mode": "round_robin"}}, {"4": "solo"})
+    assert table.targets("4", 0x20) == ()
+    assert table.targets("4", 0x10) == (0x20,)
+
+
+def test_round_robin_cannot_combine_with_other_targets():
+    table = RoutingTable()
+    errors = table.configure({"rr": {"match": ["mage"], "mode": "round_robin"}},
+                             {"4": ["rr", "main"]})
+    assert len(errors) == 1
+    table.rebuild(WINDOWS)
+    assert table.targets("4", 0x10) is None
+
+
+def test_resolve_by_group_mode():
+    table = _table({"todos": {"match": ["warcraft"], "mode": "all"},
+                    "resto": {"match": ["warcraft"], "mode": "others"},
+                    "turno": {"match": ["warcraft"], "mode": "round_robin"}}, {})
+
+    assert table.resolve("todos", 0x20) == (0x10, 0x20, 0x30)
+    assert table.resolve("resto", 0x20) == (0x10, 0x30)
+    assert table.resolve("turno", 0x10) == (0x20,)
+    assert table.resolve("main", 0x20) == (0x10,)
+    assert table.resolve("nadie", 0x10) is None
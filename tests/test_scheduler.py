@@ -0,0 +1,73 @@
+import threading
+import time
+
+from multibox_scheduler import TimerWheel
+
+
+def _run(wheel, schedule, expected):
+    done = threading.Event()
+    fired = []
+
+    def fire(tag):
+        fired.append(tag)
+        if len(fired) == expected:
+            done.set()
+
+    wheel.start()
+    try:
+        schedule(fire)
+        assert done.wait(5)
+    finally:
+        wheel.stop()
+    return fired
+
+
+def test_tasks_fire_in_deadline_order():
+    wheel = TimerWheel(tick=0.002)
+
+    def schedule(fire):
+        for delay in (0.05, 0.01, 0.03, 0.0, 0.02):
+            wheel.schedule(delay, fire, delay)
+
+    assert _run(wheel, schedule, 5) == [0.0, 0.01, 0.02, 0.03, 0.05]
+    assert wheel.pending == 0
+
+
+def test_same_tick_keeps_schedule_order():
+    wheel = TimerWheel(tick=0.01)
+
+    def schedule(fire):
+        for tag in "abcd":
+            wheel.schedule(0.02, fire, tag)
+
+    assert _run(wheel, schedule, 4) == list("abcd")
+
+
+def test_delays_beyond_one_revolution():
+    # 4 ranuras de 5 ms: una vuelta son 20 ms
+    wheel = TimerWheel(tick=0.005, slots=4)
+
+    def schedule(fire):
+        wheel.schedule(0.07, fire, "tres vueltas")
+        wheel.schedule(0.005, fire, "primera")
+        wheel.schedule(0.025, fire, "segunda vuelta")
+
+    start = time.monotonic()
+    assert _run(wheel, schedule, 3) == ["primera", "segunda vuelta", "tres vueltas"]
+    assert time.monotonic() - start >= 0.07
+
+
+def test_cancelled_and_failing_tasks_do_not_stop_the_wheel():
+    errors = []
+    wheel = TimerWheel(tick=0.002, on_error=errors.append)
+
+    def boom():
+        raise RuntimeError("fallo")
+
+    def schedule(fire):
+        wheel.schedule(0.01, fire, "cancelada").cancel()
+        wheel.schedule(0.01, boom)
+        wheel.schedule(0.02, fire, "después")
+
+    assert _run(wheel, schedule, 1) == ["después"]
+    assert [str(e) for e in errors] == ["fallo"]
@@ -0,0 +1,114 @@
+import pytest
+
+from multibox_backend import WM_KEYDOWN, WM_KEYUP, SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+from multibox_session import (KEY_PRESS, KEY_RELEASE, MAGIC, STATE_ACTIVE, Session,
+                              SessionPlayer)
+
+
+class _UnnamedKey:
+    """Tecla de pynput sin carácter ni nombre (p. ej. una tecla multimedia por su vk)"""
+    char = None
+    name = None
+    vk = 0xB3
+
+
+def test_recording_round_trip_skips_unnamed_keys(tmp_path):
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        engine.start_recording()
+
+        engine.on_key_press("1")
+        engine.on_key_press(_UnnamedKey())
+        engine.on_key_release(_UnnamedKey())
+        engine.on_key_release("1")
+
+        path = str(tmp_path / "session.mbs")
+        assert engine.stop_recording(path)
+
+        session = Session.load(path)
+        assert [(kind, key) for _, _, kind, key in session.events] == [
+            (KEY_PRESS, "1"), (KEY_RELEASE, "1")]
+        assert session.windows == tuple(w.hwnd for w in engine.wow_windows)
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def _session():
+    windows = (0x1000, 0x2000, 0x3000)
+    events = [
+        (1_000_000, 0x1000, KEY_PRESS, "1"),
+        (31_000_000, 0x1000, KEY_RELEASE, "1"),
+        (40_000_000, 0, KEY_PRESS, "2"),            # ventana activa ajena al juego
+        (41_000_000, 0, KEY_RELEASE, "2"),
+        (50_000_000, 0x2000, KEY_PRESS, "3"),
+        (60_000_000, 0x2000, KEY_RELEASE, "3"),
+    ]
+    return Session(1_700_000_000.25, STATE_ACTIVE, windows, events)
+
+
+def test_file_round_trip_and_invalid_files(tmp_path):
+    path = tmp_path / "session.mbs"
+    original = _session()
+    original.save(str(path))
+
+    loaded = Session.load(str(path))
+    assert loaded.events == original.events
+    assert (loaded.windows, loaded.state, loaded.started) == (original.windows, STATE_ACTIVE,
+                                                               original.started)
+    assert loaded.duration == 0.06
+
+    (tmp_path / "otro.mbs").write_bytes(b"no es una sesion")
+    with pytest.raises(ValueError):
+        Session.load(str(tmp_path / "otro.mbs"))
+    data = path.read_bytes()
+    (tmp_path / "v2.mbs").write_bytes(data[:len(MAGIC)] + b"\x02" + data[len(MAGIC) + 1:])
+    with pytest.raises(ValueError):
+        Session.load(str(tmp_path / "v2.mbs"))
+
+
+def _play(session):
+    backend = SimulatedBackend()
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        result = SessionPlayer(engine, backend, session, speed=0).run()
+        assert engine.dispatcher.wait_idle()
+        assert backend.wait_idle()
+        received = [[(msg, wparam) for msg, wparam, *_ in backend.windows[w.hwnd].received]
+                    for w in engine.wow_windows]
+        return result, received
+    finally:
+        engine.shutdown()
+        backend.close()
+
+
+def test_replay_is_deterministic():
+    session = _session()
+    result, received = _play(session)
+    assert result["events"] == 6
+
+    # Cada tecla llega a las ventanas distintas de la activa; '2' fuera del juego no se replica
+    one = [(WM_KEYDOWN, ord("1")), (WM_KEYUP, ord("1"))]
+    three = [(WM_KEYDOWN, ord("3")), (WM_KEYUP, ord("3"))]
+    assert received == [three, one, one + three]
+    assert _play(session)[1] == received
+
+
+def test_replay_skips_recording_hotkey():
+    session = _session()
+    session.events = [(0, 0x1000, KEY_PRESS, "f6"), (1000, 0x1000, KEY_RELEASE, "f6")]
+    backend = SimulatedBackend()
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.apply_config(engine.config.replace(hotkeys={"f6": "toggle_recording"}))
+        assert SessionPlayer(engine, backend, session, speed=0).run()["events"] == 0
+        assert engine.recorder is None
+    finally:
+        engine.shutdown()
+        backend.close()
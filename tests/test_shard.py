@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from multibox_backend import SimulatedBackend, WM_KEYDOWN, WM_KEYUP
+from multibox_shard import STALL_TIMEOUT, ShardPool, backend_factory_for, sharding_available
+
+pytestmark = pytest.mark.skipif(not sharding_available(), reason="sin multiprocessing.shared_memory")
+
+DOWN = ((WM_KEYDOWN, 0x31, 1),)
+UP = ((WM_KEYUP, 0x31, 0xC0000001),)
+
+
+def test_full_ring_never_blocks_and_trips_breaker():
+    breaker = []
+    pool = ShardPool(1, backend_factory_for(SimulatedBackend()), capacity=8, backlog_capacity=4,
+                     on_breaker=lambda index, tripped, reason: breaker.append(tripped))
+    assert pool.start()
+    try:
+        # Trabajador muerto: nadie vacía el buffer
+        for shard in pool._shards:
+            shard.process.terminate()
+            shard.process.join(5)
+
+        worst = 0.0
+        for idx in range(200):
+            start = time.perf_counter()
+            pool.post_many((0x100,), DOWN, idx + 1)
+            pool.post_many((0x100,), UP, critical=True)
+            worst = max(worst, time.perf_counter() - start)
+        assert worst < 0.05
+
+        stats = pool.stats()
+        assert stats["dropped"] > 0
+        # Los KEYUP nunca se descartan: quedan en la cola del frontal
+        assert stats["shards"][0]["backlog"] >= 200 - 8
+
+        deadline = time.monotonic() + STALL_TIMEOUT + 2.0
+        while not breaker and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert breaker == [True]
+        assert pool.post_many((0x100,), DOWN, 1) == 0
+        # Con el cortocircuito abierto los KEYUP se siguen aceptando, aunque se repitan
+        dropped = pool.stats()["dropped"]
+        assert pool.post_many((0x100,), UP, critical=True) == 1
+        assert pool.post_many((0x200,), UP, critical=True) == 1
+        assert pool.stats()["dropped"] == dropped
+    finally:
+        pool.stop(timeout=1.0)
+
+
+def test_coalesce_keeps_key_up_after_new_key_down():
+    pool = ShardPool(1, backend_factory_for(SimulatedBackend()), capacity=8, backlog_capacity=4,
+                     overflow="coalesce")
+    assert pool.start()
+    try:
+        for shard in pool._shards:
+            shard.process.terminate()
+            shard.process.join(5)
+        while pool.post_many((0x100,), DOWN, 1):
+            pass  # llenar buffer y cola
+
+        # KEYUP, KEYDOWN y otra vez KEYUP de la misma tecla: el segundo KEYUP no es redundante
+        assert pool.post_many((0x100,), UP, critical=True) == 1
+        pool.post_many((0x100,), DOWN, 2)
+        assert pool.post_many((0x100,), UP, critical=True) == 1
+        backlog = pool._shards[0].backlog
+        assert [job[1] for job in backlog].count(UP) == 2
+        assert backlog[-1][1] == UP
+    finally:
+        pool.stop(timeout=1.0)
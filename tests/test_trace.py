@@ -0,0 +1,80 @@
+import json
+
+from multibox_backend import SimulatedBackend
+from multibox_engine import WoWMultiboxEngine
+from multibox_trace import TRACER, Tracer, traced
+
+
+def test_disabled_tracer_records_nothing():
+    @traced("prueba")
+    def work(value):
+        return value * 2
+
+    assert not TRACER.enabled
+    assert work(2) == 4
+    assert TRACER.events() == []
+
+
+def test_start_clears_previous_events():
+    tracer = Tracer(capacity=8)
+    tracer.start()
+    tracer.begin("anterior")
+    tracer.start()
+    assert tracer.events() == []
+
+
+def test_ring_keeps_last_events_in_order():
+    tracer = Tracer(capacity=4)
+    tracer.start()
+    for n in range(6):
+        tracer.begin(f"e{n}")
+
+    assert [name for _, name, _, _ in tracer.events()] == ["e2", "e3", "e4", "e5"]
+    timestamps = [ts for _, _, ts, _ in tracer.events()]
+    assert timestamps == sorted(timestamps)
+
+
+def test_traced_spans_survive_exceptions():
+    @traced("falla")
+    def fail():
+        raise ValueError
+
+    TRACER.start()
+    try:
+        try:
+            fail()
+        except ValueError:
+            pass
+    finally:
+        TRACER.stop()
+    assert [(phase, name) for phase, name, _, _ in TRACER.events()] == [("B", "falla"),
+                                                                        ("E", "falla")]
+
+
+def test_engine_trace_exports_chrome_format(tmp_path):
+    backend = SimulatedBackend(2)
+    engine = WoWMultiboxEngine(backend)
+    try:
+        engine.config_store.stop()
+        engine.find_wow_windows()
+        main = engine.wow_windows[0].hwnd
+        engine.set_main_window(main)
+        engine.foreground_window = main
+        engine.active = True
+
+        engine.start_trace()
+        engine.on_key_press("1")
+        engine.on_key_release("1")
+        path = tmp_path / "traza.json"
+        assert engine.stop_trace(str(path))
+        assert not TRACER.enabled
+
+        events = json.loads(path.read_text())["traceEvents"]
+        names = {e["name"] for e in events if e["ph"] == "B"}
+        assert {"engine.on_key_press", "engine.replicate_key", "engine.release_key"} <= names
+        assert any(e["ph"] == "M" and e["name"] == "thread_name" for e in events)
+        # Cada inicio tiene su fin
+        assert sum(e["ph"] == "B" for e in events) == sum(e["ph"] == "E" for e in events)
+    finally:
+        engine.shutdown()
+        backend.close()